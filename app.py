@@ -1,6 +1,6 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, render_template, request, redirect, url_for, flash, session, make_response
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from werkzeug.security import check_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
 import pymysql
 from config import Config
 from models.user import User
@@ -8,13 +8,12 @@ from blueprints.auth import auth_bp
 from blueprints.admin import admin_bp
 from blueprints.cashier import cashier_bp
 from utils.helpers import log_activity
-
-app = Flask(__name__)
-app.config.from_object(Config)
+from utils.passwords import get_hasher, PasswordPoolBusy
+from utils.rate_limit import rate_limit
+from utils import sql_instrumentation, metrics, query_budget, background, assets
 
 # Initialize Flask-Login
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'index'
 login_manager.login_message = 'Please log in to access this page.'
 login_manager.login_message_category = 'info'
@@ -23,12 +22,55 @@ login_manager.login_message_category = 'info'
 def load_user(user_id):
     return User.get_by_id(int(user_id))
 
-# Register Blueprints
-app.register_blueprint(auth_bp)
-app.register_blueprint(admin_bp, url_prefix='/admin')
-app.register_blueprint(cashier_bp, url_prefix='/cashier')
+def create_app(config=None):
+    """Build the Flask app.
+
+    `config` is a class or dict of settings overriding Config. The modules read
+    Config directly, so overrides apply to the whole process. Background
+    threads start before the first request each process serves (see
+    utils/background.py), so a preforking server can import this in its
+    master and fork workers from it.
+    """
+    if config is not None:
+        items = config.items() if isinstance(config, dict) else vars(config).items()
+        for key, value in items:
+            if key.isupper():
+                setattr(Config, key, value)
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+
+    # Client address and scheme from the reverse proxy's headers, so rate limits
+    # and logs see each client rather than the proxy
+    if Config.TRUSTED_PROXY_HOPS > 0:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.TRUSTED_PROXY_HOPS, x_proto=Config.TRUSTED_PROXY_HOPS)
+
+    login_manager.init_app(app)
+
+    # Per-request SQL timing (Server-Timing header, /admin/perf) and query budgets
+    sql_instrumentation.init_app(app)
+    query_budget.init_app(app)
+
+    # Request, pool and payment metrics for Prometheus at /metrics
+    metrics.init_app(app)
+
+    # Fingerprinted, precompressed static files and the asset_url() template global
+    assets.init_app(app)
+
+    # Register Blueprints
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(admin_bp, url_prefix='/admin')
+    app.register_blueprint(cashier_bp, url_prefix='/cashier')
+
+    app.add_url_rule('/', view_func=index)
+    app.add_url_rule('/login', view_func=login, methods=['POST'])
+    app.add_url_rule('/logout', view_func=logout)
+
+    # OTP purge, log partitions, metrics flush, log writer and email outbox
+    app.before_request(background.start)
+
+    return app
 
-@app.route('/')
 def index():
     if current_user.is_authenticated:
         if current_user.role == 'admin':
@@ -37,7 +79,8 @@ def index():
             return redirect(url_for('cashier.dashboard'))
     return render_template('index.html')
 
-@app.route('/login', methods=['POST'])
+@rate_limit(30, 60, key='ip', template='index.html')
+@rate_limit(5, 60, key='email', template='index.html', message='Too many sign-in attempts for this account. Please wait a minute and try again.')
 def login():
     email = request.form.get('email')
     password = request.form.get('password')
@@ -46,17 +89,34 @@ def login():
         flash('Please enter both email and password.', 'error')
         return redirect(url_for('index'))
 
+    # Shed load before touching the database when the hashing pool is full
+    if get_hasher().is_saturated():
+        return login_busy()
+
     user = User.get_by_email(email)
 
-    if user and user.check_password(password):
+    try:
+        password_ok = user is not None and user.check_password(password)
+    except PasswordPoolBusy:
+        return login_busy()
+
+    if password_ok:
         if not user.is_active:
             flash('Your account has been disabled. Please contact administrator.', 'error')
             return redirect(url_for('index'))
 
+        # Upgrade the stored hash if the configured hash parameters changed; the
+        # password is already verified, so a busy pool only postpones the upgrade
+        if user.password_needs_rehash():
+            try:
+                User.update_password_by_id(user.id, password)
+            except PasswordPoolBusy:
+                pass
+
         login_user(user)
         # Simple login log with role
         session['user_name'] = user.name
-        log_activity(user.id, f"User login: {user.email}", role=user.role)
+        log_activity(user.id, f"User login: {user.email}", role=user.role, action_type='login')
 
         if user.role == 'admin':
             return redirect(url_for('admin.dashboard'))
@@ -67,11 +127,17 @@ def login():
 
     return redirect(url_for('index'))
 
-@app.route('/logout')
+def login_busy():
+    flash('The server is busy signing in other users. Please try again in a few seconds.', 'error')
+    response = make_response(render_template('index.html'), 429)
+    response.headers['Retry-After'] = '2'
+    return response
+
 @login_required
 def logout():
     # Simple logout log with role
-    log_activity(current_user.id, f"User logout: {current_user.email}", role=current_user.role)
+    log_activity(current_user.id, f"User logout: {current_user.email}", role=current_user.role,
+                 action_type='logout')
     logout_user()
     flash('You have been logged out successfully.', 'success')
     return redirect(url_for('index'))
@@ -85,4 +151,4 @@ def logout():
 #     return render_template('500.html'), 500
 
 if __name__ == '__main__':
-    app.run(debug=True, port=8000)
\ No newline at end of file
+    create_app().run(debug=True, port=8000)
\ No newline at end of file
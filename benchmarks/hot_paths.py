@@ -0,0 +1,206 @@
+"""Micro-benchmarks for the hot routes and model methods.
+
+Times each case in-process through Flask's test client (no network, no
+server), logged in as the default admin or the first active cashier, against
+whatever data the configured database holds. Use database/synthetic_data.py
+to load realistic volume first. Every request is SQL-sampled, so results
+include the query count and database time alongside wall-clock latency.
+
+    python -m benchmarks.hot_paths --iterations 30 --json results/before.json
+    python -m benchmarks.hot_paths --only admin.students --compare results/before.json
+
+Results are JSON (per-case min/median/mean/p95 in ms, plus row counts and the
+git commit) so runs can be compared with --compare. The same cases run under
+pytest-benchmark in tests/test_benchmarks.py.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import Config
+from app import create_app
+from database.init_db import get_db_connection
+from models.log import Log
+
+_server_timing = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries, (\d+) rows"')
+
+
+def route_cases(course_id):
+    """(name, role, path) for every timed route."""
+    return [
+        ('admin.dashboard', 'admin', '/admin/dashboard'),
+        ('admin.students', 'admin', '/admin/students'),
+        ('admin.students status=all', 'admin', '/admin/students?student_status_filter=all'),
+        ('admin.students status=inactive', 'admin', '/admin/students?student_status_filter=inactive'),
+        ('admin.students search', 'admin', '/admin/students?search=santos'),
+        ('admin.students course', 'admin', f'/admin/students?course_filter={course_id}'),
+        ('admin.students paid', 'admin', '/admin/students?payment_status_filter=paid'),
+        ('admin.students partial', 'admin', '/admin/students?payment_status_filter=partial'),
+        ('admin.students unpaid', 'admin', '/admin/students?payment_status_filter=unpaid'),
+        ('admin.students page=50', 'admin', '/admin/students?page=50'),
+        ('cashier.students', 'cashier', '/cashier/students'),
+        ('cashier.students search', 'cashier', '/cashier/students?search=santos'),
+        ('cashier.students status=unpaid', 'cashier', '/cashier/students?status=unpaid'),
+        ('cashier.payment_history_all', 'cashier', '/cashier/payment-history-all'),
+        ('cashier.payment_history_all page=100', 'cashier', '/cashier/payment-history-all?page=100'),
+        ('cashier.export_payments', 'cashier', '/cashier/export/payments'),
+    ]
+
+
+def method_cases():
+    """(name, callable) for every timed model method."""
+    return [
+        ('Log.get_paginated_logs', lambda: Log.get_paginated_logs(page=1)),
+        ('Log.get_paginated_logs page=1000', lambda: Log.get_paginated_logs(page=1000)),
+    ]
+
+
+def load_fixtures():
+    """User ids to log in as ({'admin': id, 'cashier': id}), the busiest course id and table sizes."""
+    connection = get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT id FROM users WHERE role = 'admin' AND is_active = TRUE ORDER BY id LIMIT 1")
+            admin = cursor.fetchone()
+            cursor.execute("SELECT id FROM users WHERE role = 'cashier' AND is_active = TRUE ORDER BY id LIMIT 1")
+            cashier = cursor.fetchone()
+            cursor.execute("SELECT course_id FROM students GROUP BY course_id ORDER BY COUNT(*) DESC LIMIT 1")
+            course = cursor.fetchone()
+            counts = {}
+            for table in ('courses', 'students', 'payments', 'logs', 'users'):
+                cursor.execute(f"SELECT COUNT(*) AS count FROM {table}")
+                counts[table] = cursor.fetchone()['count']
+    finally:
+        connection.close()
+    if not admin or not cashier:
+        raise SystemExit("Need an active admin and an active cashier (run database.synthetic_data first).")
+    return {'admin': admin['id'], 'cashier': cashier['id']}, (course or {}).get('course_id') or 1, counts
+
+
+def logged_in_client(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+def _summarize(name, timings, extra=None):
+    timings = sorted(timings)
+    result = {
+        'name': name,
+        'iterations': len(timings),
+        'min_ms': round(timings[0] * 1000, 2),
+        'median_ms': round(statistics.median(timings) * 1000, 2),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 2),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000, 2),
+        'stdev_ms': round(statistics.pstdev(timings) * 1000, 2)
+    }
+    result.update(extra or {})
+    return result
+
+
+def bench_route(client, name, path, iterations, warmup):
+    timings = []
+    queries = db_ms = None
+    for i in range(warmup + iterations):
+        start = time.perf_counter()
+        response = client.get(path)
+        response.get_data()
+        elapsed = time.perf_counter() - start
+        if response.status_code != 200:
+            raise SystemExit(f"{name}: GET {path} returned {response.status_code}")
+        if i >= warmup:
+            timings.append(elapsed)
+            match = _server_timing.search(response.headers.get('Server-Timing', ''))
+            if match:
+                db_ms, queries = float(match.group(1)), int(match.group(2))
+    return _summarize(name, timings, {'path': path, 'queries': queries, 'db_ms': db_ms})
+
+
+def bench_method(name, method, iterations, warmup):
+    timings = []
+    for i in range(warmup + iterations):
+        start = time.perf_counter()
+        method()
+        if i >= warmup:
+            timings.append(time.perf_counter() - start)
+    return _summarize(name, timings)
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {row['name']: row for row in json.load(f)['results']}
+    print(f"\n{'case':45s} {'before':>10s} {'after':>10s} {'change':>8s}")
+    for row in results:
+        before = baseline.get(row['name'])
+        if before is None:
+            print(f"{row['name']:45s} {'-':>10s} {row['median_ms']:>8.1f}ms {'new':>8s}")
+            continue
+        change = (row['median_ms'] - before['median_ms']) / before['median_ms'] * 100 if before['median_ms'] else 0
+        print(f"{row['name']:45s} {before['median_ms']:>8.1f}ms {row['median_ms']:>8.1f}ms {change:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--only', help='run only cases whose name contains this text')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--compare', help='print median changes against an earlier results file')
+    args = parser.parse_args()
+
+    Config.SQL_SAMPLE_RATE = 1.0  # time every request so Server-Timing carries query counts
+    users, course_id, counts = load_fixtures()
+    app = create_app()
+    clients = {role: logged_in_client(app, user_id) for role, user_id in users.items()}
+
+    results = []
+    for name, role, path in route_cases(course_id):
+        if args.only and args.only not in name:
+            continue
+        results.append(bench_route(clients[role], name, path, args.iterations, args.warmup))
+        print(json.dumps(results[-1]))
+    for name, method in method_cases():
+        if args.only and args.only not in name:
+            continue
+        results.append(bench_method(name, method, args.iterations, args.warmup))
+        print(json.dumps(results[-1]))
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'iterations': args.iterations,
+            'rows': counts
+        },
+        'results': results
+    }
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
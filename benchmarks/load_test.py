@@ -0,0 +1,313 @@
+"""End-to-end load test of the cashier and admin workflows.
+
+Runs N virtual cashiers and M virtual admins against a running server, each
+with its own cookie session:
+
+- cashier: login, view_collect_payment, api_search_student once per
+  keystroke of a student's name, collect_payment POST, payment_history, and
+  logout every --session-length iterations
+- admin: login, then refresh admin.dashboard and admin.logs
+
+At the end it reports overall throughput, p50/p95/p99 latency, request count
+and error rate per endpoint, and database connection usage. Connection usage
+comes from MySQL (Threads_connected sampled every second, and
+Max_used_connections) and, when /metrics is reachable, from the app's pool
+gauges and wait histogram.
+
+    python -m database.synthetic_data --scale 0.05
+    RATE_LIMIT_ENABLED=false python app.py      # logins come from one address
+    python -m benchmarks.load_test --url http://127.0.0.1:5000 --cashiers 40 --admins 2 --duration 120
+
+Cashiers log in as the synthetic cashiers (password "synthetic123") and pay
+1.00 toward random synthetic students, so the run does not touch real data.
+Only a successful response counts as success. For form POSTs that is the
+redirect; a 4xx or 5xx response or a connection error counts as an error.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.init_db import get_db_connection
+
+_metric_line = re.compile(r'^(\w+)(?:\{([^}]*)\})? ([\d.eE+-]+)$')
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def add(self, endpoint, elapsed, status, ok):
+        with self._lock:
+            self.latencies[endpoint].append(elapsed)
+            self.statuses[endpoint][str(status)] += 1
+            if not ok:
+                self.errors[endpoint] += 1
+
+
+class VirtualUser:
+    def __init__(self, base_url, recorder):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect)
+
+    def request(self, endpoint, path, data=None, expect=(200,)):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        start = time.perf_counter()
+        try:
+            response = self.opener.open(self.base_url + path, body, timeout=60)
+            response.read()
+            status = response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            status = e.code
+        except (urllib.error.URLError, OSError):
+            status = 'error'
+        elapsed = time.perf_counter() - start
+        ok = status in expect
+        self.recorder.add(endpoint, elapsed, status, ok)
+        return ok
+
+    def login(self, email, password):
+        return self.request('login', '/login', {'email': email, 'password': password}, expect=(302,))
+
+    def logout(self):
+        self.request('logout', '/logout', expect=(302,))
+
+
+def cashier_loop(user, email, password, students, deadline, think, session_length):
+    rng = random.Random()
+    while time.perf_counter() < deadline:
+        if not user.login(email, password):
+            time.sleep(1)
+            continue
+        for _ in range(session_length):
+            if time.perf_counter() >= deadline:
+                break
+            student_id, name = rng.choice(students)
+            user.request('cashier.view_collect_payment', '/cashier/view-collect-payment')
+            for length in range(2, len(name) + 1):
+                query = urllib.parse.quote(name[:length])
+                user.request('cashier.api_search_student', f'/cashier/api/search-student?query={query}',
+                             expect=(200, 404))
+                time.sleep(think / 10)
+            user.request('cashier.collect_payment', f'/cashier/collect-payment/{student_id}',
+                         {'amount': '1.00', 'payment_method': 'cash', 'notes': 'load test'}, expect=(302,))
+            user.request('cashier.payment_history', f'/cashier/payment-history/{student_id}')
+            time.sleep(think)
+        user.logout()
+
+
+def admin_loop(user, email, password, deadline, think):
+    while time.perf_counter() < deadline:
+        if not user.login(email, password):
+            time.sleep(1)
+            continue
+        while time.perf_counter() < deadline:
+            user.request('admin.dashboard', '/admin/dashboard')
+            user.request('admin.logs', '/admin/logs')
+            time.sleep(think)
+        user.logout()
+
+
+def _fixtures(cashier_count):
+    connection = get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT email FROM users
+                WHERE role = 'cashier' AND is_active = TRUE AND email LIKE %s
+                ORDER BY id LIMIT %s
+            """, ('%@synthetic.test', cashier_count))
+            emails = [row['email'] for row in cursor.fetchall()]
+            cursor.execute("""
+                SELECT id, first_name FROM students
+                WHERE is_active = TRUE AND student_id LIKE %s
+                ORDER BY RAND() LIMIT 500
+            """, ('SYN-%',))
+            students = [(row['id'], row['first_name']) for row in cursor.fetchall()]
+    finally:
+        connection.close()
+    if not emails or not students:
+        raise SystemExit("No synthetic cashiers or students; run python -m database.synthetic_data first.")
+    return emails, students
+
+
+class ConnectionSampler(threading.Thread):
+    """Samples MySQL Threads_connected and the app's /metrics pool gauges once a second."""
+
+    def __init__(self, metrics_url, token):
+        super().__init__(daemon=True)
+        self.metrics_url = metrics_url
+        self.token = token
+        self.stop = threading.Event()
+        self.threads_connected = []
+        self.pool_in_use = []
+
+    def _mysql_status(self, cursor, name):
+        cursor.execute("SHOW GLOBAL STATUS LIKE %s", (name,))
+        row = cursor.fetchone()
+        return int(row['Value']) if row else None
+
+    def scrape(self):
+        if not self.metrics_url:
+            return {}
+        request = urllib.request.Request(self.metrics_url)
+        if self.token:
+            request.add_header('Authorization', f'Bearer {self.token}')
+        try:
+            text = urllib.request.urlopen(request, timeout=5).read().decode()
+        except (urllib.error.URLError, OSError):
+            return {}
+        values = defaultdict(float)
+        for line in text.splitlines():
+            match = _metric_line.match(line)
+            if match:
+                name, labels, value = match.groups()
+                values[(name, labels or '')] += float(value)
+        return values
+
+    def run(self):
+        connection = get_db_connection()
+        try:
+            with connection.cursor() as cursor:
+                while not self.stop.wait(1):
+                    self.threads_connected.append(self._mysql_status(cursor, 'Threads_connected'))
+                    in_use = self.scrape().get(('db_pool_connections', 'state="in_use"'))
+                    if in_use is not None:
+                        self.pool_in_use.append(in_use)
+                self.max_used_connections = self._mysql_status(cursor, 'Max_used_connections')
+        finally:
+            connection.close()
+
+
+def _percentile(sorted_values, percent):
+    index = min(len(sorted_values) - 1, max(0, int(round(percent / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def report(recorder, elapsed, sampler, metrics_before, metrics_after):
+    rows = []
+    total = errors = 0
+    for endpoint, latencies in sorted(recorder.latencies.items()):
+        latencies.sort()
+        total += len(latencies)
+        errors += recorder.errors[endpoint]
+        rows.append({
+            'endpoint': endpoint,
+            'requests': len(latencies),
+            'per_second': round(len(latencies) / elapsed, 2),
+            'p50_ms': round(_percentile(latencies, 50) * 1000, 1),
+            'p95_ms': round(_percentile(latencies, 95) * 1000, 1),
+            'p99_ms': round(_percentile(latencies, 99) * 1000, 1),
+            'error_rate': round(recorder.errors[endpoint] / len(latencies), 4),
+            'statuses': dict(recorder.statuses[endpoint])
+        })
+
+    connections = {
+        'mysql_threads_connected_max': max(filter(None, sampler.threads_connected), default=None),
+        'mysql_threads_connected_avg': (round(sum(filter(None, sampler.threads_connected)) /
+                                              len(sampler.threads_connected), 1)
+                                        if sampler.threads_connected else None),
+        'mysql_max_used_connections': getattr(sampler, 'max_used_connections', None),
+        'pool_in_use_max': max(sampler.pool_in_use, default=None)
+    }
+    waits = metrics_after.get(('db_pool_wait_seconds_count', ''), 0) - metrics_before.get(('db_pool_wait_seconds_count', ''), 0)
+    if waits:
+        wait_total = (metrics_after.get(('db_pool_wait_seconds_sum', ''), 0) -
+                      metrics_before.get(('db_pool_wait_seconds_sum', ''), 0))
+        connections['pool_checkouts'] = int(waits)
+        connections['pool_wait_avg_ms'] = round(wait_total / waits * 1000, 3)
+
+    return {
+        'seconds': round(elapsed, 1),
+        'requests': total,
+        'requests_per_second': round(total / elapsed, 1),
+        'error_rate': round(errors / total, 4) if total else None,
+        'endpoints': rows,
+        'connections': connections
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--cashiers', type=int, default=10, help='concurrent virtual cashiers')
+    parser.add_argument('--admins', type=int, default=1, help='concurrent virtual admins')
+    parser.add_argument('--duration', type=float, default=60, help='seconds')
+    parser.add_argument('--ramp-up', type=float, default=5, help='seconds over which users start')
+    parser.add_argument('--think', type=float, default=1.0, help='seconds a cashier pauses between payments')
+    parser.add_argument('--session-length', type=int, default=10, help='payments per cashier login')
+    parser.add_argument('--cashier-password', default='synthetic123')
+    parser.add_argument('--admin-email', default='admin@school.com')
+    parser.add_argument('--admin-password', default='admin123')
+    parser.add_argument('--metrics-token', default=os.environ.get('METRICS_TOKEN'))
+    parser.add_argument('--json', help='write the report to this file')
+    args = parser.parse_args()
+
+    emails, students = _fixtures(args.cashiers)
+    recorder = Recorder()
+    sampler = ConnectionSampler(args.url.rstrip('/') + '/metrics', args.metrics_token)
+    metrics_before = sampler.scrape()
+    sampler.start()
+
+    started = time.perf_counter()
+    deadline = started + args.ramp_up + args.duration
+    users = args.cashiers + args.admins
+    threads = []
+    for i in range(users):
+        user = VirtualUser(args.url, recorder)
+        if i < args.cashiers:
+            target = cashier_loop
+            target_args = (user, emails[i % len(emails)], args.cashier_password, students, deadline,
+                           args.think, args.session_length)
+        else:
+            target = admin_loop
+            target_args = (user, args.admin_email, args.admin_password, deadline, args.think)
+        thread = threading.Thread(target=target, args=target_args, daemon=True)
+        thread.start()
+        threads.append(thread)
+        time.sleep(args.ramp_up / max(users, 1))
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    sampler.stop.set()
+    sampler.join()
+    result = report(recorder, elapsed, sampler, metrics_before, sampler.scrape())
+
+    print(f"{result['requests']:,} requests in {result['seconds']}s: "
+          f"{result['requests_per_second']} req/s, error rate {result['error_rate'] or 0:.2%}")
+    print(f"{'endpoint':35s} {'reqs':>7s} {'req/s':>7s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'errors':>7s}")
+    for row in result['endpoints']:
+        print(f"{row['endpoint']:35s} {row['requests']:>7d} {row['per_second']:>7.1f} {row['p50_ms']:>6.1f}ms "
+              f"{row['p95_ms']:>6.1f}ms {row['p99_ms']:>6.1f}ms {row['error_rate']:>7.2%}")
+    print("connections: " + json.dumps(result['connections']))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""Login throughput benchmark.
+
+Measures how many password verifications (the CPU-bound part of a login) the
+hashing pool completes per second, and per core, for a range of worker counts.
+
+    python -m benchmarks.login_throughput --seconds 5 --workers 1 2 4
+    python -m benchmarks.login_throughput --method pbkdf2:sha256:600000
+
+With --url the same measurement is made end to end against a running server,
+posting real logins with the given credentials.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from werkzeug.security import generate_password_hash
+from utils.passwords import PasswordHasher, PasswordPoolBusy
+
+
+def bench_pool(method, kind, workers, clients, seconds):
+    """Hammer a PasswordHasher with `clients` threads for `seconds`."""
+    hasher = PasswordHasher(method=method, kind=kind, workers=workers,
+                            max_pending=clients, timeout=30)
+    password_hash = generate_password_hash('correct horse', method=method)
+    completed = [0]
+    rejected = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        ok = busy = 0
+        while time.perf_counter() < deadline:
+            try:
+                hasher.verify(password_hash, 'correct horse')
+                ok += 1
+            except PasswordPoolBusy:
+                busy += 1
+        with lock:
+            completed[0] += ok
+            rejected[0] += busy
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    hasher.shutdown()
+
+    per_second = completed[0] / elapsed
+    return {
+        'method': hasher.method_prefix,
+        'kind': kind,
+        'workers': workers,
+        'clients': clients,
+        'seconds': round(elapsed, 2),
+        'logins': completed[0],
+        'rejected': rejected[0],
+        'logins_per_second': round(per_second, 1),
+        'logins_per_second_per_core': round(per_second / min(workers, os.cpu_count() or 1), 1)
+    }
+
+
+def bench_http(url, email, password, clients, seconds):
+    """POST /login concurrently against a running server."""
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+    body = urllib.parse.urlencode({'email': email, 'password': password}).encode()
+
+    class NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args, **kwargs):
+            return None
+
+    opener = urllib.request.build_opener(NoRedirect)
+
+    def client():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status = opener.open(url.rstrip('/') + '/login', body, timeout=30).status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except urllib.error.URLError:
+                status = 'error'
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ok = sum(n for status, n in statuses.items() if status == 302)
+    return {
+        'url': url,
+        'clients': clients,
+        'seconds': round(elapsed, 2),
+        'statuses': {str(k): v for k, v in statuses.items()},
+        'logins_per_second': round(ok / elapsed, 1),
+        'logins_per_second_per_core': round(ok / elapsed / (os.cpu_count() or 1), 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+        'p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 1) if latencies else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--method', default='scrypt', help='werkzeug hash method to benchmark')
+    parser.add_argument('--kind', default='thread', choices=['thread', 'process'])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, os.cpu_count() or 1])
+    parser.add_argument('--clients', type=int, default=32, help='concurrent login attempts')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--url', help='benchmark a running server instead of the pool')
+    parser.add_argument('--email', default='admin@school.com')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    if args.url:
+        results = [bench_http(args.url, args.email, args.password, args.clients, args.seconds)]
+    else:
+        results = [bench_pool(args.method, args.kind, workers, args.clients, args.seconds)
+                   for workers in sorted(set(args.workers))]
+
+    for result in results:
+        print(json.dumps(result))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,10 +3,21 @@ from flask_login import login_required, current_user
 from functools import wraps
 from models.user import User
 from models.log import Log
+from models import log_stats, log_types
+from utils.student_search import search_students, refresh_students, id_filter, in_rank_order
+from utils.time_windows import range_condition, range_sql, date_window
+from utils import time_windows
+from utils.statements import statement
+from utils import sql_instrumentation, slow_queries, snapshots
+from utils.query_budget import query_budget
+from utils.admission import admission
 from utils.helpers import admin_required
+from utils.log_retention import retention_job
+from utils.passwords import hash_password, verify_password, PasswordPoolBusy, BUSY_MESSAGE
 import pymysql
 from config import Config
 from database.init_db import get_db_connection
+from database import fanout
 
 from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, make_response
 import pymysql
@@ -18,142 +29,167 @@ from datetime import datetime, timedelta
 
 admin_bp = Blueprint('admin', __name__)
 
+# Hot-path statements with plan expectations (see utils/statements.py)
+TOTAL_PAYMENTS = statement('admin.dashboard.total_payments', """
+    SELECT COALESCE(SUM(amount_paid), 0) as total FROM payments
+""", full_scan_ok='sums every payment')
+
+RECENT_ACTIVITIES = statement('admin.dashboard.recent_activities', """
+    SELECT l.action, l.created_at, u.name as user_name, u.role as role
+    FROM logs l
+    JOIN users u ON l.user_id = u.id
+    ORDER BY l.created_at DESC
+    LIMIT 10
+""", indexes={'logs': 'idx_logs_created_at', 'users': 'PRIMARY'}, max_rows=1000)
+
+DAILY_REVENUE = statement('admin.dashboard.daily_revenue', f"""
+    SELECT payment_date, SUM(amount_paid) as daily_total
+    FROM payments
+    WHERE {range_sql('payment_date')}
+    GROUP BY payment_date
+    ORDER BY payment_date
+""", sample=lambda cursor: date_window('month'), indexes={'payments': 'idx_payments_payment_date'})
+
+RECENT_PAYMENTS = statement('admin.dashboard.recent_payments', """
+    SELECT 
+        p.amount_paid,
+        p.payment_date,
+        p.created_at,
+        s.full_name as student_name,
+        u.name as cashier_name,
+        p.payment_method
+    FROM payments p
+    JOIN students s ON p.student_id = s.id
+    JOIN users u ON p.collected_by = u.id
+    ORDER BY p.created_at DESC
+    LIMIT 5
+""", indexes={'payments': 'idx_payments_created_at', 'students': 'PRIMARY'}, max_rows=1000)
+
 
 @admin_bp.route('/dashboard')
 @login_required
 @admin_required
+@admission('dashboard')
+@query_budget(10)
 def dashboard():
-    # connection = User.get_db_connection()
-    connection = get_db_connection()
-    try:
-        with connection.cursor() as cursor:
-            # Get dashboard statistics
-
-            # 1. Total active students
-            cursor.execute("SELECT COUNT(*) as count FROM students WHERE is_active = TRUE")
-            total_students = cursor.fetchone()['count']
-
-            # 2. Total active courses
-            cursor.execute("SELECT COUNT(*) as count FROM courses WHERE is_active = TRUE")
-            total_courses = cursor.fetchone()['count']
-
-            # 3. Total payments amount
-            cursor.execute("SELECT COALESCE(SUM(amount_paid), 0) as total FROM payments")
-            total_payments = cursor.fetchone()['total']
-
-            # 4. Total active cashiers
-            cursor.execute("SELECT COUNT(*) as count FROM users WHERE role = 'cashier' AND is_active = TRUE")
-            total_active_cashiers = cursor.fetchone()['count']
-
-            # 5. Recent activities from logs
-            cursor.execute("""
-                SELECT l.action, l.created_at, u.name as user_name, u.role as role
-                FROM logs l
-                JOIN users u ON l.user_id = u.id
-                ORDER BY l.created_at DESC
-                LIMIT 10
-            """)
-            recent_activities = cursor.fetchall()
-
-            # 6. Payment status breakdown
-            cursor.execute("""
-                SELECT 
-                    s.id,
-                    s.first_name,
-                    s.last_name,
-                    c.price as course_price,
-                    COALESCE(SUM(p.amount_paid), 0) as total_paid,
-                    CASE 
-                        WHEN COALESCE(SUM(p.amount_paid), 0) >= c.price THEN 'fully_paid'
-                        WHEN COALESCE(SUM(p.amount_paid), 0) > 0 THEN 'partially_paid'
-                        ELSE 'unpaid'
-                    END as payment_status
-                FROM students s
-                JOIN courses c ON s.course_id = c.id
-                LEFT JOIN payments p ON s.id = p.student_id
-                WHERE s.is_active = TRUE AND c.is_active = TRUE
-                GROUP BY s.id, c.price
-            """)
-            payment_breakdown = cursor.fetchall()
-
-            # Count payment statuses
-            fully_paid = sum(1 for p in payment_breakdown if p['payment_status'] == 'fully_paid')
-            partially_paid = sum(1 for p in payment_breakdown if p['payment_status'] == 'partially_paid')
-            unpaid = sum(1 for p in payment_breakdown if p['payment_status'] == 'unpaid')
-
-            # Calculate percentages
-            total_for_percentage = max(len(payment_breakdown), 1)  # Avoid division by zero
-            fully_paid_percent = round((fully_paid / total_for_percentage) * 100, 1)
-            partially_paid_percent = round((partially_paid / total_for_percentage) * 100, 1)
-            unpaid_percent = round((unpaid / total_for_percentage) * 100, 1)
-
-            # 7. Monthly revenue data for chart
-            cursor.execute("""
-                SELECT 
-                    YEAR(payment_date) as year,
-                    MONTH(payment_date) as month,
-                    SUM(amount_paid) as monthly_total
-                FROM payments
-                WHERE payment_date >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)
-                GROUP BY YEAR(payment_date), MONTH(payment_date)
-                ORDER BY year, month
-            """)
-            monthly_revenue_data = cursor.fetchall()
-
-            # 8. Recent payments for activities
-            cursor.execute("""
-                SELECT 
-                    p.amount_paid,
-                    p.payment_date,
-                    p.created_at,
-                    CONCAT(s.first_name, ' ', s.last_name) as student_name,
-                    u.name as cashier_name,
-                    p.payment_method
-                FROM payments p
-                JOIN students s ON p.student_id = s.id
-                JOIN users u ON p.collected_by = u.id
-                ORDER BY p.created_at DESC
-                LIMIT 5
-            """)
-            recent_payments = cursor.fetchall()
-
-            # 9. Course enrollment stats
-            cursor.execute("""
-                SELECT 
-                    c.name as course_name,
-                    COUNT(s.id) as enrolled_count
-                FROM courses c
-                LEFT JOIN students s ON c.id = s.course_id AND s.is_active = TRUE
-                WHERE c.is_active = TRUE
-                GROUP BY c.id
-                ORDER BY enrolled_count DESC
-                LIMIT 5
-            """)
-            top_courses = cursor.fetchall()
-
-    finally:
-        connection.close()
-
-    return render_template('admin/dashboard.html',
-                           total_students=total_students,
-                           total_courses=total_courses,
-                           total_payments=float(total_payments),
-                           total_active_cashiers=total_active_cashiers,
-                           recent_activities=recent_activities,
-                           recent_payments=recent_payments,
-                           fully_paid=fully_paid,
-                           partially_paid=partially_paid,
-                           unpaid=unpaid,
-                           fully_paid_percent=fully_paid_percent,
-                           partially_paid_percent=partially_paid_percent,
-                           unpaid_percent=unpaid_percent,
-                           monthly_revenue_data=monthly_revenue_data,
-                           top_courses=top_courses)
+    # Served from the last complete snapshot, under a "stale as of" banner, while
+    # the database is slow or unavailable (see utils/snapshots.py)
+    context, stale_as_of, missing = snapshots.serve('admin.dashboard', dashboard_context)
+    if missing:
+        flash('Some dashboard figures took too long to load and are not shown. Refresh to try again.', 'warning')
+    return render_template('admin/dashboard.html', stale_as_of=stale_as_of, **context)
+
+
+def dashboard_context():
+    """The dashboard's template context, and the names of figures that didn't load."""
+    # The statements are independent, so they run concurrently on pooled
+    # connections; a query that misses the deadline leaves its figure at the default.
+    # Identical reads from concurrent dashboards share one run, and the
+    # school-wide aggregates are cached for DASHBOARD_CACHE_TTL seconds.
+    results, missing = fanout.gather({
+        # 1. Total active students
+        'total_students': fanout.row("SELECT COUNT(*) as count FROM students WHERE is_active = TRUE",
+                                     column='count', coalesce=Config.DASHBOARD_CACHE_TTL),
+        # 2. Total active courses
+        'total_courses': fanout.row("SELECT COUNT(*) as count FROM courses WHERE is_active = TRUE",
+                                    column='count', coalesce=Config.DASHBOARD_CACHE_TTL),
+        # 3. Total payments amount
+        'total_payments': fanout.row(TOTAL_PAYMENTS, column='total', coalesce=Config.DASHBOARD_CACHE_TTL),
+        # 4. Total active cashiers
+        'total_active_cashiers': fanout.row(
+            "SELECT COUNT(*) as count FROM users WHERE role = 'cashier' AND is_active = TRUE",
+            column='count', coalesce=Config.DASHBOARD_CACHE_TTL),
+        # 5. Recent activities from logs
+        'recent_activities': fanout.rows(RECENT_ACTIVITIES, coalesce=0),
+        # 6. Payment status breakdown
+        'payment_breakdown': fanout.rows("""
+            SELECT 
+                s.id,
+                s.first_name,
+                s.last_name,
+                c.price as course_price,
+                COALESCE(SUM(p.amount_paid), 0) as total_paid,
+                CASE 
+                    WHEN COALESCE(SUM(p.amount_paid), 0) >= c.price THEN 'fully_paid'
+                    WHEN COALESCE(SUM(p.amount_paid), 0) > 0 THEN 'partially_paid'
+                    ELSE 'unpaid'
+                END as payment_status
+            FROM students s
+            JOIN courses c ON s.course_id = c.id
+            LEFT JOIN payments p ON s.id = p.student_id
+            WHERE s.is_active = TRUE AND c.is_active = TRUE
+            GROUP BY s.id, c.price
+        """, coalesce=Config.DASHBOARD_CACHE_TTL),
+        # 7. Monthly revenue data for chart (range scan on payment_date; daily
+        # totals are rolled up into months here instead of YEAR()/MONTH() per row)
+        'daily_revenue': fanout.rows(DAILY_REVENUE, date_window('last_12_months'), coalesce=0),
+        # 8. Recent payments for activities
+        'recent_payments': fanout.rows(RECENT_PAYMENTS, coalesce=0),
+        # 9. Course enrollment stats
+        'top_courses': fanout.rows("""
+            SELECT 
+                c.name as course_name,
+                COUNT(s.id) as enrolled_count
+            FROM courses c
+            LEFT JOIN students s ON c.id = s.course_id AND s.is_active = TRUE
+            WHERE c.is_active = TRUE
+            GROUP BY c.id
+            ORDER BY enrolled_count DESC
+            LIMIT 5
+        """, coalesce=Config.DASHBOARD_CACHE_TTL)
+    }, defaults={'total_students': 0, 'total_courses': 0, 'total_payments': 0, 'total_active_cashiers': 0,
+                 'recent_activities': [], 'payment_breakdown': [], 'daily_revenue': [],
+                 'recent_payments': [], 'top_courses': []})
+
+    total_students = results['total_students']
+    total_courses = results['total_courses']
+    total_payments = results['total_payments']
+    total_active_cashiers = results['total_active_cashiers']
+    recent_activities = results['recent_activities']
+    recent_payments = results['recent_payments']
+    top_courses = results['top_courses']
+
+    # Count payment statuses
+    payment_breakdown = results['payment_breakdown']
+    fully_paid = sum(1 for p in payment_breakdown if p['payment_status'] == 'fully_paid')
+    partially_paid = sum(1 for p in payment_breakdown if p['payment_status'] == 'partially_paid')
+    unpaid = sum(1 for p in payment_breakdown if p['payment_status'] == 'unpaid')
+
+    # Calculate percentages
+    total_for_percentage = max(len(payment_breakdown), 1)  # Avoid division by zero
+    fully_paid_percent = round((fully_paid / total_for_percentage) * 100, 1)
+    partially_paid_percent = round((partially_paid / total_for_percentage) * 100, 1)
+    unpaid_percent = round((unpaid / total_for_percentage) * 100, 1)
+
+    monthly_totals = {}
+    for row in results['daily_revenue']:
+        key = (row['payment_date'].year, row['payment_date'].month)
+        monthly_totals[key] = monthly_totals.get(key, 0) + row['daily_total']
+    monthly_revenue_data = [{'year': year, 'month': month, 'monthly_total': total}
+                            for (year, month), total in monthly_totals.items()]
+
+    return {
+        'total_students': total_students,
+        'total_courses': total_courses,
+        'total_payments': float(total_payments),
+        'total_active_cashiers': total_active_cashiers,
+        'recent_activities': recent_activities,
+        'recent_payments': recent_payments,
+        'fully_paid': fully_paid,
+        'partially_paid': partially_paid,
+        'unpaid': unpaid,
+        'fully_paid_percent': fully_paid_percent,
+        'partially_paid_percent': partially_paid_percent,
+        'unpaid_percent': unpaid_percent,
+        'monthly_revenue_data': monthly_revenue_data,
+        'top_courses': top_courses
+    }, missing
 
 
 @admin_bp.route('/students')
 @login_required
 @admin_required
+@admission('report')
 def students():
     connection = get_db_connection()
     """Main students management page with search, filter, and pagination"""
@@ -175,16 +211,8 @@ def students():
                 where_conditions.append("s.is_active = FALSE")
             # 'all' shows both active and inactive
 
-            # Search functionality
+            # Search (ranked ids from the student search index; applied below)
             search = request.args.get('search', '').strip()
-            if search:
-                where_conditions.append("""
-                    (s.student_id LIKE %s OR 
-                     CONCAT(s.first_name, ' ', s.last_name) LIKE %s OR 
-                     s.email LIKE %s)
-                """)
-                search_param = f"%{search}%"
-                params.extend([search_param, search_param, search_param])
 
             # Course filter
             course_filter = request.args.get('course_filter', '').strip()
@@ -195,34 +223,6 @@ def students():
             # Payment status filter
             payment_status_filter = request.args.get('payment_status_filter', '').strip()
 
-            # Base query with JOINs
-            where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
-
-            # Create the main query
-            main_query = f"""
-                SELECT 
-                    s.id,
-                    s.student_id,
-                    s.first_name,
-                    s.last_name,
-                    s.email,
-                    s.phone,
-                    s.address,
-                    s.course_id,
-                    s.enrollment_date,
-                    s.is_active,
-                    c.name as course_name,
-                    c.price as course_price,
-                    COALESCE(SUM(p.amount_paid), 0) as total_paid
-                FROM students s
-                LEFT JOIN courses c ON s.course_id = c.id
-                LEFT JOIN payments p ON s.id = p.student_id
-                {where_clause}
-                GROUP BY s.id, s.student_id, s.first_name, s.last_name, s.email, 
-                         s.phone, s.address, s.course_id, s.enrollment_date, s.is_active,
-                         c.name, c.price
-            """
-
             # Add payment status filter using HAVING clause
             having_clause = ""
             if payment_status_filter:
@@ -233,23 +233,64 @@ def students():
                 elif payment_status_filter == 'unpaid':
                     having_clause = " HAVING COALESCE(SUM(p.amount_paid), 0) = 0"
 
-            # Complete query with having clause
-            complete_query = main_query + having_clause
-
-            # Get total count for pagination (wrap the complete query in a subquery)
-            count_query = f"SELECT COUNT(*) as total FROM ({complete_query}) as filtered_students"
-            cursor.execute(count_query, params)
-            total_students = cursor.fetchone()['total']
+            def student_query(conditions):
+                # Base query with JOINs, the WHERE conditions and the payment status HAVING clause
+                where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
+                return f"""
+                    SELECT 
+                        s.id,
+                        s.student_id,
+                        s.first_name,
+                        s.last_name,
+                        s.email,
+                        s.phone,
+                        s.address,
+                        s.course_id,
+                        s.enrollment_date,
+                        s.is_active,
+                        c.name as course_name,
+                        c.price as course_price,
+                        COALESCE(SUM(p.amount_paid), 0) as total_paid
+                    FROM students s
+                    LEFT JOIN courses c ON s.course_id = c.id
+                    LEFT JOIN payments p ON s.id = p.student_id
+                    {where_clause}
+                    GROUP BY s.id, s.student_id, s.first_name, s.last_name, s.email, 
+                             s.phone, s.address, s.course_id, s.enrollment_date, s.is_active,
+                             c.name, c.price
+                """ + having_clause
 
             # Pagination setup
-            page = request.args.get('page', 1, type=int)
+            page = max(1, request.args.get('page', 1, type=int))
             per_page = 10
             offset = (page - 1) * per_page
 
-            # Get paginated results
-            paginated_query = f"{complete_query} ORDER BY s.created_at DESC LIMIT %s OFFSET %s"
-            cursor.execute(paginated_query, params + [per_page, offset])
-            students = cursor.fetchall()
+            if search:
+                # Paginate over the ranked ids; only the current page's ids go into the page query
+                active = {'active': True, 'inactive': False}.get(status_filter)
+                search_ids = search_students(search, active=active, cursor=cursor)
+                if course_filter or payment_status_filter:
+                    condition, search_params = id_filter(search_ids)
+                    cursor.execute(f"SELECT id FROM ({student_query(where_conditions + [condition])}) as filtered_students",
+                                   params + search_params)
+                    search_ids = [row['id'] for row in in_rank_order(cursor.fetchall(), search_ids)]
+                total_students = len(search_ids)
+                page_ids = search_ids[offset:offset + per_page]
+                condition, search_params = id_filter(page_ids)
+                cursor.execute(student_query(where_conditions + [condition]), params + search_params)
+                students = in_rank_order(cursor.fetchall(), page_ids)
+            else:
+                complete_query = student_query(where_conditions)
+
+                # Get total count for pagination (wrap the complete query in a subquery)
+                count_query = f"SELECT COUNT(*) as total FROM ({complete_query}) as filtered_students"
+                cursor.execute(count_query, params)
+                total_students = cursor.fetchone()['total']
+
+                # Get paginated results
+                paginated_query = f"{complete_query} ORDER BY s.created_at DESC LIMIT %s OFFSET %s"
+                cursor.execute(paginated_query, params + [per_page, offset])
+                students = cursor.fetchall()
 
             # Get statistics for all students (not filtered)
             stats_query = """
@@ -409,6 +450,7 @@ def add_student():
             ))
 
             connection.commit()
+            refresh_students(cursor, [cursor.lastrowid])
             flash('Student added successfully!', 'success')
 
     except Exception as e:
@@ -509,6 +551,7 @@ def update_student(student_id):
             ))
 
             connection.commit()
+            refresh_students(cursor, [student_id])
             flash('Student updated successfully!', 'success')
 
     except Exception as e:
@@ -535,6 +578,7 @@ def deactivate_student(student_id):
             # Deactivate student
             cursor.execute("UPDATE students SET is_active = FALSE, updated_at = NOW() WHERE id = %s", (student_id,))
             connection.commit()
+            refresh_students(cursor, [student_id])
 
             return jsonify({'success': True, 'message': 'Student deactivated successfully'})
 
@@ -560,6 +604,7 @@ def activate_student(student_id):
             # Activate student
             cursor.execute("UPDATE students SET is_active = TRUE, updated_at = NOW() WHERE id = %s", (student_id,))
             connection.commit()
+            refresh_students(cursor, [student_id])
 
             return jsonify({'success': True, 'message': 'Student activated successfully'})
 
@@ -574,7 +619,7 @@ def generate_student_id():
     try:
         connection = get_db_connection()
         with connection.cursor() as cursor:
-            current_year = datetime.now().year
+            current_year = time_windows.now().year
 
             # Get the last student ID for current year
             cursor.execute("""
@@ -596,7 +641,7 @@ def generate_student_id():
 
     except Exception:
         # Fallback to basic format
-        return f'STU-{datetime.now().year}-00001'
+        return f'STU-{time_windows.now().year}-00001'
     finally:
         connection.close()
 
@@ -612,7 +657,15 @@ def generate_next_student_id():
 @admin_bp.route('/courses')
 @login_required
 @admin_required
+@query_budget(6)
 def courses():
+    # Served from the last snapshot while the database is slow or unavailable
+    context, stale_as_of, _ = snapshots.serve('admin.courses', courses_context)
+    return render_template('admin/manage_courses.html', stale_as_of=stale_as_of, **context)
+
+
+def courses_context():
+    """The course list and enrollment statistics for manage_courses.html."""
     connection = get_db_connection()
     try:
         with connection.cursor() as cursor:
@@ -667,12 +720,13 @@ def courses():
     finally:
         connection.close()
 
-    return render_template('admin/manage_courses.html',
-                           courses=courses,
-                           total_students=total_students,
-                           total_revenue=total_revenue,
-                           avg_students=avg_students,
-                           course_students=course_students)
+    return {
+        'courses': courses,
+        'total_students': total_students,
+        'total_revenue': total_revenue,
+        'avg_students': avg_students,
+        'course_students': course_students
+    }, []
 
 
 @admin_bp.route('/courses/add', methods=['POST'])
@@ -907,6 +961,7 @@ def get_course_details(course_id):
 @admin_bp.route('/courses/<int:course_id>/students', methods=['GET'])
 @login_required
 @admin_required
+@admission('report', json=True)
 def get_course_students(course_id):
     """API endpoint to get students enrolled in a course"""
     connection = get_db_connection()
@@ -1099,6 +1154,8 @@ def resend_credentials(cashier_id):
         else:
             flash('Error generating new credentials. Please try again.', 'error')
 
+    except PasswordPoolBusy:
+        flash(BUSY_MESSAGE, 'error')
     except Exception as e:
         flash('Error resending credentials. Please try again.', 'error')
         print(f"Error resending credentials: {e}")
@@ -1152,28 +1209,49 @@ def delete_cashier(cashier_id):
     return redirect(url_for('admin.cashiers'))
 
 
+LOG_DATE_FILTERS = ('today', 'yesterday', 'week', 'month')
+
+
 @admin_bp.route('/logs')
 @login_required
 @admin_required
+@admission('report')
 def logs():
     """Display system logs with pagination"""
     connection = get_db_connection()
     try:
         with connection.cursor() as cursor:
-            # Build query with filters
+            # Filter dropdowns come from the small lookup tables, not from scanning logs
+            action_types = log_types.list_action_types(cursor)
+            available_roles = log_types.list_roles(cursor)
+
+            # Build query with filters; every condition maps to an indexed logs column
             where_conditions = []
             params = []
 
-            # Search functionality
+            # Search functionality: resolve the text against users and the lookup
+            # tables first, then match logs by id. The action text is matched by
+            # prefix (idx_logs_action); anywhere in the text only when a date
+            # filter bounds the rows scanned
             search = request.args.get('search', '').strip()
+            date_filter = request.args.get('date_filter', '').strip()
             if search:
-                where_conditions.append("""
-                    (u.name LIKE %s OR 
-                     l.action LIKE %s OR 
-                     l.role LIKE %s)
-                """)
                 search_param = f"%{search}%"
-                params.extend([search_param, search_param, search_param])
+                cursor.execute("SELECT id FROM users WHERE name LIKE %s OR email LIKE %s",
+                               (search_param, search_param))
+                user_ids = [row['id'] for row in cursor.fetchall()]
+                type_ids = [t['id'] for t in action_types
+                            if search.lower() in t['label'].lower() or search.lower() in t['code']]
+                roles = [role for role in available_roles if search.lower() in role.lower()]
+
+                search_conditions = ["l.action LIKE %s"]
+                escaped = search.replace('\\', '\\\\').replace('%', r'\%').replace('_', r'\_')
+                params.append(f"%{escaped}%" if date_filter in LOG_DATE_FILTERS else f"{escaped}%")
+                for column, values in (('l.user_id', user_ids), ('l.action_type_id', type_ids), ('l.role', roles)):
+                    if values:
+                        search_conditions.append(f"{column} IN ({', '.join(['%s'] * len(values))})")
+                        params.extend(values)
+                where_conditions.append(f"({' OR '.join(search_conditions)})")
 
             # Role filter
             role_filter = request.args.get('role_filter', '').strip()
@@ -1183,28 +1261,16 @@ def logs():
 
             # Action filter
             action_filter = request.args.get('action_filter', '').strip()
-            if action_filter:
-                if action_filter == 'login':
-                    where_conditions.append("l.action LIKE %s")
-                    params.append("%login%")
-                elif action_filter == 'logout':
-                    where_conditions.append("l.action LIKE %s")
-                    params.append("%logout%")
-                else:
-                    where_conditions.append("l.action = %s")
-                    params.append(action_filter)
+            type_id = next((t['id'] for t in action_types if t['code'] == action_filter), None)
+            if type_id is not None:  # unknown codes are ignored
+                where_conditions.append("l.action_type_id = %s")
+                params.append(type_id)
 
-            # Date filter
-            date_filter = request.args.get('date_filter', '').strip()
-            if date_filter:
-                if date_filter == 'today':
-                    where_conditions.append("DATE(l.created_at) = CURDATE()")
-                elif date_filter == 'yesterday':
-                    where_conditions.append("DATE(l.created_at) = DATE_SUB(CURDATE(), INTERVAL 1 DAY)")
-                elif date_filter == 'week':
-                    where_conditions.append("l.created_at >= DATE_SUB(NOW(), INTERVAL 7 DAY)")
-                elif date_filter == 'month':
-                    where_conditions.append("l.created_at >= DATE_SUB(NOW(), INTERVAL 30 DAY)")
+            # Date filter (ranges on created_at, so the index and partition pruning apply)
+            if date_filter in LOG_DATE_FILTERS:
+                condition, date_params = range_condition('l.created_at', date_filter)
+                where_conditions.append(condition)
+                params.extend(date_params)
 
             # Build WHERE clause
             where_clause = ""
@@ -1212,14 +1278,18 @@ def logs():
                 where_clause = "WHERE " + " AND ".join(where_conditions)
 
             # Pagination setup
-            page = request.args.get('page', 1, type=int)
+            page = max(1, request.args.get('page', 1, type=int))
             per_page = 10
             offset = (page - 1) * per_page
 
-            # Get total count for pagination
-            count_query = f"SELECT COUNT(*) as total FROM logs l LEFT JOIN users u ON l.user_id = u.id {where_clause}"
-            cursor.execute(count_query, params)
-            total_logs = cursor.fetchone()['total']
+            # Get total count for pagination (filters no longer need the users join);
+            # unfiltered, the log_stats counters already hold it
+            if where_clause:
+                count_query = f"SELECT COUNT(*) as total FROM logs l {where_clause}"
+                cursor.execute(count_query, params)
+                total_logs = cursor.fetchone()['total']
+            else:
+                total_logs = log_stats.total_logs(cursor)
 
             # Get paginated logs
             logs_query = f"""
@@ -1228,10 +1298,14 @@ def logs():
                     l.user_id,
                     l.action,
                     l.role,
+                    l.target_type,
+                    l.target_id,
                     l.created_at,
-                    u.name as user_name
+                    u.name as user_name,
+                    t.code as action_type
                 FROM logs l
                 LEFT JOIN users u ON l.user_id = u.id
+                LEFT JOIN log_action_types t ON l.action_type_id = t.id
                 {where_clause}
                 ORDER BY l.created_at DESC
                 LIMIT %s OFFSET %s
@@ -1239,22 +1313,8 @@ def logs():
             cursor.execute(logs_query, params + [per_page, offset])
             logs = cursor.fetchall()
 
-            # Get available roles for filter dropdown
-            roles_query = "SELECT DISTINCT role FROM logs WHERE role IS NOT NULL AND role != '' ORDER BY role"
-            cursor.execute(roles_query)
-            available_roles = [row['role'] for row in cursor.fetchall()]
-
-            # Get statistics (for all logs, not filtered)
-            stats_query = """
-                SELECT 
-                    COUNT(*) as total_logs,
-                    COUNT(CASE WHEN DATE(l.created_at) = CURDATE() THEN 1 END) as today_count,
-                    COUNT(CASE WHEN l.created_at >= DATE_SUB(NOW(), INTERVAL 1 HOUR) THEN 1 END) as recent_count,
-                    COUNT(DISTINCT l.user_id) as unique_users
-                FROM logs l
-            """
-            cursor.execute(stats_query)
-            stats = cursor.fetchone()
+            # Get statistics (for all logs, not filtered) from the incremental counters
+            stats = log_stats.get_statistics(cursor)
 
             # Create pagination object (same as manage students)
             class Pagination:
@@ -1289,10 +1349,11 @@ def logs():
                                    logs=logs,
                                    pagination=pagination,
                                    available_roles=available_roles,
+                                   action_types=action_types,
                                    today_count=stats['today_count'],
                                    unique_users=stats['unique_users'],
                                    recent_count=stats['recent_count'],
-                                   now=datetime.now())
+                                   now=time_windows.now())
 
     except Exception as e:
         flash(f'Error loading logs: {str(e)}', 'error')
@@ -1300,10 +1361,11 @@ def logs():
                                logs=[],
                                pagination=None,
                                available_roles=[],
+                               action_types=[],
                                today_count=0,
                                unique_users=0,
                                recent_count=0,
-                               now=datetime.now())
+                               now=time_windows.now())
     finally:
         connection.close()
 
@@ -1312,32 +1374,72 @@ def logs():
 @login_required
 @admin_required
 def clear_old_logs():
-    """Clear logs older than 90 days"""
-    connection = get_db_connection()
-    try:
-        with connection.cursor() as cursor:
-            delete_query = "DELETE FROM logs WHERE created_at < DATE_SUB(NOW(), INTERVAL 90 DAY)"
-            cursor.execute(delete_query)
-            deleted_count = cursor.rowcount
-            connection.commit()
-
-            return jsonify({
-                'success': True,
-                'message': f'Successfully cleared {deleted_count} old log entries'
-            })
-    except Exception as e:
-        connection.rollback()
+    """Start archiving and clearing logs older than 90 days in the background"""
+    if retention_job.start(days=Config.LOG_RETENTION_DAYS):
         return jsonify({
-            'success': False,
-            'message': 'Error clearing old logs'
-        }), 500
-    finally:
-        connection.close()
+            'success': True,
+            'message': 'Clearing old log entries in the background'
+        })
+    return jsonify({
+        'success': False,
+        'message': 'Old logs are already being cleared'
+    }), 409
+
+
+@admin_bp.route('/logs/clear/status')
+@login_required
+@admin_required
+def clear_old_logs_status():
+    """Progress of the current or last log clearing run"""
+    return jsonify(retention_job.state)
+
+
+@admin_bp.route('/perf')
+@login_required
+@admin_required
+def perf():
+    """Top endpoints by database time (sampled requests, this worker only)"""
+    return render_template('admin/perf.html',
+                           endpoints=sql_instrumentation.endpoint_summaries(limit=25),
+                           sample_rate=Config.SQL_SAMPLE_RATE,
+                           now=time_windows.now())
+
+
+@admin_bp.route('/perf/reset', methods=['POST'])
+@login_required
+@admin_required
+def reset_perf():
+    """Clear the collected request timings"""
+    sql_instrumentation.reset()
+    flash('Performance statistics cleared.', 'success')
+    return redirect(url_for('admin.perf'))
+
+
+@admin_bp.route('/slow-queries')
+@login_required
+@admin_required
+def slow_queries_view():
+    """Slow statements grouped by fingerprint, with their latest EXPLAIN plan"""
+    return render_template('admin/slow_queries.html',
+                           queries=slow_queries.get_store().summaries(limit=50),
+                           threshold_ms=Config.SLOW_QUERY_MS,
+                           now=time_windows.now())
+
+
+@admin_bp.route('/slow-queries/clear', methods=['POST'])
+@login_required
+@admin_required
+def clear_slow_queries():
+    """Empty the slow-query log"""
+    slow_queries.get_store().clear()
+    flash('Slow-query log cleared.', 'success')
+    return redirect(url_for('admin.slow_queries_view'))
 
 
 @admin_bp.route('/profile')
 @login_required
 @admin_required
+@query_budget(7)
 def profile():
     """Display admin profile page"""
     try:
@@ -1361,14 +1463,11 @@ def profile():
             cursor.execute("SELECT COUNT(*) as count FROM users WHERE is_active = TRUE")
             total_users = cursor.fetchone()['count']
 
-            cursor.execute("""
-                SELECT COUNT(*) as count FROM payments 
-                WHERE payment_date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
-            """)
+            condition, date_params = range_condition('payment_date', 'month', dates=True)
+            cursor.execute(f"SELECT COUNT(*) as count FROM payments WHERE {condition}", date_params)
             recent_payments = cursor.fetchone()['count']
 
-            cursor.execute("SELECT COUNT(*) as count FROM logs")
-            total_logs = cursor.fetchone()['count']
+            total_logs = log_stats.total_logs(cursor)
 
             stats = {
                 'total_students': total_students,
@@ -1473,15 +1572,13 @@ def change_password():
                     flash('User not found', 'error')
                     return redirect(url_for('admin.profile'))
 
-                # Verify current password (you'll need to import werkzeug.security)
-                from werkzeug.security import check_password_hash, generate_password_hash
-
-                if not check_password_hash(user['password_hash'], current_password):
+                # Verify current password
+                if not verify_password(user['password_hash'], current_password):
                     flash('Current password is incorrect', 'error')
                     return redirect(url_for('admin.profile'))
 
                 # Update password
-                new_password_hash = generate_password_hash(new_password)
+                new_password_hash = hash_password(new_password)
                 cursor.execute("""
                     UPDATE users 
                     SET password_hash = %s, updated_at = CURRENT_TIMESTAMP
@@ -1495,6 +1592,8 @@ def change_password():
         finally:
             connection.close()
 
+    except PasswordPoolBusy:
+        flash(BUSY_MESSAGE, 'error')
     except Exception as e:
         flash(f'Error changing password: {str(e)}', 'error')
 
@@ -2,15 +2,19 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from models.user import User
 from utils.email_utils import send_otp_email
 from utils.helpers import generate_otp, log_activity
-import pymysql
-from config import Config
-from datetime import datetime, timedelta
-from database.init_db import get_db_connection
+from utils.rate_limit import rate_limit
+from models.otp_store import get_otp_store
 
 auth_bp = Blueprint('auth', __name__)
 
 
+OTP_WAIT_MESSAGE = 'Please wait 60 seconds before requesting another OTP.'
+
+
 @auth_bp.route('/forgot-password', methods=['GET', 'POST'])
+@rate_limit(10, 3600, key='ip', template='forgot_password.html')
+@rate_limit(1, 60, key='email', scope='otp_send', template='forgot_password.html', message=OTP_WAIT_MESSAGE)
+@rate_limit(5, 3600, key='email', scope='otp_send_hourly', template='forgot_password.html')
 def forgot_password():
     if request.method == 'POST':
         email = request.form.get('email')
@@ -25,23 +29,11 @@ def forgot_password():
             flash('If this email exists in our system, you will receive an OTP shortly.', 'info')
             return render_template('forgot_password.html')
 
-        # Generate OTP
+        # Generate OTP and save it (replaces any earlier OTP for this email)
         otp = generate_otp()
-        expires_at = datetime.now() + timedelta(minutes=10)
-
-        # Save OTP to database
-        connection = get_db_connection()
-        try:
-            with connection.cursor() as cursor:
-                cursor.execute('''
-                    INSERT INTO password_resets (email, otp, expires_at)
-                    VALUES (%s, %s, %s)
-                ''', (email, otp, expires_at))
-                connection.commit()
-        finally:
-            connection.close()
-
-        # Send OTP email
+        get_otp_store().issue(email, otp)
+
+        # Send OTP email inline: the user waits for the code, so a failure must show here
         if send_otp_email(email, otp):
             session['reset_email'] = email
             flash('OTP has been sent to your email address.', 'success')
@@ -53,6 +45,7 @@ def forgot_password():
 
 
 @auth_bp.route('/verify-otp', methods=['GET', 'POST'])
+@rate_limit(5, 600, key='email', template='verify_otp.html', message='Too many OTP attempts. Please wait a few minutes and try again.')
 def verify_otp():
     if 'reset_email' not in session:
         return redirect(url_for('auth.forgot_password'))
@@ -65,27 +58,19 @@ def verify_otp():
             return render_template('verify_otp.html')
 
         # Verify OTP
-        connection = get_db_connection()
-        try:
-            with connection.cursor() as cursor:
-                cursor.execute('''
-                    SELECT id FROM password_resets 
-                    WHERE email = %s AND otp = %s AND expires_at > NOW() AND is_used = FALSE
-                    ORDER BY created_at DESC LIMIT 1
-                ''', (session['reset_email'], otp))
-
-                if cursor.fetchone():
-                    session['otp_verified'] = True
-                    return redirect(url_for('auth.reset_password'))
-                else:
-                    flash('Invalid or expired OTP.', 'error')
-        finally:
-            connection.close()
+        if get_otp_store().verify(session['reset_email'], otp):
+            session['otp_verified'] = True
+            return redirect(url_for('auth.reset_password'))
+        else:
+            flash('Invalid or expired OTP.', 'error')
 
     return render_template('verify_otp.html')
 
 
 @auth_bp.route('/resend-otp', methods=['POST'])
+@rate_limit(20, 3600, key='ip')
+@rate_limit(1, 60, key='email', scope='otp_send', message=OTP_WAIT_MESSAGE)
+@rate_limit(5, 3600, key='email', scope='otp_send_hourly')
 def resend_otp():
     """Resend OTP for password reset"""
     if 'reset_email' not in session:
@@ -93,62 +78,30 @@ def resend_otp():
 
     email = session['reset_email']
 
-    # Check rate limiting - only allow resend every 60 seconds
-    connection = get_db_connection()
+    # Resends are limited to one every 60 seconds by the otp_send rate limit
     try:
-        with connection.cursor() as cursor:
-            # Check if there's a recent OTP (within last minute)
-            cursor.execute('''
-                SELECT created_at FROM password_resets 
-                WHERE email = %s AND created_at > %s
-                ORDER BY created_at DESC LIMIT 1
-            ''', (email, datetime.now() - timedelta(minutes=1)))
-
-            recent_otp = cursor.fetchone()
-            if recent_otp:
-                return jsonify({
-                    'success': False,
-                    'message': 'Please wait 60 seconds before requesting another OTP.'
-                }), 429
-
-            # Generate new OTP
-            otp = generate_otp()
-            expires_at = datetime.now() + timedelta(minutes=10)
-
-            # Mark old OTPs as used
-            cursor.execute('''
-                UPDATE password_resets SET is_used = TRUE 
-                WHERE email = %s AND is_used = FALSE
-            ''', (email,))
-
-            # Insert new OTP
-            cursor.execute('''
-                INSERT INTO password_resets (email, otp, expires_at)
-                VALUES (%s, %s, %s)
-            ''', (email, otp, expires_at))
-
-            connection.commit()
-
-            # Send OTP email
-            if send_otp_email(email, otp):
-                return jsonify({
-                    'success': True,
-                    'message': 'New OTP has been sent to your email address.'
-                })
-            else:
-                return jsonify({
-                    'success': False,
-                    'message': 'Failed to send OTP. Please try again.'
-                }), 500
+        # Generate new OTP (replaces the old one)
+        otp = generate_otp()
+        get_otp_store().issue(email, otp)
+
+        # Send OTP email inline: the user waits for the code, so a failure must show here
+        if send_otp_email(email, otp):
+            return jsonify({
+                'success': True,
+                'message': 'New OTP has been sent to your email address.'
+            })
+        else:
+            return jsonify({
+                'success': False,
+                'message': 'Failed to send OTP. Please try again.'
+            }), 500
 
     except Exception as e:
-        connection.rollback()
+        print(f"Error resending OTP: {e}")
         return jsonify({
             'success': False,
             'message': 'An error occurred. Please try again.'
         }), 500
-    finally:
-        connection.close()
 
 
 @auth_bp.route('/reset-password', methods=['GET', 'POST'])
@@ -187,21 +140,15 @@ def reset_password():
 
         # Update password
         if User.update_password(session['reset_email'], password):
-            # Mark OTP as used
-            connection = get_db_connection()
-            try:
-                with connection.cursor() as cursor:
-                    cursor.execute('''
-                        UPDATE password_resets SET is_used = TRUE 
-                        WHERE email = %s AND is_used = FALSE
-                    ''', (session['reset_email'],))
-                    connection.commit()
-            finally:
-                connection.close()
+            # Consume the OTP so it cannot be used again
+            get_otp_store().consume(session['reset_email'])
 
             # Log the activity
             try:
-                log_activity(session['reset_email'], 'password_reset', 'Password reset successfully')
+                user = User.get_by_email(session['reset_email'])
+                if user:
+                    log_activity(user.id, f"Password reset: {user.email}", role=user.role,
+                                 action_type='password_reset', target_type='user', target_id=user.id)
             except:
                 pass  # Don't fail if logging fails
 
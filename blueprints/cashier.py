@@ -1,163 +1,253 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import login_required, current_user
 from utils.helpers import log_activity, cashier_required
+from utils.admission import admission
 from models.user import User
 import pymysql
 from config import Config
-from datetime import date
 from database.init_db import get_db_connection
+from database import fanout
 from flask import send_file
 import io
-import pandas as pd
 from flask import jsonify, request
 from decimal import Decimal
 import re
-from werkzeug.security import check_password_hash, generate_password_hash
+from utils.passwords import hash_password, verify_password, PasswordPoolBusy, BUSY_MESSAGE
+from utils.student_search import search_students, id_filter, in_rank_order
+from utils.time_windows import range_sql, date_window, window, today
+from utils.statements import statement, sample_id
+from models import student_balances
+from utils import metrics, snapshots
+import json
 
 cashier_bp = Blueprint('cashier', __name__)
 
+TYPEAHEAD_FIELDS = ['id', 'sid', 'name', 'course', 'totalFee', 'paidAmount', 'balance']
+
+# Hot-path statements with plan expectations (see utils/statements.py)
+TODAY_TOTALS = statement('cashier.dashboard.today', f'''
+    SELECT 
+        COALESCE(SUM(amount_paid), 0) as total_collected,
+        COUNT(*) as payment_count
+    FROM payments
+    WHERE {range_sql('payment_date')}
+''', sample=lambda cursor: date_window('today'), indexes={'payments': 'idx_payments_payment_date'})
+
+MONTHLY_BY_CASHIER = statement('cashier.dashboard.monthly', f'''
+    SELECT 
+        COALESCE(SUM(amount_paid), 0.00) AS total_monthly_collected,
+        COUNT(*) AS monthly_payment_count
+    FROM payments
+    WHERE collected_by = %s
+      AND {range_sql('payment_date')}
+''', sample=lambda cursor: sample_id('users', "role = 'cashier'")(cursor) + date_window('this_month'),
+    indexes={'payments': ('idx_payments_payment_date', 'collected_by')})
+
+STUDENT_LOOKUP = statement('cashier.api_search_student.lookup', '''
+    SELECT s.id, s.student_id, s.full_name AS name,
+           c.name AS course,
+           c.price AS total_due,  -- Total due is the course price
+           COALESCE(SUM(p.amount_paid), 0) AS total_paid  -- Total paid from payments
+    FROM students s
+    LEFT JOIN courses c ON s.course_id = c.id
+    LEFT JOIN payments p ON s.id = p.student_id
+    WHERE s.id = %s
+    GROUP BY s.id, c.id  -- Group by student and course
+''', sample=sample_id('students'), indexes={'students': 'PRIMARY', 'payments': 'student_id'}, max_rows=1000)
+
+STUDENT_TOTAL_DUE = statement('cashier.collect_payment.total_due', '''
+    SELECT 
+        s.id AS student_id,
+        s.full_name AS name,
+        c.price AS total_due
+    FROM students s
+    LEFT JOIN courses c ON s.course_id = c.id
+    WHERE s.id = %s
+''', sample=sample_id('students'), indexes={'students': 'PRIMARY', 'courses': 'PRIMARY'}, max_rows=1)
+
+STUDENT_PAYMENTS = statement('cashier.payment_history.payments', '''
+    SELECT p.*, u.name as collected_by_name
+    FROM payments p
+    JOIN users u ON p.collected_by = u.id
+    WHERE p.student_id = %s
+    ORDER BY p.payment_date DESC, p.created_at DESC
+''', sample=sample_id('students'), indexes={'payments': 'student_id'}, max_rows=1000)
+
+PAYMENTS_SINCE = statement('cashier.payment_history_all.period_total', f'''
+    SELECT COALESCE(SUM(amount_paid), 0.00) as period_total
+    FROM payments
+    WHERE {range_sql('created_at')}
+''', sample=lambda cursor: window('today'), indexes={'payments': 'idx_payments_created_at'})
+
+PAYMENT_HISTORY_PAGE = statement('cashier.payment_history_all.page', '''
+    WITH StudentPayments AS (
+        SELECT 
+            p.student_id,
+            SUM(p.amount_paid) AS total_paid,
+            MAX(p.created_at) AS last_payment_date
+        FROM payments p
+        GROUP BY p.student_id
+    )
+    SELECT 
+        p.id,
+        p.created_at AS datetime,
+        s.full_name AS student,
+        s.student_id AS student_number,
+        c.name AS course,
+        p.amount_paid AS amount,
+        p.payment_method AS method,
+        CASE 
+            WHEN p.created_at = sp.last_payment_date AND sp.total_paid >= c.price THEN 'paid'
+            WHEN sp.total_paid > 0 THEN 'partial'
+            ELSE 'unpaid'
+        END AS status,
+        p.notes,
+        u.name AS collected_by
+    FROM payments p
+    JOIN students s ON p.student_id = s.id
+    LEFT JOIN courses c ON s.course_id = c.id
+    LEFT JOIN users u ON p.collected_by = u.id
+    JOIN StudentPayments sp ON p.student_id = sp.student_id
+    ORDER BY p.created_at DESC
+    LIMIT %s OFFSET %s
+''', sample=(25, 0), full_scan_ok='StudentPayments totals every payment per student')
+
 
 @cashier_bp.route('/dashboard')
 @login_required
 @cashier_required
+@admission('dashboard')
 def dashboard():
-    connection = get_db_connection()
-    try:
-        with connection.cursor() as cursor:
-            # Get total students
-            cursor.execute("SELECT COUNT(*) as count FROM students WHERE is_active = TRUE")
-            total_students = cursor.fetchone()['count']
-
-            # Get payment status counts
-            cursor.execute('''
-                SELECT 
-                    s.id,
-                    c.price as total_fee,
-                    COALESCE(SUM(p.amount_paid), 0) as amount_paid
-                FROM students s
-                JOIN courses c ON s.course_id = c.id
-                LEFT JOIN payments p ON s.id = p.student_id
-                WHERE s.is_active = TRUE
-                GROUP BY s.id, c.price
-            ''')
-
-            students_data = cursor.fetchall()
-            paid_count = 0
-            partial_count = 0
-            unpaid_count = 0
-
-            for student in students_data:
-                if student['amount_paid'] >= student['total_fee']:
-                    paid_count += 1
-                elif student['amount_paid'] > 0:
-                    partial_count += 1
-                else:
-                    unpaid_count += 1
-
-            # Total payments collected today by this cashier
-            cursor.execute('''
-                SELECT 
-                    COALESCE(SUM(amount_paid), 0) as total_collected,
-                    COUNT(*) as payment_count
-                FROM payments
-                WHERE payment_date >= CURDATE()
-                  AND payment_date < CURDATE() + INTERVAL 1 DAY
-            ''')
-            today_stats = cursor.fetchone()
-
-            # Total pending amount (partial + unpaid)
-            cursor.execute('''
-                SELECT 
-                    COALESCE(SUM(c.price) - SUM(p.amount_paid), 0.00) AS total_pending_amount,
-                    COUNT(*) AS pending_count
-                FROM students s
-                JOIN courses c ON s.course_id = c.id
-                LEFT JOIN payments p ON s.id = p.student_id
-                WHERE s.is_active = TRUE
-                GROUP BY s.id
-                HAVING SUM(c.price) > COALESCE(SUM(p.amount_paid), 0)
-            ''')
-            pending_stats = cursor.fetchone()
-
-            # For displaying monthly
-            cursor.execute('''
-                SELECT 
-                    COALESCE(SUM(amount_paid), 0.00) AS total_monthly_collected,
-                    COUNT(*) AS monthly_payment_count
-                FROM payments
-                WHERE collected_by = %s
-                  AND payment_date >= DATE_FORMAT(CURDATE(), '%%Y-%%m-01')
-                  AND payment_date < DATE_FORMAT(CURDATE() + INTERVAL 1 MONTH, '%%Y-%%m-01')
-            ''', (current_user.id,))
-            monthly_stats = cursor.fetchone()
-
-            # For the payment method to display dynamically
-            cursor.execute("""
-                SELECT payment_method, COUNT(*) AS count
-                FROM payments
-                GROUP BY payment_method
-            """)
-            results = cursor.fetchall()
-
-            # Default counts
-            data = {
-                'cash': 0,
-                'gcash': 0,
-                'bank': 0,
-            }
-
-            total = 0
-
-            for row in results:
-                method = row['payment_method'].lower()
-                count = row['count']
-                total += count
-
-                if 'cash' == method:
-                    data['cash'] += count
-                elif 'gcash' == method or 'maya' in method:
-                    data['gcash'] += count
-                elif 'bank' in method:
-                    data['bank'] += count
-
-            # Compute percentages
-            percentages = {
-                'cash': round((data['cash'] / total) * 100) if total else 0,
-                'gcash': round((data['gcash'] / total) * 100) if total else 0,
-                'bank': round((data['bank'] / total) * 100) if total else 0,
-            }
-
-            # For recent payments
-            cursor.execute('''
-                WITH StudentPayments AS (
-                    SELECT 
-                        p.student_id,
-                        SUM(p.amount_paid) AS total_paid,
-                        MAX(p.created_at) AS last_payment_date
-                    FROM payments p
-                    GROUP BY p.student_id
-                )
+    # Served from the last complete snapshot, under a "stale as of" banner, while
+    # the database is slow or unavailable (see utils/snapshots.py)
+    user_id = current_user.id
+    context, stale_as_of, missing = snapshots.serve(f'cashier.dashboard:{user_id}',
+                                                    lambda: dashboard_context(user_id))
+    if missing:
+        flash('Some dashboard figures took too long to load and are not shown. Refresh to try again.', 'warning')
+    return render_template('cashier/dashboard.html', stale_as_of=stale_as_of, **context)
+
+
+def dashboard_context(user_id):
+    """The dashboard's template context for one cashier, and the names of figures that didn't load."""
+    # Independent statements, run concurrently on pooled connections (see database/fanout.py).
+    # Every cashier opens this at the start of the day: identical reads share one run,
+    # and the school-wide aggregates are cached for DASHBOARD_CACHE_TTL seconds.
+    results, missing = fanout.gather({
+        # Get total students
+        'total_students': fanout.row("SELECT COUNT(*) as count FROM students WHERE is_active = TRUE",
+                                     column='count', coalesce=Config.DASHBOARD_CACHE_TTL),
+        # Get payment status counts
+        'students_data': fanout.rows('''
+            SELECT 
+                s.id,
+                c.price as total_fee,
+                COALESCE(SUM(p.amount_paid), 0) as amount_paid
+            FROM students s
+            JOIN courses c ON s.course_id = c.id
+            LEFT JOIN payments p ON s.id = p.student_id
+            WHERE s.is_active = TRUE
+            GROUP BY s.id, c.price
+        ''', coalesce=Config.DASHBOARD_CACHE_TTL),
+        # Total payments collected today by this cashier
+        'today_stats': fanout.row(TODAY_TOTALS, date_window('today'), coalesce=0),
+        # Total pending amount (partial + unpaid)
+        'pending_stats': fanout.row('''
+            SELECT 
+                COALESCE(SUM(c.price) - SUM(p.amount_paid), 0.00) AS total_pending_amount,
+                COUNT(*) AS pending_count
+            FROM students s
+            JOIN courses c ON s.course_id = c.id
+            LEFT JOIN payments p ON s.id = p.student_id
+            WHERE s.is_active = TRUE
+            GROUP BY s.id
+            HAVING SUM(c.price) > COALESCE(SUM(p.amount_paid), 0)
+        ''', coalesce=Config.DASHBOARD_CACHE_TTL),
+        # For displaying monthly
+        'monthly_stats': fanout.row(MONTHLY_BY_CASHIER, (user_id,) + date_window('this_month')),
+        # For the payment method to display dynamically
+        'methods': fanout.rows('''
+            SELECT payment_method, COUNT(*) AS count
+            FROM payments
+            GROUP BY payment_method
+        ''', coalesce=Config.DASHBOARD_CACHE_TTL),
+        # For recent payments
+        'recent_payments': fanout.rows('''
+            WITH StudentPayments AS (
                 SELECT 
-                    p.created_at AS time,
-                    CONCAT(s.first_name, ' ', s.last_name) AS student,
-                    p.amount_paid AS amount,
-                    p.payment_method AS method,
-                    CASE 
-                        WHEN p.created_at = sp.last_payment_date AND sp.total_paid >= c.price THEN 'paid'
-                        WHEN sp.total_paid > 0 THEN 'partial'
-                        ELSE 'unpaid'
-                    END AS status
+                    p.student_id,
+                    SUM(p.amount_paid) AS total_paid,
+                    MAX(p.created_at) AS last_payment_date
                 FROM payments p
-                JOIN students s ON p.student_id = s.id
-                JOIN courses c ON s.course_id = c.id
-                JOIN StudentPayments sp ON p.student_id = sp.student_id
-                ORDER BY p.created_at DESC
-                LIMIT 5
-            ''')
-            recent_payments = cursor.fetchall()
+                GROUP BY p.student_id
+            )
+            SELECT 
+                p.created_at AS time,
+                s.full_name AS student,
+                p.amount_paid AS amount,
+                p.payment_method AS method,
+                CASE 
+                    WHEN p.created_at = sp.last_payment_date AND sp.total_paid >= c.price THEN 'paid'
+                    WHEN sp.total_paid > 0 THEN 'partial'
+                    ELSE 'unpaid'
+                END AS status
+            FROM payments p
+            JOIN students s ON p.student_id = s.id
+            JOIN courses c ON s.course_id = c.id
+            JOIN StudentPayments sp ON p.student_id = sp.student_id
+            ORDER BY p.created_at DESC
+            LIMIT 5
+        ''', coalesce=0)
+    }, defaults={'total_students': 0, 'students_data': [], 'methods': [], 'recent_payments': [],
+                 'today_stats': {'total_collected': 0, 'payment_count': 0},
+                 'pending_stats': {'total_pending_amount': 0, 'pending_count': 0},
+                 'monthly_stats': {'total_monthly_collected': 0, 'monthly_payment_count': 0}})
+
+    total_students = results['total_students']
+    today_stats = results['today_stats']
+    pending_stats = results['pending_stats'] or {'total_pending_amount': 0, 'pending_count': 0}
+    monthly_stats = results['monthly_stats']
+    recent_payments = results['recent_payments']
+
+    paid_count = 0
+    partial_count = 0
+    unpaid_count = 0
+
+    for student in results['students_data']:
+        if student['amount_paid'] >= student['total_fee']:
+            paid_count += 1
+        elif student['amount_paid'] > 0:
+            partial_count += 1
+        else:
+            unpaid_count += 1
+
+    # Default counts
+    data = {
+        'cash': 0,
+        'gcash': 0,
+        'bank': 0,
+    }
 
-    finally:
-        connection.close()
+    total = 0
+
+    for row in results['methods']:
+        method = row['payment_method'].lower()
+        count = row['count']
+        total += count
+
+        if 'cash' == method:
+            data['cash'] += count
+        elif 'gcash' == method or 'maya' in method:
+            data['gcash'] += count
+        elif 'bank' in method:
+            data['bank'] += count
+
+    # Compute percentages
+    percentages = {
+        'cash': round((data['cash'] / total) * 100) if total else 0,
+        'gcash': round((data['gcash'] / total) * 100) if total else 0,
+        'bank': round((data['bank'] / total) * 100) if total else 0,
+    }
 
     stats = {
         'today_collections': today_stats['total_collected'],
@@ -169,18 +259,20 @@ def dashboard():
         'monthly_payments': monthly_stats['monthly_payment_count']
     }
 
-    return render_template('cashier/dashboard.html',
-                           stats=stats,
-                           paid_count=paid_count,
-                           partial_count=partial_count,
-                           unpaid_count=unpaid_count,
-                           recent_payments=recent_payments,
-                           payment_data=percentages)
+    return {
+        'stats': stats,
+        'paid_count': paid_count,
+        'partial_count': partial_count,
+        'unpaid_count': unpaid_count,
+        'recent_payments': recent_payments,
+        'payment_data': percentages
+    }, missing
 
 
 @cashier_bp.route('/students')
 @login_required
 @cashier_required
+@admission('report')
 def students():
     course_filter = request.args.get('course', '')
     status_filter = request.args.get('status', '')
@@ -194,7 +286,7 @@ def students():
                 SELECT 
                     s.id,
                     s.student_id AS sid,
-                    CONCAT(s.first_name, ' ', s.last_name) AS name,
+                    s.full_name AS name,
                     c.name AS course_name,
                     COALESCE(c.price, 0) AS total_fee,
                     COALESCE(SUM(p.amount_paid), 0) AS total_paid,
@@ -232,11 +324,13 @@ def students():
 
             params = []
 
-            # Add search filter
+            # Add search filter (ranked ids from the student search index)
+            search_ids = None
             if search_query:
-                query += " AND (s.first_name LIKE %s OR s.last_name LIKE %s OR s.student_id LIKE %s OR s.email LIKE %s)"
-                search_param = f"%{search_query}%"
-                params.extend([search_param, search_param, search_param, search_param])
+                search_ids = search_students(search_query, active=True, cursor=cursor)
+                condition, search_params = id_filter(search_ids)
+                query += f" AND {condition}"
+                params.extend(search_params)
 
             # Add course filter
             if course_filter:
@@ -259,16 +353,14 @@ def students():
                 elif status_filter == 'unpaid':
                     query += " HAVING COALESCE(SUM(p.amount_paid), 0) = 0 AND COALESCE(c.price, 0) > 0"
 
-            # Add final ordering
-            query += " ORDER BY s.created_at DESC"
-
-            print(f"Executing query: {query}")
-            print(f"With parameters: {params}")
+            # Add final ordering (search results keep the search ranking instead)
+            if search_ids is None:
+                query += " ORDER BY s.created_at DESC"
 
             cursor.execute(query, params)
             students = cursor.fetchall()
-
-            print(f"Found {len(students)} students")
+            if search_ids is not None:
+                students = in_rank_order(students, search_ids)
 
             # Process students data
             for student in students:
@@ -375,7 +467,7 @@ def view_collect_payment():
                 SELECT 
                     s.id, 
                     s.student_id AS sid, 
-                    CONCAT(s.first_name, ' ', s.last_name) AS name,
+                    s.full_name AS name,
                     c.name AS course,
                     c.price AS totalFee,  -- Total due is the course price
                     COALESCE(SUM(p.amount_paid), 0) AS paidAmount,  -- Total paid from payments
@@ -414,22 +506,14 @@ def api_search_student():
     connection = get_db_connection()
     try:
         with connection.cursor() as cursor:
-            cursor.execute('''
-                SELECT s.id, s.student_id, CONCAT(s.first_name, ' ', s.last_name) AS name,
-                       c.name AS course,
-                       c.price AS total_due,  -- Total due is the course price
-                       COALESCE(SUM(p.amount_paid), 0) AS total_paid  -- Total paid from payments
-                FROM students s
-                LEFT JOIN courses c ON s.course_id = c.id
-                LEFT JOIN payments p ON s.id = p.student_id
-                WHERE s.student_id LIKE %s OR CONCAT(s.first_name, ' ', s.last_name) LIKE %s
-                GROUP BY s.id, c.id  -- Group by student and course
-                ORDER BY s.id DESC
-                LIMIT 1
-            ''', (f'%{query}%', f'%{query}%'))
+            # Best match from the student search index, then one primary-key lookup
+            matches = search_students(query, limit=1, cursor=cursor)
+            if not matches:
+                return jsonify({'error': 'Student not found'}), 404
+
+            cursor.execute(STUDENT_LOOKUP, (matches[0],))
 
             student = cursor.fetchone()
-            print(student)
 
             if student:
                 # Calculate balance
@@ -452,6 +536,57 @@ def api_search_student():
         connection.close()
 
 
+@cashier_bp.route('/api/students/typeahead', methods=['GET'])
+@login_required
+@cashier_required
+def api_student_typeahead():
+    """Top-N ranked students for the collect-payment search box.
+
+    Answers from the in-process search index plus primary-key lookups on
+    students and student_balances. `seq` is echoed back so the page can drop
+    responses that arrive after a newer keystroke's.
+    """
+    query = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', Config.TYPEAHEAD_LIMIT, type=int), Config.TYPEAHEAD_MAX_LIMIT)
+    seq = request.args.get('seq', 0, type=int)
+
+    rows = []
+    if query and limit > 0:
+        connection = get_db_connection()
+        try:
+            with connection.cursor() as cursor:
+                ids = search_students(query, limit=limit, active=True, cursor=cursor)
+                if ids:
+                    placeholders = ', '.join(['%s'] * len(ids))
+                    cursor.execute(f'''
+                        SELECT s.id, s.student_id, s.full_name,
+                               c.name AS course, COALESCE(c.price, 0) AS total_fee,
+                               {student_balances.total_paid_sql()} AS total_paid
+                        FROM students s
+                        LEFT JOIN courses c ON s.course_id = c.id
+                        LEFT JOIN student_balances b ON b.student_id = s.id
+                        WHERE s.id IN ({placeholders})
+                    ''', ids)
+                    found = {row['id']: row for row in cursor.fetchall()}
+                    for student_id in ids:
+                        row = found.get(student_id)
+                        if row:
+                            fee = float(row['total_fee'])
+                            paid = float(row['total_paid'])
+                            rows.append([row['id'], row['student_id'], row['full_name'],
+                                         row['course'], fee, paid, max(0.0, fee - paid)])
+        finally:
+            connection.close()
+
+    # Positional rows keep the payload small; `fields` names the columns once
+    response = current_app.response_class(
+        json.dumps({'seq': seq, 'fields': TYPEAHEAD_FIELDS, 'rows': rows}, separators=(',', ':')),
+        mimetype='application/json'
+    )
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
 @cashier_bp.route('/collect-payment/<int:student_id>', methods=['GET', 'POST'])
 @login_required
 @cashier_required
@@ -478,31 +613,23 @@ def collect_payment(student_id):
                 return redirect(url_for('cashier.view_collect_payment'))
 
             with connection.cursor() as cursor:
-                # Get the student's total due and total paid
-                cursor.execute('''
-                    SELECT 
-                        s.id AS student_id,
-                        CONCAT(s.first_name, ' ', s.last_name) AS name,
-                        c.price AS total_due,
-                        COALESCE(SUM(p.amount_paid), 0) AS total_paid
-                    FROM students s
-                    LEFT JOIN courses c ON s.course_id = c.id
-                    LEFT JOIN payments p ON s.id = p.student_id
-                    WHERE s.id = %s
-                    GROUP BY s.id, s.first_name, s.last_name;
-                ''', (student_id,))
+                # Get the student's total due
+                cursor.execute(STUDENT_TOTAL_DUE, (student_id,))
                 student_data = cursor.fetchone()
 
                 if not student_data:
                     flash('Student not found.', 'error')
                     return redirect(url_for('cashier.students'))
 
+                # Lock the student's balance row so concurrent payments are checked one at a time
+                connection.begin()
                 total_due = Decimal(student_data['total_due'])  # Convert to Decimal
-                total_paid = Decimal(student_data['total_paid'])  # Convert to Decimal
+                total_paid = Decimal(student_balances.lock_total_paid(cursor, student_id))  # Convert to Decimal
                 balance = total_due - total_paid
 
                 # Check if the balance is already zero
                 if balance <= 0:
+                    connection.rollback()
                     flash('The student has already paid in full. No further payments are required.', 'error')
                     return redirect(url_for('cashier.view_collect_payment'))
 
@@ -511,6 +638,7 @@ def collect_payment(student_id):
 
                 # Check if the new total paid exceeds the total due
                 if new_total_paid > total_due:
+                    connection.rollback()
                     flash(f'The payment amount of ₱{amount:,.2f} exceeds the remaining balance of ₱{balance:,.2f}. Payment cannot be processed.', 'error')
                     return redirect(url_for('cashier.view_collect_payment'))
 
@@ -519,10 +647,14 @@ def collect_payment(student_id):
                     INSERT INTO payments (student_id,  amount_paid, payment_method, payment_date, collected_by, notes)
                     VALUES (%s, %s, %s, %s, %s, %s)
                 ''', (
-                    student_id, amount, method, date.today(),
+                    student_id, amount, method, today(),
                     current_user.id, notes))
 
                 payment_id = cursor.lastrowid
+                student_balances.record_payment(cursor, student_id, amount)
+                connection.commit()
+                metrics.inc('payments_inserted_total', (('method', method),))
+                metrics.inc('payments_amount_total', (('method', method),), float(amount))
 
                 # Get student info for logging
                 # log_activity(current_user.id,
@@ -535,17 +667,16 @@ def collect_payment(student_id):
         # GET request - show payment form
         with connection.cursor() as cursor:
             # Get student info with course details
-            cursor.execute('''
+            cursor.execute(f'''
                 SELECT 
                     s.id AS student_id,
-                    CONCAT(s.first_name, ' ', s.last_name) AS name,
+                    s.full_name AS name,
                     c.price AS total_due,
-                    COALESCE(SUM(p.amount_paid), 0) AS total_paid
+                    {student_balances.total_paid_sql()} AS total_paid
                 FROM students s
                 LEFT JOIN courses c ON s.course_id = c.id
-                LEFT JOIN payments p ON s.id = p.student_id
+                LEFT JOIN student_balances b ON b.student_id = s.id
                 WHERE s.id = %s AND s.is_active = TRUE
-                GROUP BY s.id, s.first_name, s.last_name;
             ''', (student_id,))
 
             student_data = cursor.fetchall()
@@ -593,13 +724,7 @@ def payment_history(student_id):
                 return redirect(url_for('cashier.students'))
 
             # Get payment history
-            cursor.execute('''
-                SELECT p.*, u.name as collected_by_name
-                FROM payments p
-                JOIN users u ON p.collected_by = u.id
-                WHERE p.student_id = %s
-                ORDER BY p.payment_date DESC, p.created_at DESC
-            ''', (student_id,))
+            cursor.execute(STUDENT_PAYMENTS, (student_id,))
             payments = cursor.fetchall()
 
             # Calculate totals
@@ -619,6 +744,7 @@ def payment_history(student_id):
 @cashier_bp.route('/export/payments')
 @login_required
 @cashier_required
+@admission('export')
 def export_payments():
     connection = get_db_connection()
     try:
@@ -626,7 +752,7 @@ def export_payments():
             cursor.execute("""
                 SELECT 
                     p.created_at AS datetime,
-                    CONCAT(s.first_name, ' ', s.last_name) AS student,
+                    s.full_name AS student,
                     s.student_id AS student_number,
                     c.name AS course,
                     p.amount_paid AS amount,
@@ -643,6 +769,9 @@ def export_payments():
             """)
             payments = cursor.fetchall()
 
+        # pandas (and numpy) take ~0.4 s and tens of MB to import; only this export needs them
+        import pandas as pd
+
         # Convert to DataFrame
         df = pd.DataFrame(payments)
         df.columns = ['Date & Time', 'Student Name', 'Student ID', 'Course',
@@ -670,13 +799,15 @@ def export_payments():
 @cashier_bp.route('/payment-history-all')
 @login_required
 @cashier_required
+@admission('report')
 def payment_history_all():
     connection = get_db_connection()
     try:
         with connection.cursor() as cursor:
             # Pagination
-            page = request.args.get('page', default=1, type=int)
-            per_page = request.args.get('per_page', default=25, type=int)
+            page = max(1, request.args.get('page', default=1, type=int))
+            # per_page comes from the query string; an unbounded value would pull every payment
+            per_page = min(max(1, request.args.get('per_page', default=25, type=int)), Config.MAX_PER_PAGE)
             offset = (page - 1) * per_page
 
             # Total number of payments
@@ -688,55 +819,15 @@ def payment_history_all():
             total_amount = cursor.fetchone()['total_amount']
 
             # Today's total amount
-            cursor.execute("""
-                SELECT COALESCE(SUM(amount_paid), 0.00) as todays_total
-                FROM payments
-                WHERE DATE(created_at) = CURDATE()
-            """)
-            todays_total = cursor.fetchone()['todays_total']
+            cursor.execute(PAYMENTS_SINCE, window('today'))
+            todays_total = cursor.fetchone()['period_total']
 
             # Monthly total amount
-            cursor.execute("""
-                SELECT COALESCE(SUM(amount_paid), 0.00) as monthly_total
-                FROM payments
-                WHERE created_at >= DATE_FORMAT(CURDATE(), '%Y-%m-01')
-                  AND created_at < DATE_FORMAT(CURDATE() + INTERVAL 1 MONTH, '%Y-%m-01')
-            """)
-            monthly_total = cursor.fetchone()['monthly_total']
+            cursor.execute(PAYMENTS_SINCE, window('this_month'))
+            monthly_total = cursor.fetchone()['period_total']
 
             # Get all payment history (regardless of student)
-            cursor.execute('''
-                WITH StudentPayments AS (
-                    SELECT 
-                        p.student_id,
-                        SUM(p.amount_paid) AS total_paid,
-                        MAX(p.created_at) AS last_payment_date
-                    FROM payments p
-                    GROUP BY p.student_id
-                )
-                SELECT 
-                    p.id,
-                    p.created_at AS datetime,
-                    CONCAT(s.first_name, ' ', s.last_name) AS student,
-                    s.student_id AS student_number,
-                    c.name AS course,
-                    p.amount_paid AS amount,
-                    p.payment_method AS method,
-                    CASE 
-                        WHEN p.created_at = sp.last_payment_date AND sp.total_paid >= c.price THEN 'paid'
-                        WHEN sp.total_paid > 0 THEN 'partial'
-                        ELSE 'unpaid'
-                    END AS status,
-                    p.notes,
-                    u.name AS collected_by
-                FROM payments p
-                JOIN students s ON p.student_id = s.id
-                LEFT JOIN courses c ON s.course_id = c.id
-                LEFT JOIN users u ON p.collected_by = u.id
-                JOIN StudentPayments sp ON p.student_id = sp.student_id
-                ORDER BY p.created_at DESC
-                LIMIT %s OFFSET %s
-                ''', (per_page, offset))
+            cursor.execute(PAYMENT_HISTORY_PAGE, (per_page, offset))
             payment_history = cursor.fetchall()
 
             # Get distinct active courses
@@ -883,17 +974,17 @@ def change_password():
                 return redirect(url_for('cashier.profile'))
 
             # Verify current password
-            if not check_password_hash(result['password_hash'], current_password):
+            if not verify_password(result['password_hash'], current_password):
                 flash('Current password is incorrect.', 'error')
                 return redirect(url_for('cashier.profile'))
 
             # Check if new password is different from current
-            if check_password_hash(result['password_hash'], new_password):
+            if verify_password(result['password_hash'], new_password):
                 flash('New password must be different from your current password.', 'error')
                 return redirect(url_for('cashier.profile'))
 
             # Update password
-            new_password_hash = generate_password_hash(new_password)
+            new_password_hash = hash_password(new_password)
             cursor.execute('''
                 UPDATE users 
                 SET password_hash = %s, updated_at = CURRENT_TIMESTAMP
@@ -904,6 +995,8 @@ def change_password():
 
             flash('Password changed successfully!', 'success')
 
+    except PasswordPoolBusy:
+        flash(BUSY_MESSAGE, 'error')
     except Exception as e:
         connection.rollback()
         flash('An error occurred while changing your password. Please try again.', 'error')
@@ -12,6 +12,64 @@ class Config:
     MYSQL_USER = os.environ.get('MYSQL_USER')
     MYSQL_PASSWORD = os.environ.get('MYSQL_PASSWORD')
     MYSQL_DB = os.environ.get('MYSQL_DB')
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))  # per process, 0 opens a connection per call
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5))  # seconds to wait for a free connection
+    DB_POOL_RECYCLE = 300  # ping connections idle longer than this (seconds) before reuse
+    DB_CONNECT_TIMEOUT = int(os.environ.get('DB_CONNECT_TIMEOUT', 2))  # seconds
+    DB_READ_TIMEOUT = int(os.environ.get('DB_READ_TIMEOUT', 60))  # seconds without a reply before giving up
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))  # SELECTs only, 0 = none
+    # Circuit breaker (see database/circuit.py): open after this many failures within the
+    # window, then let one trial through every CIRCUIT_RESET_TIMEOUT seconds
+    CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', 5))
+    CIRCUIT_WINDOW = 10  # seconds
+    CIRCUIT_RESET_TIMEOUT = int(os.environ.get('CIRCUIT_RESET_TIMEOUT', 15))  # seconds
+    # Dashboard query fan-out (see database/fanout.py); 0 workers runs queries one after another
+    FANOUT_WORKERS = int(os.environ.get('FANOUT_WORKERS', 4))  # per process, keep below DB_POOL_SIZE
+    FANOUT_DEADLINE = float(os.environ.get('FANOUT_DEADLINE', 5))  # seconds before showing partial results
+
+    # Single-flight reads (see utils/single_flight.py): 'memory' coalesces within a process,
+    # 'file' also across the workers on one host
+    SINGLE_FLIGHT_BACKEND = os.environ.get('SINGLE_FLIGHT_BACKEND', 'memory')
+    SINGLE_FLIGHT_DIR = os.environ.get('SINGLE_FLIGHT_DIR')  # default: a directory in the temp directory
+    SINGLE_FLIGHT_TIMEOUT = 10  # seconds to wait for another caller's run before running it here
+    SINGLE_FLIGHT_MAX_ENTRIES = 500
+    DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 15))  # seconds, dashboard-wide aggregates
+
+    # Last-known-good snapshots of the dashboards and course list (see utils/snapshots.py)
+    SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR')  # default: a directory in the temp directory
+    SNAPSHOT_REFRESH_INTERVAL = 5  # seconds between background refreshes of a stale snapshot
+
+    # Admission control for heavy endpoints (see utils/admission.py): per route class, requests
+    # running at once, queue length and seconds to wait in it, requests per user, SELECT time
+    # limit (ms) and the Retry-After sent when rejected. Limits are per process unless the
+    # backend is 'file', which shares `concurrent` between the workers on one host.
+    ADMISSION_BACKEND = os.environ.get('ADMISSION_BACKEND', 'memory')
+    ADMISSION_DIR = os.environ.get('ADMISSION_DIR')  # default: a directory in the temp directory
+    ADMISSION_LIMITS = {
+        'export': {'concurrent': int(os.environ.get('EXPORT_CONCURRENCY', 2)), 'queue': 0, 'wait': 0,
+                   'per_user': 1, 'timeout_ms': 45000, 'retry_after': 10},  # under DB_READ_TIMEOUT
+        'report': {'concurrent': int(os.environ.get('REPORT_CONCURRENCY', 4)), 'queue': 8, 'wait': 3,
+                   'per_user': 2, 'timeout_ms': 10000, 'retry_after': 3},
+        'dashboard': {'timeout_ms': 5000},
+    }
+    MAX_PER_PAGE = 100  # largest page size a listing accepts
+
+    # Static assets (see utils/assets.py): files under static/ to fingerprint and precompress
+    ASSET_BUNDLES = (
+        'css/bootstrap.min.css',
+        'css/app.css',
+        'js/bootstrap.bundle.min.js',
+        'js/app.js',
+        'vendor/bootstrap-icons/bootstrap-icons.min.css',
+        'vendor/chart.min.js',
+    )
+    # Used while a bundle isn't in static/ (copy it into static/vendor for offline use)
+    ASSET_CDN_FALLBACKS = {
+        'vendor/bootstrap-icons/bootstrap-icons.min.css':
+            'https://cdnjs.cloudflare.com/ajax/libs/bootstrap-icons/1.10.0/font/bootstrap-icons.min.css',
+        'vendor/chart.min.js': 'https://cdnjs.cloudflare.com/ajax/libs/Chart.js/3.9.1/chart.min.js',
+    }
+    ASSET_MAX_AGE = 365 * 24 * 3600  # seconds; fingerprinted files never change
 
     # Email Configuration
     MAIL_SERVER = 'smtp.gmail.com'
@@ -23,3 +81,86 @@ class Config:
     # Pagination
     STUDENTS_PER_PAGE = 10
     LOGS_PER_PAGE = 20
+
+    # Password hashing (changing the method rehashes each user on their next login)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_SALT_LENGTH = int(os.environ.get('PASSWORD_SALT_LENGTH', 16))
+    PASSWORD_POOL_KIND = os.environ.get('PASSWORD_POOL_KIND', 'thread')  # 'thread' or 'process'
+    PASSWORD_POOL_WORKERS = int(os.environ.get('PASSWORD_POOL_WORKERS', 0))  # 0 = one per CPU
+    PASSWORD_POOL_MAX_PENDING = int(os.environ.get('PASSWORD_POOL_MAX_PENDING', 16))
+    PASSWORD_POOL_TIMEOUT = float(os.environ.get('PASSWORD_POOL_TIMEOUT', 5))
+
+    # Rate limiting ('memory' per process, or 'sqlite' shared by all workers on the host)
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+    RATE_LIMIT_SQLITE_PATH = os.environ.get('RATE_LIMIT_SQLITE_PATH')
+    # Reverse proxies in front of the app that append to X-Forwarded-For/-Proto. Set it to the
+    # real count: with 0 every client behind the proxy shares the proxy's address (and its
+    # rate limits), and a count above the real one lets clients forge their address.
+    TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 0))
+
+    # OTP store ('database' or 'memory' for a single-process deployment)
+    OTP_STORE = os.environ.get('OTP_STORE', 'database')
+    OTP_TTL_MINUTES = 10
+    OTP_PURGE_INTERVAL = int(os.environ.get('OTP_PURGE_INTERVAL', 300))  # seconds, 0 disables
+    OTP_PURGE_BATCH = 500
+
+    # Log retention (rows are archived to compressed JSONL before deletion)
+    LOG_RETENTION_DAYS = 90
+    LOG_RETENTION_CHUNK = int(os.environ.get('LOG_RETENTION_CHUNK', 1000))
+    LOG_RETENTION_PAUSE = float(os.environ.get('LOG_RETENTION_PAUSE', 0.2))  # seconds between chunks
+    LOG_ARCHIVE_DIR = os.environ.get('LOG_ARCHIVE_DIR',
+                                     os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive', 'logs'))
+    LOG_PARTITION_MONTHS_AHEAD = 3
+    LOG_PARTITION_MAINTENANCE_INTERVAL = int(os.environ.get('LOG_PARTITION_MAINTENANCE_INTERVAL', 86400))  # 0 disables
+
+    # Student search (in-process trigram index, see utils/student_search.py)
+    STUDENT_SEARCH_MIN_LENGTH = 2
+    STUDENT_SEARCH_MAX_RESULTS = 200
+    STUDENT_SEARCH_MAX_INLINE_IDS = 1000  # longer id lists are matched in Python, not as IN (...)
+    STUDENT_SEARCH_REFRESH_INTERVAL = int(os.environ.get('STUDENT_SEARCH_REFRESH_INTERVAL', 30))  # seconds
+
+    # Collect-payment typeahead
+    TYPEAHEAD_LIMIT = 8
+    TYPEAHEAD_MAX_LIMIT = 20
+
+    # Time zone for date filters and the MySQL session (see utils/time_windows.py)
+    APP_TIMEZONE = os.environ.get('APP_TIMEZONE', 'Asia/Manila')
+    ACADEMIC_TERM_START_MONTHS = (1, 6, 8)  # 2nd semester, summer, 1st semester
+
+    # SQL instrumentation: fraction of requests timed (0 turns it off), see /admin/perf
+    SQL_SAMPLE_RATE = float(os.environ.get('SQL_SAMPLE_RATE', 0.1))
+    PERF_WINDOW = 500  # sampled requests kept per endpoint
+    PERF_SLOW_REQUEST_MS = int(os.environ.get('PERF_SLOW_REQUEST_MS', 1000))
+
+    # Slow-query log (see utils/slow_queries.py and /admin/slow-queries); 0 turns it off
+    SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 200))
+    SLOW_QUERY_EXPLAIN_INTERVAL = 600  # seconds between EXPLAINs of the same fingerprint
+    SLOW_QUERY_MAX_ENTRIES = 5000
+    SLOW_QUERY_DB_PATH = os.environ.get('SLOW_QUERY_DB_PATH')  # default: a file in the temp directory
+
+    # Query budgets and N+1 detection for development and tests (see utils/query_budget.py):
+    # 'off', 'warn' (print a report) or 'raise' (fail the request)
+    QUERY_BUDGET_MODE = os.environ.get('QUERY_BUDGET_MODE', 'off')
+    QUERY_REPEAT_THRESHOLD = 3  # same statement shape this many times in one request
+
+    # Prometheus metrics at /metrics (see utils/metrics.py). Set METRICS_DIR to a
+    # directory shared by all workers when running more than one process.
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = int(os.environ.get('METRICS_FLUSH_INTERVAL', 5))  # seconds
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # require "Authorization: Bearer <token>" when set
+
+    # Background log writer and email outbox (see utils/log_writer.py and utils/outbox.py)
+    LOG_WRITER_ENABLED = os.environ.get('LOG_WRITER_ENABLED', 'true').lower() == 'true'
+    LOG_QUEUE_SIZE = 10000  # entries; a full queue writes inline
+    LOG_BATCH_SIZE = 200  # entries per transaction
+    LOG_RETRY_MAX_DELAY = 60  # seconds between retries while the database is unreachable
+    EMAIL_OUTBOX_ENABLED = os.environ.get('EMAIL_OUTBOX_ENABLED', 'true').lower() == 'true'
+    EMAIL_OUTBOX_SIZE = 1000
+    EMAIL_RETRIES = 3
+    SHUTDOWN_DRAIN_TIMEOUT = float(os.environ.get('SHUTDOWN_DRAIN_TIMEOUT', 10))  # seconds per queue
+
+    # Worker startup budget, checked by `python -m utils.startup_profile --check`
+    STARTUP_BUDGET_MS = int(os.environ.get('STARTUP_BUDGET_MS', 800))  # median time to import wsgi
+    STARTUP_RSS_BUDGET_MB = int(os.environ.get('STARTUP_RSS_BUDGET_MB', 64))
+    STARTUP_LAZY_MODULES = ('pandas', 'numpy', 'xlsxwriter')  # must not be imported at startup
@@ -0,0 +1,116 @@
+"""Circuit breaker around MySQL access.
+
+When MySQL is down or stalled, every request used to wait out its own
+connect and read timeouts. The breaker counts connection failures and lost
+connections. After CIRCUIT_FAILURE_THRESHOLD of them
+within CIRCUIT_WINDOW seconds it opens: get_db_connection() then raises
+DatabaseUnavailable at once, without touching the network.
+
+After CIRCUIT_RESET_TIMEOUT seconds the breaker is half-open. One caller
+gets through as a trial. If its statement succeeds the breaker closes; if
+it fails, the breaker opens again. Views that can live without the database
+serve their last snapshot meanwhile (see utils/snapshots.py).
+
+The breaker is per process, like the connection pool. Overload doesn't
+trip it: a pool with no free connection (PoolTimeout) and statements stopped
+by MAX_EXECUTION_TIME (3024, see utils/admission.py) fail only their own
+request, so payments keep getting through while a report is slow.
+"""
+import threading
+import time
+import pymysql
+from config import Config
+from database.pool import PoolTimeout
+from utils import metrics
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+
+# Client and server errors that mean the database is unreachable, not a bad or slow query
+TRIPPING_ERRORS = {
+    1040,  # too many connections
+    2003,  # can't connect
+    2006,  # server has gone away
+    2013,  # lost connection during query
+    2055,  # lost connection, system error
+}
+
+
+class DatabaseUnavailable(pymysql.err.OperationalError):
+    pass
+
+
+def _error_code(error):
+    return error.args[0] if error.args and isinstance(error.args[0], int) else None
+
+
+def is_transient(error):
+    """True if the database couldn't be reached (breaker open, pool full, connection lost): retry later."""
+    return isinstance(error, (DatabaseUnavailable, PoolTimeout)) or (
+        isinstance(error, pymysql.err.OperationalError) and _error_code(error) in TRIPPING_ERRORS)
+
+
+class CircuitBreaker:
+    def __init__(self, threshold, window, reset_timeout):
+        self.threshold = threshold
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = []
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._trial_started = 0.0
+
+    def allow(self):
+        """True if a caller may use the database now."""
+        if self.state == CLOSED:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN and now - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._trial_started = 0.0
+            if self.state == HALF_OPEN and now - self._trial_started >= self.reset_timeout:
+                # One trial at a time; a trial that never reports back is replaced
+                self._trial_started = now
+                return True
+            return self.state == CLOSED
+
+    def retry_in(self):
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def success(self):
+        if self.state == CLOSED:
+            return
+        with self._lock:
+            if self.state != CLOSED:
+                print("Database circuit closed")
+                self.state = CLOSED
+                self._failures = []
+
+    def failure(self):
+        now = time.monotonic()
+        with self._lock:
+            self._failures = [t for t in self._failures if now - t < self.window]
+            self._failures.append(now)
+            if self.state == HALF_OPEN or (self.state == CLOSED and len(self._failures) >= self.threshold):
+                print(f"Database circuit open for {self.reset_timeout}s after {len(self._failures)} failures")
+                self.state = OPEN
+                self.opened_at = now
+
+    def check(self):
+        """Raise DatabaseUnavailable while the breaker is open."""
+        if not self.allow():
+            raise DatabaseUnavailable(2003, f"Database unavailable (circuit open, retry in {self.retry_in():.0f}s)")
+
+    def record(self, error):
+        """Count `error` against the breaker if it means the database is unreachable."""
+        if isinstance(error, (DatabaseUnavailable, PoolTimeout)):
+            return
+        if _error_code(error) in TRIPPING_ERRORS:
+            self.failure()
+
+
+breaker = CircuitBreaker(Config.CIRCUIT_FAILURE_THRESHOLD, Config.CIRCUIT_WINDOW, Config.CIRCUIT_RESET_TIMEOUT)
+
+metrics.register_gauge('db_circuit_open', 'Database circuit breaker state (0 closed, 1 half-open, 2 open).',
+                       lambda: {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}[breaker.state])
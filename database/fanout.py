@@ -0,0 +1,155 @@
+"""Run independent read queries concurrently, each on its own pooled connection.
+
+A dashboard's statements don't depend on each other, so instead of running
+them one after another on one connection (latency = the sum), gather()
+hands each to a small thread pool and waits for all of them (latency = the
+slowest one):
+
+    results, missing = fanout.gather({
+        'total_students': fanout.row("SELECT COUNT(*) AS count FROM students", column='count'),
+        'recent_payments': fanout.rows(RECENT_PAYMENTS),
+        'monthly': fanout.row(MONTHLY_BY_CASHIER, (current_user.id,) + date_window('this_month')),
+    }, defaults={'total_students': 0, 'recent_payments': []})
+
+A task is any function of a cursor; row() and rows() build the common ones.
+The cursor opens its connection on first use, and with `coalesce` set the
+task joins identical reads already in flight (see utils/single_flight.py).
+Tasks still running at the deadline (FANOUT_DEADLINE seconds), and tasks
+that fail, are left out: their names are returned in `missing` and
+`results` holds their default (None if none is given) so the page can still
+render. Tasks run in a copy of the caller's context, so SQL instrumentation
+and query budgets still count their statements.
+
+FANOUT_WORKERS bounds the pool's threads and therefore the pooled
+connections all fan-outs in a process use at once; keep it below
+DB_POOL_SIZE so ordinary requests still get connections. With 0 the tasks
+run one after another on one connection, as before. Tasks must not call
+gather() themselves.
+"""
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from config import Config
+from database.init_db import get_db_connection
+from utils import single_flight
+
+
+def _coalesced(task, sql, args, ttl):
+    # Identical reads in flight at the same time share one execution (utils/single_flight.py)
+    if ttl is None:
+        return task
+    name = single_flight.key(sql, args)
+    return lambda cursor: single_flight.do(name, lambda: task(cursor), ttl)
+
+
+def row(sql, args=(), column=None, coalesce=None):
+    """Task: the first row (or one column of it) of a query.
+
+    `coalesce` shares the result with identical concurrent reads and, when
+    above 0, caches it for that many seconds.
+    """
+    def task(cursor):
+        cursor.execute(sql, args)
+        result = cursor.fetchone()
+        return result[column] if column is not None and result is not None else result
+    return _coalesced(task, sql, args, coalesce)
+
+
+def rows(sql, args=(), coalesce=None):
+    """Task: every row of a query (`coalesce` as for row())."""
+    def task(cursor):
+        cursor.execute(sql, args)
+        return cursor.fetchall()
+    return _coalesced(task, sql, args, coalesce)
+
+
+class LazyCursor:
+    """Checks out a connection on first use, so a task answered from a cache never takes one."""
+
+    def __init__(self):
+        self._connection = None
+        self._cursor = None
+
+    def __getattr__(self, name):
+        if self._cursor is None:
+            self._connection = get_db_connection()
+            self._cursor = self._connection.cursor()
+        return getattr(self._cursor, name)
+
+    def close(self):
+        if self._connection is not None:
+            try:
+                self._cursor.close()
+            finally:
+                self._connection.close()
+
+
+def _run(task):
+    cursor = LazyCursor()
+    try:
+        return task(cursor)
+    finally:
+        cursor.close()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None or _executor.pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor.pid != os.getpid():
+                _executor = ThreadPoolExecutor(max_workers=Config.FANOUT_WORKERS, thread_name_prefix='fanout')
+                _executor.pid = os.getpid()
+    return _executor
+
+
+def _sequential(tasks, results, missing):
+    connection = get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            for name, task in tasks.items():
+                try:
+                    results[name] = task(cursor)
+                except Exception as e:
+                    print(f"Error running query {name}: {e}")
+                    missing.append(name)
+    finally:
+        connection.close()
+
+
+def gather(tasks, deadline=None, defaults=None):
+    """Run {name: task} concurrently; return ({name: result}, [names missing])."""
+    deadline = Config.FANOUT_DEADLINE if deadline is None else deadline
+    defaults = defaults or {}
+    results = {}
+    missing = []
+
+    if Config.FANOUT_WORKERS <= 0:
+        _sequential(tasks, results, missing)
+    else:
+        executor = get_executor()
+        # One context copy per task: a Context can't be entered by two threads at once
+        futures = {executor.submit(contextvars.copy_context().run, _run, task): name
+                   for name, task in tasks.items()}
+        done, pending = wait(futures, timeout=deadline)
+        for future in pending:
+            # A task that already started runs to completion and returns its connection
+            future.cancel()
+            name = futures[future]
+            print(f"Query {name} missed the {deadline}s deadline")
+            missing.append(name)
+        for future in done:
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                print(f"Error running query {name}: {e}")
+                missing.append(name)
+
+    for name in missing:
+        results[name] = defaults.get(name)
+    return results, missing
@@ -1,5 +1,8 @@
 import pymysql
 from config import Config
+from utils.time_windows import session_time_zone
+from utils.sql_instrumentation import InstrumentedCursor
+from database.circuit import breaker
 
 def get_working_connection():
     for port in range(3306, 3310):
@@ -85,6 +88,9 @@ def create_tables(port):
                     student_id VARCHAR(20) UNIQUE NOT NULL,
                     first_name VARCHAR(50) NOT NULL,
                     last_name VARCHAR(50) NOT NULL,
+                    full_name VARCHAR(101) GENERATED ALWAYS AS (CONCAT(first_name, ' ', last_name)) STORED,
+                    full_name_norm VARCHAR(101) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci
+                        GENERATED ALWAYS AS (LOWER(CONCAT(first_name, ' ', last_name))) STORED,
                     email VARCHAR(100) UNIQUE NOT NULL,
                     phone VARCHAR(20),
                     address TEXT,
@@ -93,7 +99,10 @@ def create_tables(port):
                     is_active BOOLEAN DEFAULT TRUE,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                    FOREIGN KEY (course_id) REFERENCES courses(id)
+                    FOREIGN KEY (course_id) REFERENCES courses(id),
+                    INDEX idx_students_updated_at (updated_at),
+                    INDEX idx_students_full_name (full_name),
+                    INDEX idx_students_full_name_norm (full_name_norm)
                 )
             ''')
 
@@ -109,7 +118,20 @@ def create_tables(port):
                     notes TEXT,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     FOREIGN KEY (student_id) REFERENCES students(id),
-                    FOREIGN KEY (collected_by) REFERENCES users(id)
+                    FOREIGN KEY (collected_by) REFERENCES users(id),
+                    INDEX idx_payments_payment_date (payment_date),
+                    INDEX idx_payments_created_at (created_at)
+                )
+            ''')
+
+            # Per-student payment totals (kept in step with payments)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS student_balances (
+                    student_id INT PRIMARY KEY,
+                    total_paid DECIMAL(12,2) NOT NULL DEFAULT 0,
+                    payment_count INT NOT NULL DEFAULT 0,
+                    last_payment_at TIMESTAMP NULL,
+                    FOREIGN KEY (student_id) REFERENCES students(id)
                 )
             ''')
 
@@ -119,9 +141,17 @@ def create_tables(port):
                     id INT AUTO_INCREMENT PRIMARY KEY,
                     user_id INT NOT NULL,
                     action VARCHAR(255) NOT NULL,
-                    role TEXT,
+                    action_type_id SMALLINT UNSIGNED,
+                    role VARCHAR(20),
+                    target_type VARCHAR(30),
+                    target_id INT,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id)
+                    FOREIGN KEY (user_id) REFERENCES users(id),
+                    INDEX idx_logs_created_at (created_at),
+                    INDEX idx_logs_action_type (action_type_id, created_at),
+                    INDEX idx_logs_role (role, created_at),
+                    INDEX idx_logs_target (target_type, target_id),
+                    INDEX idx_logs_action (action(64))
                 )
             ''')
 
@@ -133,7 +163,9 @@ def create_tables(port):
                     otp VARCHAR(6) NOT NULL,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     expires_at TIMESTAMP DEFAULT (CURRENT_TIMESTAMP + INTERVAL 15 MINUTE),
-                    is_used BOOLEAN DEFAULT FALSE
+                    is_used BOOLEAN DEFAULT FALSE,
+                    INDEX idx_password_resets_lookup (email, is_used, created_at),
+                    INDEX idx_password_resets_expires (expires_at)
                 )
             ''')
 
@@ -173,22 +205,49 @@ def create_default_admin(connection):
     except Exception as e:
         print(f"Error creating default admin: {e}")
 
-def get_db_connection():
-    _, port = get_working_connection()
+def connect():
+    """Open a new application connection on the cached working port."""
+    from database.pool import get_port
     return pymysql.connect(
         host=Config.MYSQL_HOST,
-        port=port,
+        port=get_port(),
         user=Config.MYSQL_USER,
         password=Config.MYSQL_PASSWORD,
         database=Config.MYSQL_DB,
-        cursorclass=pymysql.cursors.DictCursor,
-        autocommit=True
+        cursorclass=InstrumentedCursor,
+        autocommit=True,
+        connect_timeout=Config.DB_CONNECT_TIMEOUT,
+        read_timeout=Config.DB_READ_TIMEOUT,
+        write_timeout=Config.DB_READ_TIMEOUT,
+        # Compare TIMESTAMP columns in the app's time zone (see utils/time_windows.py),
+        # and stop any SELECT that runs longer than DB_STATEMENT_TIMEOUT_MS
+        init_command=(f"SET time_zone = '{session_time_zone()}', "
+                      f"SESSION max_execution_time = {int(Config.DB_STATEMENT_TIMEOUT_MS)}")
     )
 
+def get_db_connection():
+    """A pooled connection (DB_POOL_SIZE > 0); close() hands it back to the pool.
+
+    Raises DatabaseUnavailable at once while the circuit breaker is open
+    (see database/circuit.py).
+    """
+    breaker.check()
+    try:
+        if Config.DB_POOL_SIZE > 0:
+            from database.pool import get_pool
+            return get_pool().get_connection()
+        return connect()
+    except Exception as e:
+        breaker.record(e)
+        raise
+
 
 if __name__ == '__main__':
     # create_database()
     # create_tables()
 
     working_port = create_database()
-    create_tables(working_port)
\ No newline at end of file
+    create_tables(working_port)
+
+    from database.migrations import apply_migrations
+    apply_migrations()
\ No newline at end of file
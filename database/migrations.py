@@ -0,0 +1,235 @@
+"""Schema changes applied on top of the tables created by init_db.
+
+Each migration runs once and is recorded in the schema_migrations table.
+Migrations are also written to be idempotent, so a database created from the
+current CREATE TABLE statements (which already include the change) simply
+records them as applied.
+
+    python -m database.migrations
+"""
+from database.init_db import get_db_connection
+from database.partitions import partition_logs_table
+
+MIGRATIONS = []
+
+
+def migration(name):
+    """Register a migration function under a unique, ordered name."""
+    def decorator(f):
+        MIGRATIONS.append((name, f))
+        return f
+    return decorator
+
+
+def index_exists(cursor, table, index):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        LIMIT 1
+    """, (table, index))
+    return cursor.fetchone() is not None
+
+
+def column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        LIMIT 1
+    """, (table, column))
+    return cursor.fetchone() is not None
+
+
+def table_exists(cursor, table):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name = %s
+        LIMIT 1
+    """, (table,))
+    return cursor.fetchone() is not None
+
+
+def add_index(cursor, table, index, definition):
+    if not index_exists(cursor, table, index):
+        cursor.execute(f"CREATE INDEX {index} ON {table} {definition}")
+
+
+@migration('0001_password_resets_indexes')
+def password_resets_indexes(cursor):
+    # Latest unused OTP for an email: one index dive instead of a table scan
+    add_index(cursor, 'password_resets', 'idx_password_resets_lookup', '(email, is_used, created_at)')
+    # Purge walks expired rows in expiry order
+    add_index(cursor, 'password_resets', 'idx_password_resets_expires', '(expires_at)')
+    # Rows used to be kept forever once used; clear the backlog in batches
+    while True:
+        cursor.execute("DELETE FROM password_resets WHERE is_used = TRUE LIMIT 1000")
+        if cursor.rowcount < 1000:
+            break
+
+
+@migration('0002_logs_created_at_index')
+def logs_created_at_index(cursor):
+    # Date filters, newest-first listings and the retention boundary all seek on created_at
+    add_index(cursor, 'logs', 'idx_logs_created_at', '(created_at)')
+
+
+@migration('0003_partition_logs_by_month')
+def partition_logs_by_month(cursor):
+    # Primary key becomes (id, created_at) and the user_id foreign key is dropped
+    partition_logs_table(cursor)
+
+
+@migration('0004_log_stats_counters')
+def log_stats_counters(cursor):
+    from models import log_stats
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS log_stats_minute (
+            bucket DATETIME PRIMARY KEY,
+            log_count INT UNSIGNED NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS log_stats_daily (
+            day DATE PRIMARY KEY,
+            log_count INT UNSIGNED NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS log_stats_daily_users (
+            day DATE NOT NULL,
+            register SMALLINT UNSIGNED NOT NULL,
+            rho TINYINT UNSIGNED NOT NULL,
+            PRIMARY KEY (day, register)
+        )
+    """)
+    log_stats.rebuild(cursor)
+
+
+@migration('0005_structured_log_columns')
+def structured_log_columns(cursor):
+    from models import log_types
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS log_action_types (
+            id SMALLINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+            code VARCHAR(50) NOT NULL UNIQUE,
+            label VARCHAR(100) NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS log_roles (
+            name VARCHAR(20) PRIMARY KEY
+        )
+    """)
+    log_types.seed(cursor)
+
+    # role was TEXT, which cannot be indexed without a prefix length
+    cursor.execute("UPDATE logs SET role = LEFT(role, 20) WHERE CHAR_LENGTH(role) > 20")
+    cursor.execute("ALTER TABLE logs MODIFY role VARCHAR(20)")
+    if not column_exists(cursor, 'logs', 'action_type_id'):
+        cursor.execute("""
+            ALTER TABLE logs
+                ADD COLUMN action_type_id SMALLINT UNSIGNED AFTER action,
+                ADD COLUMN target_type VARCHAR(30) AFTER role,
+                ADD COLUMN target_id INT AFTER target_type
+        """)
+    # No foreign keys to the lookup tables: logs is partitioned
+    add_index(cursor, 'logs', 'idx_logs_action_type', '(action_type_id, created_at)')
+    add_index(cursor, 'logs', 'idx_logs_role', '(role, created_at)')
+    add_index(cursor, 'logs', 'idx_logs_target', '(target_type, target_id)')
+    log_types.backfill(cursor)
+
+
+@migration('0006_students_updated_at_index')
+def students_updated_at_index(cursor):
+    # The student search index polls MAX(updated_at) to pick up other workers' writes
+    add_index(cursor, 'students', 'idx_students_updated_at', '(updated_at)')
+
+
+@migration('0007_student_balances')
+def student_balances_table(cursor):
+    from models import student_balances
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS student_balances (
+            student_id INT PRIMARY KEY,
+            total_paid DECIMAL(12,2) NOT NULL DEFAULT 0,
+            payment_count INT NOT NULL DEFAULT 0,
+            last_payment_at TIMESTAMP NULL,
+            FOREIGN KEY (student_id) REFERENCES students(id)
+        )
+    """)
+    student_balances.rebuild(cursor)
+
+
+@migration('0008_students_full_name')
+def students_full_name(cursor):
+    # Stored, so projections read the value instead of concatenating per row;
+    # the normalized copy compares case- and accent-insensitively (0900_ai_ci)
+    if not column_exists(cursor, 'students', 'full_name'):
+        cursor.execute("""
+            ALTER TABLE students
+                ADD COLUMN full_name VARCHAR(101)
+                    GENERATED ALWAYS AS (CONCAT(first_name, ' ', last_name)) STORED AFTER last_name,
+                ADD COLUMN full_name_norm VARCHAR(101) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci
+                    GENERATED ALWAYS AS (LOWER(CONCAT(first_name, ' ', last_name))) STORED AFTER full_name
+        """)
+    add_index(cursor, 'students', 'idx_students_full_name', '(full_name)')
+    add_index(cursor, 'students', 'idx_students_full_name_norm', '(full_name_norm)')
+
+
+@migration('0009_payments_date_indexes')
+def payments_date_indexes(cursor):
+    # Date-window filters range-scan these instead of reading every payment
+    add_index(cursor, 'payments', 'idx_payments_payment_date', '(payment_date)')
+    add_index(cursor, 'payments', 'idx_payments_created_at', '(created_at)')
+
+
+@migration('0010_student_balances_repair')
+def student_balances_repair(cursor):
+    # Rows for students with payments but no balance row used to be created at zero
+    from models import student_balances
+
+    student_balances.rebuild(cursor)
+
+
+@migration('0011_logs_action_index')
+def logs_action_index(cursor):
+    # The admin logs search matches action text by prefix
+    add_index(cursor, 'logs', 'idx_logs_action', '(action(64))')
+
+
+def apply_migrations(connection=None):
+    """Apply every migration not yet recorded. Returns the names applied."""
+    own_connection = connection is None
+    if own_connection:
+        connection = get_db_connection()
+    applied = []
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    name VARCHAR(100) PRIMARY KEY,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cursor.execute("SELECT name FROM schema_migrations")
+            done = {row['name'] if isinstance(row, dict) else row[0] for row in cursor.fetchall()}
+
+            for name, f in MIGRATIONS:
+                if name in done:
+                    continue
+                print(f"Applying migration {name}...")
+                f(cursor)
+                cursor.execute("INSERT INTO schema_migrations (name) VALUES (%s)", (name,))
+                connection.commit()
+                applied.append(name)
+    finally:
+        if own_connection:
+            connection.close()
+    return applied
+
+
+if __name__ == '__main__':
+    names = apply_migrations()
+    print(f"Applied {len(names)} migration(s)." if names else "Database is up to date.")
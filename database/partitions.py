@@ -0,0 +1,227 @@
+"""Monthly RANGE partitioning of the logs table.
+
+Partition pYYYYMM holds the rows created in that month (in the session time
+zone), plus a catch-all pmax. MySQL requires the partitioning column in every
+unique key and does not allow foreign keys on partitioned tables, so the
+conversion widens the primary key to (id, created_at) and drops the
+logs.user_id foreign key (the user_id index stays).
+
+Once partitioned, retention drops whole months with ALTER TABLE ... DROP
+PARTITION (after archiving their rows) instead of deleting row by row, and
+date-bounded queries on created_at only read the partitions they need.
+
+    python -m database.partitions convert
+    python -m database.partitions maintain
+"""
+import os
+import threading
+import time
+from datetime import datetime, date
+from config import Config
+from database.init_db import get_db_connection
+from utils import time_windows
+
+LOCK_NAME = 'logs_partition_maintenance'
+
+
+def month_start(value, offset=0):
+    """First day of the month `offset` months after the month containing `value`."""
+    month_index = value.year * 12 + (value.month - 1) + offset
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"p{month:%Y%m}"
+
+
+def _partition_clause(month):
+    upper = month_start(month, 1)
+    return f"PARTITION {partition_name(month)} VALUES LESS THAN (UNIX_TIMESTAMP('{upper:%Y-%m-%d} 00:00:00'))"
+
+
+def is_partitioned(cursor, table='logs'):
+    cursor.execute("""
+        SELECT COUNT(*) AS count FROM information_schema.partitions
+        WHERE table_schema = DATABASE() AND table_name = %s AND partition_name IS NOT NULL
+    """, (table,))
+    return cursor.fetchone()['count'] > 0
+
+
+def list_partitions(cursor, table='logs'):
+    """Month partitions as a list of (name, first day of month), oldest first."""
+    cursor.execute("""
+        SELECT partition_name AS name FROM information_schema.partitions
+        WHERE table_schema = DATABASE() AND table_name = %s AND partition_name IS NOT NULL
+        ORDER BY partition_ordinal_position
+    """, (table,))
+    months = []
+    for row in cursor.fetchall():
+        if row['name'] != 'pmax':
+            months.append((row['name'], datetime.strptime(row['name'][1:], '%Y%m').date()))
+    return months
+
+
+def partition_logs_table(cursor, months_ahead=None):
+    """Convert logs to monthly RANGE partitions. Does nothing if already partitioned."""
+    if is_partitioned(cursor):
+        return False
+    months_ahead = Config.LOG_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+
+    # Partitioned InnoDB tables cannot have foreign keys
+    cursor.execute("""
+        SELECT constraint_name AS name FROM information_schema.table_constraints
+        WHERE table_schema = DATABASE() AND table_name = 'logs' AND constraint_type = 'FOREIGN KEY'
+    """)
+    for row in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE logs DROP FOREIGN KEY `{row['name']}`")
+
+    cursor.execute("SELECT MIN(created_at) AS oldest FROM logs")
+    oldest = cursor.fetchone()['oldest'] or time_windows.now()
+    first = month_start(oldest)
+    last = month_start(time_windows.now(), months_ahead)
+
+    clauses = []
+    month = first
+    while month <= last:
+        clauses.append(_partition_clause(month))
+        month = month_start(month, 1)
+    clauses.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+
+    cursor.execute(f"""
+        ALTER TABLE logs
+            MODIFY created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            DROP PRIMARY KEY,
+            ADD PRIMARY KEY (id, created_at)
+        PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) (
+            {', '.join(clauses)}
+        )
+    """)
+    return True
+
+
+def ensure_future_partitions(cursor, months_ahead=None):
+    """Split pmax so that partitions exist through `months_ahead` months from now."""
+    months_ahead = Config.LOG_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    existing = list_partitions(cursor)
+    if not existing:
+        return []
+    target = month_start(time_windows.now(), months_ahead)
+    month = month_start(existing[-1][1], 1)
+    added = []
+    while month <= target:
+        # pmax is empty as long as this runs regularly, so the reorganize is cheap
+        cursor.execute(f"""
+            ALTER TABLE logs REORGANIZE PARTITION pmax INTO (
+                {_partition_clause(month)},
+                PARTITION pmax VALUES LESS THAN MAXVALUE
+            )
+        """)
+        added.append(partition_name(month))
+        month = month_start(month, 1)
+    return added
+
+
+def _partition_rows(cursor, name, chunk_size):
+    last_id = 0
+    while True:
+        cursor.execute(f"SELECT * FROM logs PARTITION ({name}) WHERE id > %s ORDER BY id LIMIT %s",
+                       (last_id, chunk_size))
+        rows = cursor.fetchall()
+        if not rows:
+            return
+        yield from rows
+        last_id = rows[-1]['id']
+
+
+def drop_expired_partitions(cursor, cutoff, archive_dir=None, archive=True, chunk_size=None):
+    """Archive, then drop, every month partition that ends on or before `cutoff`.
+
+    Returns a list of (partition name, rows archived or None, archive file name).
+    """
+    from utils.log_retention import write_archive
+
+    archive_dir = archive_dir or Config.LOG_ARCHIVE_DIR
+    chunk_size = chunk_size or Config.LOG_RETENTION_CHUNK
+    cutoff_day = cutoff.date() if isinstance(cutoff, datetime) else cutoff
+    dropped = []
+    for name, month in list_partitions(cursor):
+        if month_start(month, 1) > cutoff_day:
+            break
+        rows = None
+        file_name = None
+        if archive:
+            os.makedirs(archive_dir, exist_ok=True)
+            counter = {'rows': 0}
+
+            def counted(iterable):
+                for row in iterable:
+                    counter['rows'] += 1
+                    yield row
+
+            file_name = f"logs-{name}.jsonl.gz"
+            write_archive(os.path.join(archive_dir, file_name), counted(_partition_rows(cursor, name, chunk_size)))
+            rows = counter['rows']
+        cursor.execute(f"ALTER TABLE logs DROP PARTITION {name}")
+        dropped.append((name, rows, file_name))
+    return dropped
+
+
+def maintain(months_ahead=None):
+    """Create upcoming partitions. Safe to call from every worker; one does the work."""
+    connection = get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            if not is_partitioned(cursor):
+                return []
+            cursor.execute("SELECT GET_LOCK(%s, 0) AS acquired", (LOCK_NAME,))
+            if not cursor.fetchone()['acquired']:
+                return []
+            try:
+                return ensure_future_partitions(cursor, months_ahead)
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+    finally:
+        connection.close()
+
+
+_maintenance_thread = None
+
+
+def start_maintenance_thread(interval=None):
+    """Run maintain() once a day (by default) on a daemon thread."""
+    global _maintenance_thread
+    interval = interval or Config.LOG_PARTITION_MAINTENANCE_INTERVAL
+    if not interval or (_maintenance_thread is not None and _maintenance_thread.is_alive()):
+        return _maintenance_thread
+
+    def run():
+        while True:
+            try:
+                maintain()
+            except Exception as e:
+                print(f"Error maintaining log partitions: {e}")
+            time.sleep(interval)
+
+    _maintenance_thread = threading.Thread(target=run, name='log-partitions', daemon=True)
+    _maintenance_thread.start()
+    return _maintenance_thread
+
+
+if __name__ == '__main__':
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'maintain'
+    connection = get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            if command == 'convert':
+                print("Converted logs to monthly partitions." if partition_logs_table(cursor)
+                      else "logs is already partitioned.")
+            elif command == 'maintain':
+                added = ensure_future_partitions(cursor)
+                print(f"Added partitions: {', '.join(added)}" if added else "Partitions are up to date.")
+            else:
+                print("Usage: python -m database.partitions [convert|maintain]")
+                sys.exit(2)
+    finally:
+        connection.close()
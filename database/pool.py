@@ -0,0 +1,166 @@
+"""A small pool of MySQL connections.
+
+get_db_connection() used to probe ports 3306-3309 and open a new connection
+for every request. The working port is now found once and cached, and
+connections are reused: callers keep calling connection.close() in their
+`finally:` blocks, which hands the connection back to the pool instead of
+closing it. The pool is per process and is rebuilt after a fork.
+"""
+import os
+import queue
+import threading
+import time
+import pymysql
+from pymysql.constants import SERVER_STATUS
+from config import Config
+from utils import metrics
+
+class PoolTimeout(pymysql.err.OperationalError):
+    """No pooled connection freed up in time: the app is busy, not the database down."""
+
+
+_port = None
+_port_lock = threading.Lock()
+
+
+def get_port():
+    """The MySQL port that answered first (probed once per process)."""
+    global _port
+    if _port is None:
+        with _port_lock:
+            if _port is None:
+                from database.init_db import get_working_connection
+                connection, port = get_working_connection()
+                connection.close()
+                _port = port
+    return _port
+
+
+class PooledConnection:
+    """Proxy for a pymysql connection whose close() returns it to the pool."""
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._pool.release(self._connection)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        # A connection that was never closed still goes back to the pool
+        if not self._closed:
+            self.close()
+
+
+class ConnectionPool:
+    def __init__(self, connect, size, timeout, recycle):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.in_use = 0
+        self.pid = os.getpid()
+
+    def get_connection(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(2013, f"No database connection available within {self.timeout}s")
+        waited = time.perf_counter() - start
+        metrics.observe('db_pool_wait_seconds', waited)
+        metrics.inc('db_pool_checkouts_total')
+
+        try:
+            connection = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.in_use += 1
+        return PooledConnection(self, connection)
+
+    def _checkout(self):
+        while True:
+            try:
+                connection, returned_at = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self._connect()
+                with self._lock:
+                    self.opened += 1
+                return connection
+            # Connections idle for a while may have been dropped by the server
+            if time.monotonic() - returned_at > self.recycle:
+                try:
+                    connection.ping(reconnect=True)
+                except Exception:
+                    self._discard(connection)
+                    continue
+            return connection
+
+    def _discard(self, connection):
+        with self._lock:
+            self.opened -= 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def release(self, connection):
+        with self._lock:
+            self.in_use -= 1
+        try:
+            if connection.open:
+                # Never hand out a connection in the middle of a transaction
+                if connection.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                    connection.rollback()
+                if not connection.get_autocommit():
+                    connection.autocommit(True)
+                self._idle.put((connection, time.monotonic()))
+            else:
+                self._discard(connection)
+        except Exception:
+            self._discard(connection)
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        return {'open': self.opened, 'in_use': self.in_use, 'idle': self._idle.qsize(), 'size': self.size}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None or _pool.pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool.pid != os.getpid():
+                from database.init_db import connect
+                _pool = ConnectionPool(connect, Config.DB_POOL_SIZE, Config.DB_POOL_TIMEOUT, Config.DB_POOL_RECYCLE)
+    return _pool
+
+
+def _pool_gauge():
+    if _pool is None:
+        return []
+    stats = _pool.stats()
+    return [((('state', 'in_use'),), stats['in_use']), ((('state', 'idle'),), stats['idle'])]
+
+
+metrics.register_gauge('db_pool_connections', 'Open pooled connections by state.', _pool_gauge)
@@ -0,0 +1,221 @@
+"""Synthetic data at realistic volume, for benchmarks.
+
+Fills the init_db schema with courses, cashiers, students, payments and logs
+from a fixed seed, so two runs with the same arguments produce the same rows.
+Rows are written as multi-row INSERTs (pymysql batches executemany into one
+statement per chunk) in one transaction per chunk, with unique and foreign
+key checks off for the session. The derived tables (student_balances and the
+log_stats counters) are rebuilt at the end.
+
+    python -m database.synthetic_data --students 100000 --payments 2000000 --logs 10000000
+    python -m database.synthetic_data --scale 0.01          # 1% of the default volume
+    python -m database.synthetic_data --clear               # remove synthetic rows
+
+Synthetic rows are marked (student numbers start with SYN-, cashiers use
+@synthetic.test addresses, courses are named "SYN ...") so --clear removes
+only them. Cashier passwords are all "synthetic123".
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.init_db import get_db_connection
+from models import log_stats, log_types, student_balances
+from utils.passwords import hash_password
+
+DEFAULTS = {'courses': 200, 'cashiers': 20, 'students': 100000, 'payments': 2000000, 'logs': 10000000}
+
+FIRST_NAMES = ['Juan', 'Maria', 'Jose', 'Ana', 'Mark', 'Angel', 'John', 'Kristine', 'Paolo', 'Camille',
+               'Miguel', 'Andrea', 'Carlo', 'Patricia', 'Rafael', 'Nicole', 'Gabriel', 'Jasmine', 'Christian',
+               'Bea', 'Joshua', 'Katrina', 'Daniel', 'Erika', 'Renz', 'Joy', 'Adrian', 'Mae', 'Luis', 'Grace']
+LAST_NAMES = ['Santos', 'Reyes', 'Cruz', 'Bautista', 'Ocampo', 'Garcia', 'Mendoza', 'Torres', 'Tomas',
+              'Andrada', 'Castillo', 'Flores', 'Villanueva', 'Ramos', 'Castro', 'Rivera', 'Aquino', 'Navarro',
+              'Salazar', 'Mercado', 'Aguilar', 'Dela Cruz', 'Gonzales', 'Lopez', 'Del Rosario', 'Pascual',
+              'Domingo', 'Soriano', 'Valdez', 'Milano']
+PROGRAMS = ['BS Information Technology', 'BS Computer Science', 'BS Nursing', 'BS Accountancy',
+            'BS Civil Engineering', 'BS Psychology', 'BA Communication', 'BS Hospitality Management',
+            'BS Criminology', 'BS Education']
+METHODS = ['cash', 'gcash', 'bank_transfer']
+LOG_ACTIONS = [('login', 'Logged in'), ('logout', 'Logged out'), ('other', 'Collected payment'),
+               ('other', 'Viewed student records'), ('other', 'Exported payments')]
+
+
+def _random_datetime(rng, start, seconds):
+    return start + timedelta(seconds=rng.randrange(seconds))
+
+
+def _next_id(cursor, table):
+    cursor.execute(f"SELECT COALESCE(MAX(id), 0) AS id FROM {table}")
+    return cursor.fetchone()['id'] + 1
+
+
+def _insert(connection, cursor, sql, rows_iter, total, chunk_size, label):
+    """Insert rows from a generator in chunks, one transaction per chunk."""
+    started = time.perf_counter()
+    done = 0
+    chunk = []
+    for row in rows_iter:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            connection.begin()
+            cursor.executemany(sql, chunk)
+            connection.commit()
+            done += len(chunk)
+            chunk = []
+            if done % (chunk_size * 20) == 0:
+                rate = done / (time.perf_counter() - started)
+                print(f"  {label}: {done:,}/{total:,} ({rate:,.0f} rows/s)")
+    if chunk:
+        connection.begin()
+        cursor.executemany(sql, chunk)
+        connection.commit()
+        done += len(chunk)
+    elapsed = time.perf_counter() - started
+    print(f"{label}: {done:,} rows in {elapsed:.1f}s ({done / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+def generate(courses, cashiers, students, payments, logs, seed=42, days=365, chunk_size=5000):
+    rng = random.Random(seed)
+    end = datetime.now().replace(microsecond=0)
+    start = end - timedelta(days=days)
+    span = days * 86400
+
+    connection = get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SET SESSION unique_checks = 0, foreign_key_checks = 0")
+
+            first_course = _next_id(cursor, 'courses')
+            course_prices = [rng.randrange(15000, 60001, 500) for _ in range(courses)]
+            _insert(connection, cursor, """
+                INSERT INTO courses (id, name, price, description, is_active) VALUES (%s, %s, %s, %s, %s)
+            """, ((first_course + i, f"SYN {PROGRAMS[i % len(PROGRAMS)]} {first_course + i}", course_prices[i],
+                   'Synthetic course', rng.random() > 0.05) for i in range(courses)),
+                courses, chunk_size, 'courses')
+
+            first_cashier = _next_id(cursor, 'users')
+            password_hash = hash_password('synthetic123')
+            _insert(connection, cursor, """
+                INSERT INTO users (id, name, email, password_hash, role, is_active) VALUES (%s, %s, %s, %s, %s, %s)
+            """, ((first_cashier + i, f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                   f"cashier{first_cashier + i}@synthetic.test", password_hash, 'cashier', True)
+                  for i in range(cashiers)),
+                cashiers, chunk_size, 'cashiers')
+            cashier_ids = list(range(first_cashier, first_cashier + cashiers))
+
+            first_student = _next_id(cursor, 'students')
+            student_courses = [first_course + rng.randrange(courses) for _ in range(students)]
+
+            def student_rows():
+                for i in range(students):
+                    number = first_student + i
+                    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                    enrolled = _random_datetime(rng, start, span)
+                    yield (number, f"SYN-{number:07d}", first, last,
+                           f"{first}.{last}.{number}@synthetic.test".lower().replace(' ', ''),
+                           f"09{rng.randrange(10 ** 9):09d}", 'Synthetic address', student_courses[i],
+                           enrolled.date(), rng.random() > 0.1, enrolled, enrolled)
+
+            _insert(connection, cursor, """
+                INSERT INTO students (id, student_id, first_name, last_name, email, phone, address, course_id,
+                                      enrollment_date, is_active, created_at, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, student_rows(), students, chunk_size, 'students')
+
+            def payment_rows():
+                for _ in range(payments):
+                    index = rng.randrange(students)
+                    paid_at = _random_datetime(rng, start, span)
+                    price = course_prices[student_courses[index] - first_course]
+                    yield (first_student + index, round(price / rng.choice((4, 6, 8, 12)), 2),
+                           rng.choice(METHODS), paid_at.date(), rng.choice(cashier_ids), None, paid_at)
+
+            if students:
+                _insert(connection, cursor, """
+                    INSERT INTO payments (student_id, amount_paid, payment_method, payment_date, collected_by,
+                                          notes, created_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """, payment_rows(), payments, chunk_size, 'payments')
+
+            log_types.seed(cursor)
+            type_ids = {code: log_types.action_type_id(cursor, code) for code, _ in LOG_ACTIONS}
+
+            def log_rows():
+                for _ in range(logs):
+                    code, action = rng.choice(LOG_ACTIONS)
+                    yield (rng.choice(cashier_ids), action, type_ids[code], 'cashier',
+                           _random_datetime(rng, start, span))
+
+            if cashiers:
+                _insert(connection, cursor, """
+                    INSERT INTO logs (user_id, action, action_type_id, role, created_at) VALUES (%s, %s, %s, %s, %s)
+                """, log_rows(), logs, chunk_size, 'logs')
+
+            print("Rebuilding student_balances and log_stats...")
+            connection.begin()
+            student_balances.rebuild(cursor)
+            log_stats.rebuild(cursor)
+            connection.commit()
+            cursor.execute("ANALYZE TABLE courses, users, students, payments, logs")
+            cursor.fetchall()
+    finally:
+        connection.close()
+
+
+def clear(chunk_size=50000):
+    """Delete synthetic rows (and the payments and logs that reference them)."""
+    connection = get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT id FROM users WHERE email LIKE '%@synthetic.test'")
+            cashier_ids = [row['id'] for row in cursor.fetchall()]
+            cursor.execute("SELECT id FROM students WHERE student_id LIKE 'SYN-%'")
+            student_ids = [row['id'] for row in cursor.fetchall()]
+            for table, column, ids in (('logs', 'user_id', cashier_ids), ('payments', 'student_id', student_ids),
+                                       ('payments', 'collected_by', cashier_ids)):
+                for i in range(0, len(ids), 1000):
+                    batch = ids[i:i + 1000]
+                    placeholders = ', '.join(['%s'] * len(batch))
+                    while cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({placeholders}) LIMIT %s",
+                                         batch + [chunk_size]):
+                        pass
+            cursor.execute("DELETE FROM student_balances WHERE student_id IN "
+                           "(SELECT id FROM students WHERE student_id LIKE 'SYN-%')")
+            cursor.execute("DELETE FROM students WHERE student_id LIKE 'SYN-%'")
+            cursor.execute("DELETE FROM users WHERE email LIKE '%@synthetic.test'")
+            cursor.execute("DELETE FROM courses WHERE name LIKE 'SYN %' "
+                           "AND id NOT IN (SELECT course_id FROM students WHERE course_id IS NOT NULL)")
+            log_stats.rebuild(cursor)
+            print(f"Removed {len(student_ids):,} synthetic students and {len(cashier_ids):,} synthetic cashiers.")
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    for name, default in DEFAULTS.items():
+        parser.add_argument(f'--{name}', type=int, default=None, help=f'rows to create (default {default:,})')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply every default count')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--days', type=int, default=365, help='spread dates over this many past days')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='rows per INSERT and transaction')
+    parser.add_argument('--clear', action='store_true', help='remove synthetic rows instead')
+    args = parser.parse_args()
+
+    if args.clear:
+        clear()
+        return
+
+    counts = {name: getattr(args, name) if getattr(args, name) is not None else max(1, int(default * args.scale))
+              for name, default in DEFAULTS.items()}
+    print("Generating " + ", ".join(f"{count:,} {name}" for name, count in counts.items()) + f" (seed {args.seed})")
+    generate(seed=args.seed, days=args.days, chunk_size=args.chunk_size, **counts)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""gunicorn settings: preforked workers with the app preloaded in the master.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+    WEB_CONCURRENCY=8 GUNICORN_THREADS=4 gunicorn -c gunicorn.conf.py wsgi:app
+
+Each worker keeps its own connection pool (DB_POOL_SIZE), so size MySQL's
+max_connections for workers x DB_POOL_SIZE plus the background threads.
+Workers share /metrics through METRICS_DIR, which defaults to a directory
+under the temp directory that is emptied when the master starts. The master
+also rebuilds static/dist if the assets changed (see utils/assets.py).
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = True
+timeout = 60
+graceful_timeout = 30  # leaves time for the log writer and email outbox to drain
+keepalive = 5
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = max_requests // 10
+accesslog = '-'
+
+# Read by config.py when the app is preloaded, after this file
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'tuition-metrics'))
+
+
+def on_starting(server):
+    # Snapshots left by an earlier run's workers would be added to this run's totals
+    shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
+
+    from utils import assets
+    if not assets.is_current():
+        assets.build()
+
+
+def post_fork(server, worker):
+    from utils import background
+    background.after_fork()
+
+
+def worker_exit(server, worker):
+    from utils import background
+    background.shutdown()
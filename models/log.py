@@ -2,6 +2,18 @@ import pymysql
 from datetime import datetime, timedelta
 from config import Config
 from database.init_db import get_db_connection
+from utils.log_retention import purge_old_logs
+from models import log_stats
+from utils.statements import statement
+
+LOGS_PAGE = statement('logs.page', """
+    SELECT l.id, l.user_id, l.action, l.role, l.created_at,
+           u.name as user_name
+    FROM logs l
+    LEFT JOIN users u ON l.user_id = u.id
+    ORDER BY l.created_at DESC
+    LIMIT %s OFFSET %s
+""", sample=(20, 0), indexes={'logs': 'idx_logs_created_at'}, max_rows=1000)
 
 
 class Log:
@@ -42,24 +54,15 @@ class Log:
         connection = get_db_connection()
         try:
             with connection.cursor() as cursor:
-                # Get total count
-                cursor.execute("SELECT COUNT(*) as total FROM logs")
-                total = cursor.fetchone()['total']
+                # Get total count from the log_stats counters (no scan of the logs table)
+                total = log_stats.total_logs(cursor)
 
                 # Calculate pagination
                 offset = (page - 1) * per_page
                 total_pages = (total + per_page - 1) // per_page
 
                 # Get logs for current page with updated query
-                sql = """
-                    SELECT l.id, l.user_id, l.action, l.role, l.created_at,
-                           u.name as user_name
-                    FROM logs l
-                    LEFT JOIN users u ON l.user_id = u.id
-                    ORDER BY l.created_at DESC
-                    LIMIT %s OFFSET %s
-                """
-                cursor.execute(sql, (per_page, offset))
+                cursor.execute(LOGS_PAGE, (per_page, offset))
                 results = cursor.fetchall()
 
                 logs = []
@@ -125,61 +128,15 @@ class Log:
 
     @classmethod
     def get_log_statistics(cls):
-        """Get basic log statistics"""
-        connection = get_db_connection()
-        try:
-            with connection.cursor() as cursor:
-                # Today's count
-                cursor.execute("""
-                    SELECT COUNT(*) as count FROM logs 
-                    WHERE DATE(created_at) = CURDATE()
-                """)
-                today_count = cursor.fetchone()['count']
-
-                # Unique users today
-                cursor.execute("""
-                    SELECT COUNT(DISTINCT user_id) as count FROM logs 
-                    WHERE DATE(created_at) = CURDATE()
-                """)
-                unique_users = cursor.fetchone()['count']
-
-                # Recent count (last hour)
-                cursor.execute("""
-                    SELECT COUNT(*) as count FROM logs 
-                    WHERE created_at >= DATE_SUB(NOW(), INTERVAL 1 HOUR)
-                """)
-                recent_count = cursor.fetchone()['count']
-
-                return {
-                    'today_count': today_count,
-                    'unique_users': unique_users,
-                    'recent_count': recent_count
-                }
-        finally:
-            connection.close()
+        """Get basic log statistics from the incremental counters (unique_users is approximate)"""
+        stats = log_stats.get_statistics()
+        return {
+            'today_count': stats['today_count'],
+            'unique_users': stats['unique_users'],
+            'recent_count': stats['recent_count']
+        }
 
     @classmethod
     def clear_old_logs(cls, days=90):
-        """Clear logs older than specified days"""
-        connection = get_db_connection()
-        try:
-            with connection.cursor() as cursor:
-                cutoff_date = datetime.now() - timedelta(days=days)
-
-                # Count logs to be deleted
-                cursor.execute("""
-                    SELECT COUNT(*) as count FROM logs 
-                    WHERE created_at < %s
-                """, (cutoff_date,))
-                count = cursor.fetchone()['count']
-
-                # Delete old logs
-                cursor.execute("""
-                    DELETE FROM logs 
-                    WHERE created_at < %s
-                """, (cutoff_date,))
-
-                connection.commit()
-                return count
-        finally:
-            connection.close()
\ No newline at end of file
+        """Archive and clear logs older than specified days, in small chunks"""
+        return purge_old_logs(days=days)['deleted']
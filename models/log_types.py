@@ -0,0 +1,102 @@
+"""Lookup tables behind the structured log columns.
+
+Each log row carries a small integer action_type_id pointing at
+log_action_types, an optional target (target_type, target_id) for the entity
+the action was about, and a short indexed role. The admin log filters match
+on these columns instead of LIKE over the free-text action, and the filter
+dropdowns are read from the lookup tables rather than SELECT DISTINCT on logs.
+"""
+import threading
+from utils import metrics
+
+# (code, label, prefixes of the legacy free-text action that map to it)
+ACTION_TYPES = [
+    ('login', 'Login', ('User login',)),
+    ('logout', 'Logout', ('User logout',)),
+    ('password_reset', 'Password reset', ('password_reset', 'Password reset')),
+    ('other', 'Other', ()),
+]
+
+ROLES = ['admin', 'cashier']
+
+_action_ids = {}
+_known_roles = set()
+_lock = threading.Lock()
+
+
+def classify_action(action):
+    """Action type code for a free-text action (used for legacy callers and backfill)."""
+    for code, _, prefixes in ACTION_TYPES:
+        if action and action.startswith(prefixes):
+            return code
+    return 'other'
+
+
+def action_type_id(cursor, code):
+    """Id of an action type, creating the row the first time a new code is seen."""
+    type_id = _action_ids.get(code)
+    metrics.inc('cache_requests_total', (('cache', 'log_action_types'), ('result', 'miss' if type_id is None else 'hit')))
+    if type_id is None:
+        cursor.execute("INSERT IGNORE INTO log_action_types (code, label) VALUES (%s, %s)",
+                       (code, code.replace('_', ' ').capitalize()))
+        cursor.execute("SELECT id FROM log_action_types WHERE code = %s", (code,))
+        type_id = cursor.fetchone()['id']
+        with _lock:
+            _action_ids[code] = type_id
+    return type_id
+
+
+def ensure_role(cursor, role):
+    """Record a role in log_roles once per process so the filter dropdown can list it."""
+    if role and role not in _known_roles:
+        cursor.execute("INSERT IGNORE INTO log_roles (name) VALUES (%s)", (role,))
+        with _lock:
+            _known_roles.add(role)
+
+
+def list_action_types(cursor):
+    cursor.execute("SELECT id, code, label FROM log_action_types ORDER BY label")
+    return cursor.fetchall()
+
+
+def list_roles(cursor):
+    cursor.execute("SELECT name FROM log_roles ORDER BY name")
+    return [row['name'] for row in cursor.fetchall()]
+
+
+def seed(cursor):
+    cursor.executemany("INSERT IGNORE INTO log_action_types (code, label) VALUES (%s, %s)",
+                       [(code, label) for code, label, _ in ACTION_TYPES])
+    cursor.executemany("INSERT IGNORE INTO log_roles (name) VALUES (%s)", [(role,) for role in ROLES])
+
+
+def backfill(cursor, chunk_size=1000):
+    """Classify existing rows that have no action type yet, one id range at a time."""
+    cursor.execute("SELECT id, code FROM log_action_types")
+    ids = {row['code']: row['id'] for row in cursor.fetchall()}
+
+    cases = []
+    params = []
+    for code, _, prefixes in ACTION_TYPES:
+        for prefix in prefixes:
+            cases.append("WHEN action LIKE %s THEN %s")
+            params.extend([prefix.replace('%', r'\%').replace('_', r'\_') + '%', ids[code]])
+    case_sql = f"CASE {' '.join(cases)} ELSE %s END"
+    params.append(ids['other'])
+
+    cursor.execute("SELECT MIN(id) AS low, MAX(id) AS high FROM logs")
+    bounds = cursor.fetchone()
+    if bounds['low'] is None:
+        return
+    low = bounds['low']
+    while low <= bounds['high']:
+        cursor.execute(f"""
+            UPDATE logs SET action_type_id = {case_sql}
+            WHERE id >= %s AND id < %s AND action_type_id IS NULL
+        """, params + [low, low + chunk_size])
+        low += chunk_size
+
+    cursor.execute("""
+        INSERT IGNORE INTO log_roles (name)
+        SELECT DISTINCT role FROM logs WHERE role IS NOT NULL AND role != ''
+    """)
@@ -0,0 +1,146 @@
+import hmac
+import threading
+import time
+from config import Config
+from database.init_db import get_db_connection
+
+
+class DatabaseOTPStore:
+    """OTPs kept in the password_resets table.
+
+    Only the newest OTP per email is ever live: issuing a new one deletes the
+    older rows and consuming deletes them all, so the table holds roughly one
+    row per reset in progress. Verification is a single probe of
+    idx_password_resets_lookup (email, is_used, created_at).
+    """
+
+    def issue(self, email, otp, ttl_minutes=None):
+        # Expiry is computed and checked by MySQL, in the session's time zone
+        ttl_minutes = ttl_minutes or Config.OTP_TTL_MINUTES
+        connection = get_db_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("DELETE FROM password_resets WHERE email = %s", (email,))
+                cursor.execute('''
+                    INSERT INTO password_resets (email, otp, expires_at)
+                    VALUES (%s, %s, NOW() + INTERVAL %s MINUTE)
+                ''', (email, otp, ttl_minutes))
+                connection.commit()
+        finally:
+            connection.close()
+
+    def verify(self, email, otp):
+        connection = get_db_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('''
+                    SELECT otp, expires_at > NOW() AS is_valid FROM password_resets
+                    WHERE email = %s AND is_used = FALSE
+                    ORDER BY created_at DESC LIMIT 1
+                ''', (email,))
+                row = cursor.fetchone()
+        finally:
+            connection.close()
+        # compare_digest() rejects str with non-ASCII characters, so compare bytes
+        return bool(row and row['is_valid'] and hmac.compare_digest(row['otp'].encode(), otp.encode()))
+
+    def consume(self, email):
+        connection = get_db_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("DELETE FROM password_resets WHERE email = %s", (email,))
+                connection.commit()
+        finally:
+            connection.close()
+
+    def purge(self, batch_size=None, pause=0.05):
+        """Delete expired (and legacy used) OTP rows in small batches. Returns rows removed."""
+        batch_size = batch_size or Config.OTP_PURGE_BATCH
+        removed = 0
+        connection = get_db_connection()
+        try:
+            with connection.cursor() as cursor:
+                for condition in ("expires_at < NOW()", "is_used = TRUE"):
+                    while True:
+                        cursor.execute(f"DELETE FROM password_resets WHERE {condition} LIMIT %s", (batch_size,))
+                        connection.commit()
+                        removed += cursor.rowcount
+                        if cursor.rowcount < batch_size:
+                            break
+                        time.sleep(pause)
+        finally:
+            connection.close()
+        return removed
+
+
+class MemoryOTPStore:
+    """OTPs kept in process memory with a TTL.
+
+    Only suitable for a single-node, single-process deployment: another worker
+    would not see an OTP issued here.
+    """
+
+    def __init__(self):
+        self._otps = {}
+        self._lock = threading.Lock()
+
+    def issue(self, email, otp, ttl_minutes=None):
+        expires = time.monotonic() + (ttl_minutes or Config.OTP_TTL_MINUTES) * 60
+        with self._lock:
+            self._otps[email] = (otp, expires)
+
+    def verify(self, email, otp):
+        with self._lock:
+            entry = self._otps.get(email)
+        if not entry:
+            return False
+        if entry[1] <= time.monotonic():
+            self.consume(email)
+            return False
+        return hmac.compare_digest(entry[0].encode(), otp.encode())
+
+    def consume(self, email):
+        with self._lock:
+            self._otps.pop(email, None)
+
+    def purge(self, batch_size=None, pause=0):
+        now = time.monotonic()
+        with self._lock:
+            expired = [email for email, (_, expires) in self._otps.items() if expires <= now]
+            for email in expired:
+                del self._otps[email]
+        return len(expired)
+
+
+_store = None
+_store_lock = threading.Lock()
+_purge_thread = None
+
+
+def get_otp_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MemoryOTPStore() if Config.OTP_STORE == 'memory' else DatabaseOTPStore()
+    return _store
+
+
+def start_purge_thread(interval=None):
+    """Purge expired OTPs every `interval` seconds on a daemon thread."""
+    global _purge_thread
+    interval = interval or Config.OTP_PURGE_INTERVAL
+    if not interval or (_purge_thread is not None and _purge_thread.is_alive()):
+        return _purge_thread
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                get_otp_store().purge()
+            except Exception as e:
+                print(f"Error purging OTPs: {e}")
+
+    _purge_thread = threading.Thread(target=run, name='otp-purge', daemon=True)
+    _purge_thread.start()
+    return _purge_thread
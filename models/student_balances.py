@@ -0,0 +1,82 @@
+"""Precomputed per-student payment totals.
+
+student_balances keeps one row per student with the sum of their payments, so
+screens that show a balance read a primary-key row instead of summing the
+payments table. The row is updated in the same transaction as the payment
+INSERT, and it is also the row that gets locked while a payment is checked
+against the remaining balance, so two cashiers cannot overpay one student.
+
+A student can have payments but no row (a database loaded from the bundled
+dump, or one where migration 0007 never ran). Such a row is seeded from the
+payments table, never from zero, both when it is locked and when a screen
+reads it, so the payment form and the overpayment check agree.
+"""
+from utils.statements import statement, sample_id
+
+LOCK_BALANCE = statement('student_balances.lock', """
+    SELECT total_paid FROM student_balances WHERE student_id = %s FOR UPDATE
+""", sample=sample_id('students'), indexes={'student_balances': 'PRIMARY'}, max_rows=1)
+
+
+# What a missing row would hold; also the fallback for reads without a row
+PAYMENTS_TOTAL = "SELECT COALESCE(SUM(amount_paid), 0) FROM payments WHERE student_id = {column}"
+
+
+def total_paid_sql(column='s.id'):
+    """SQL expression for a student's total paid: the balance row `b`, else the payments."""
+    return f"COALESCE(b.total_paid, ({PAYMENTS_TOTAL.format(column=column)}))"
+
+
+def lock_total_paid(cursor, student_id):
+    """Total paid by a student, with the balance row locked until commit.
+
+    Call inside a transaction. A missing row is created from the payments
+    table first; if another transaction creates it at the same moment, the
+    INSERT waits for that one and the locking read then sees its row.
+    """
+    cursor.execute(LOCK_BALANCE, (student_id,))
+    row = cursor.fetchone()
+    if row is not None:
+        return row['total_paid']
+    cursor.execute("""
+        INSERT INTO student_balances (student_id, total_paid, payment_count, last_payment_at)
+        SELECT %s, COALESCE(SUM(amount_paid), 0), COUNT(*), MAX(created_at)
+        FROM payments WHERE student_id = %s
+        ON DUPLICATE KEY UPDATE student_id = student_id
+    """, (student_id, student_id))
+    cursor.execute(LOCK_BALANCE, (student_id,))
+    return cursor.fetchone()['total_paid']
+
+
+def record_payment(cursor, student_id, amount):
+    """Add a payment to the student's totals. Call in the payment's transaction."""
+    cursor.execute("""
+        INSERT INTO student_balances (student_id, total_paid, payment_count, last_payment_at)
+        VALUES (%s, %s, 1, NOW())
+        ON DUPLICATE KEY UPDATE total_paid = total_paid + VALUES(total_paid),
+                                payment_count = payment_count + 1,
+                                last_payment_at = VALUES(last_payment_at)
+    """, (student_id, amount))
+
+
+def rebuild(cursor):
+    """Recompute every row from the payments table (for backfills and repairs).
+
+    Rows are overwritten in place rather than deleted and re-inserted, so a
+    payment collected while this runs never finds the table empty.
+    """
+    cursor.execute("""
+        INSERT INTO student_balances (student_id, total_paid, payment_count, last_payment_at)
+        SELECT student_id, SUM(amount_paid), COUNT(*), MAX(created_at)
+        FROM payments
+        GROUP BY student_id
+        ON DUPLICATE KEY UPDATE total_paid = VALUES(total_paid),
+                                payment_count = VALUES(payment_count),
+                                last_payment_at = VALUES(last_payment_at)
+    """)
+    cursor.execute("""
+        UPDATE student_balances b
+        LEFT JOIN payments p ON p.student_id = b.student_id
+        SET b.total_paid = 0, b.payment_count = 0, b.last_payment_at = NULL
+        WHERE p.id IS NULL
+    """)
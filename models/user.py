@@ -1,8 +1,11 @@
-from werkzeug.security import check_password_hash, generate_password_hash
 from flask_login import UserMixin
 import pymysql
 from config import Config
 from database.init_db import get_db_connection
+from utils.passwords import hash_password, verify_password, needs_rehash
+
+# id -> User as last read from the database, for get_by_id during an outage
+_last_known = {}
 
 
 class User(UserMixin):
@@ -22,7 +25,10 @@ class User(UserMixin):
         return self._is_active
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
 
     '''commented to use the automatic connecting to database with different ports.'''
     @staticmethod
@@ -39,16 +45,29 @@ class User(UserMixin):
     def get_by_id(user_id):
         # connection = User.get_db_connection()
         #for the automated connetion:
-        connection = get_db_connection()
-        """Get user by ID - Fixed version"""
-        connection = get_db_connection()
+        """Get user by ID - Fixed version
+
+        While the database is unreachable the last copy loaded by this process
+        is returned, so signed-in users stay signed in and can keep using the
+        snapshot-backed pages (see utils/snapshots.py).
+        """
+        try:
+            connection = get_db_connection()
+        except pymysql.err.OperationalError as e:
+            print(f"Error getting user by ID: {e}")
+            return _last_known.get(user_id)
         try:
             with connection.cursor() as cursor:
                 cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
                 user_data = cursor.fetchone()
                 if user_data:
-                    return User(**user_data)
+                    user = _last_known[user_id] = User(**user_data)
+                    return user
+                _last_known.pop(user_id, None)
                 return None
+        except pymysql.err.OperationalError as e:
+            print(f"Error getting user by ID: {e}")
+            return _last_known.get(user_id)
         except Exception as e:
             print(f"Error getting user by ID: {e}")
             return None
@@ -82,7 +101,7 @@ class User(UserMixin):
                 if cursor.fetchone():
                     raise Exception("Email already exists")
 
-                password_hash = generate_password_hash(password)
+                password_hash = hash_password(password)
                 cursor.execute('''
                     INSERT INTO users (name, email, password_hash, role, is_active)
                     VALUES (%s, %s, %s, %s, TRUE)
@@ -104,7 +123,7 @@ class User(UserMixin):
 
         try:
             with connection.cursor() as cursor:
-                password_hash = generate_password_hash(new_password)
+                password_hash = hash_password(new_password)
                 cursor.execute('''
                     UPDATE users SET password_hash = %s
                     WHERE email = %s
@@ -116,11 +135,14 @@ class User(UserMixin):
 
     @staticmethod
     def update_password_by_id(user_id, new_password):
-        """Update user password by user ID - needed for resend credentials"""
+        """Update user password by user ID - needed for resend credentials
+
+        Raises PasswordPoolBusy (before touching the database) when the hashing pool is full.
+        """
+        password_hash = hash_password(new_password)
         connection = get_db_connection()
         try:
             with connection.cursor() as cursor:
-                password_hash = generate_password_hash(new_password)
                 cursor.execute('''
                     UPDATE users SET password_hash = %s, updated_at = CURRENT_TIMESTAMP
                     WHERE id = %s
@@ -0,0 +1,17 @@
+import os
+import sys
+import pytest
+
+# The app's modules import each other from the repository root (config, utils, ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app(monkeypatch):
+    """The app under the test client, without the per-process background threads."""
+    from utils import background
+    monkeypatch.setattr(background, 'start', lambda: None)
+    from app import create_app
+    app = create_app()
+    app.testing = True
+    return app
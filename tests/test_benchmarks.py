@@ -0,0 +1,44 @@
+"""Hot-path benchmarks under pytest-benchmark (the cases of benchmarks/hot_paths.py).
+
+They time real queries, so they need pytest-benchmark and a MySQL database
+loaded with the synthetic dataset (python -m database.synthetic_data), and are
+skipped otherwise:
+
+    python -m pytest tests/test_benchmarks.py --benchmark-autosave
+    python -m pytest tests/test_benchmarks.py --benchmark-compare
+"""
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from benchmarks import hot_paths
+
+ROUTES = {name: (role, path) for name, role, path in hot_paths.route_cases('{course_id}')}
+METHODS = dict(hot_paths.method_cases())
+
+
+@pytest.fixture(scope='module')
+def fixtures():
+    try:
+        users, course_id, _ = hot_paths.load_fixtures()
+    except Exception as e:
+        pytest.skip(f"no benchmark database: {e}")
+    except SystemExit as e:
+        pytest.skip(str(e))
+    return users, course_id
+
+
+@pytest.mark.parametrize('name', sorted(ROUTES))
+def test_route(benchmark, app, fixtures, name):
+    users, course_id = fixtures
+    role, path = ROUTES[name]
+    path = path.replace('{course_id}', str(course_id))
+    client = hot_paths.logged_in_client(app, users[role])
+    assert client.get(path).status_code == 200
+
+    benchmark(lambda: client.get(path).get_data())
+
+
+@pytest.mark.parametrize('name', sorted(METHODS))
+def test_method(benchmark, fixtures, name):
+    benchmark(METHODS[name])
@@ -0,0 +1,77 @@
+"""Log counters (models/log_stats.py) as the log writer and the log pages use them."""
+from datetime import datetime
+from models import log, log_stats
+from utils import log_writer
+
+
+class RecordingCursor:
+    def __init__(self, rows=()):
+        self.statements = []
+        self.rows = list(rows)
+
+    def execute(self, sql, params=None):
+        self.statements.append((' '.join(sql.split()), params))
+
+    def executemany(self, sql, rows):
+        self.statements.append((' '.join(sql.split()), list(rows)))
+
+    def fetchone(self):
+        return self.rows.pop(0)
+
+    def fetchall(self):
+        return []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self):
+        return self._cursor
+
+    def begin(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_queued_entries_are_counted_under_their_own_time(monkeypatch):
+    cursor = RecordingCursor()
+    monkeypatch.setattr(log_writer, 'get_db_connection', lambda: FakeConnection(cursor))
+    monkeypatch.setattr(log_writer.log_types, 'action_type_id', lambda cursor, code: 1)
+    monkeypatch.setattr(log_writer.log_types, 'ensure_role', lambda cursor, role: None)
+    monkeypatch.setattr(log_stats.random, 'random', lambda: 1.0)
+
+    logged_at = datetime(2025, 3, 31, 23, 59, 58, 500000)
+    log_writer.write_entries([(7, 'Logged in', 'admin', 'login', None, None, logged_at)])
+
+    counters = {sql.split()[2]: params for sql, params in cursor.statements if 'log_stats' in sql}
+    assert counters['log_stats_minute'] == (datetime(2025, 3, 31, 23, 59),)
+    assert counters['log_stats_daily'] == (logged_at.date(),)
+    assert counters['log_stats_daily_users'][0] == logged_at.date()
+    assert not any('NOW()' in sql or 'CURDATE()' in sql for sql, _ in cursor.statements)
+
+
+def test_log_pages_take_the_total_from_the_counters(monkeypatch):
+    cursor = RecordingCursor(rows=[{'total': 45}])
+    monkeypatch.setattr(log, 'get_db_connection', lambda: FakeConnection(cursor))
+
+    result = log.Log.get_paginated_logs(page=2, per_page=20)
+
+    assert result['pagination'].total == 45
+    assert result['pagination'].pages == 3
+    assert not any('FROM logs' in sql and 'COUNT(*)' in sql for sql, _ in cursor.statements)
+    assert any('FROM log_stats_daily' in sql for sql, _ in cursor.statements)
@@ -0,0 +1,39 @@
+"""Retries and per-entry fallback of the background log writer (utils/log_writer.py)."""
+import pymysql
+from database.circuit import DatabaseUnavailable
+from utils import log_writer
+from utils.log_writer import LogWriter
+
+
+def entry(action):
+    return (1, action, 'admin', None, None, None, None)
+
+
+def record_writes(monkeypatch, fail):
+    """Replace write_entries; `fail(batch, attempt)` returns the error to raise, if any."""
+    calls = []
+
+    def write_entries(batch):
+        calls.append([e[1] for e in batch])
+        error = fail(batch, len(calls))
+        if error:
+            raise error
+
+    monkeypatch.setattr(log_writer, 'write_entries', write_entries)
+    monkeypatch.setattr(log_writer.time, 'sleep', lambda seconds: None)
+    return calls
+
+
+def test_batch_is_retried_while_the_database_is_unavailable(monkeypatch):
+    calls = record_writes(monkeypatch, lambda batch, attempt:
+                          DatabaseUnavailable(2003, 'circuit open') if attempt < 3 else None)
+    LogWriter(10, 10)._write([entry('a'), entry('b')])
+    assert calls == [['a', 'b']] * 3
+
+
+def test_one_bad_entry_does_not_lose_the_others(monkeypatch):
+    bad = pymysql.err.DataError(1406, 'Data too long')
+    calls = record_writes(monkeypatch, lambda batch, attempt:
+                          bad if any(e[1] == 'bad' for e in batch) else None)
+    LogWriter(10, 10)._write([entry('a'), entry('bad'), entry('c')])
+    assert calls == [['a', 'bad', 'c'], ['a'], ['bad'], ['c']]
@@ -0,0 +1,50 @@
+"""Multi-process metrics files (utils/metrics.py)."""
+import json
+import os
+import subprocess
+import sys
+import pytest
+from config import Config
+from utils import metrics
+
+pytestmark = pytest.mark.skipif(metrics.fcntl is None, reason='folding needs fcntl')
+
+
+def exited_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def worker_file(directory, pid, requests):
+    snapshot = {'pid': pid, 'counters': [['payments_inserted_total', [['method', 'cash']], requests]],
+                'histograms': [], 'gauges': [['http_requests_in_flight', [], 1]]}
+    with open(os.path.join(directory, f"{pid}.json"), 'w') as f:
+        json.dump(snapshot, f)
+
+
+def payments(snapshots):
+    return sum(value for snapshot in snapshots for name, _, value in snapshot['counters']
+               if name == 'payments_inserted_total')
+
+
+def test_exited_workers_are_folded_into_one_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'METRICS_DIR', str(tmp_path))
+    worker_file(tmp_path, exited_pid(), 3)
+    worker_file(tmp_path, exited_pid(), 4)
+    own = payments([metrics.registry.snapshot()])
+
+    assert payments(metrics.collect()) == own + 7
+    assert sorted(os.listdir(tmp_path)) == ['retired.json', 'retired.lock']
+    # Folding again changes nothing
+    assert payments(metrics.collect()) == own + 7
+
+
+def test_a_reused_pid_keeps_the_old_workers_counters(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'METRICS_DIR', str(tmp_path))
+    monkeypatch.setattr(metrics, '_written_pid', None)
+    worker_file(tmp_path, os.getpid(), 5)
+    own = payments([metrics.registry.snapshot()])
+
+    metrics.write_snapshot()
+    assert payments(metrics.collect()) == own + 5
@@ -0,0 +1,27 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+from models import user as user_module
+from utils.passwords import PasswordHasher, PasswordPoolBusy
+
+
+def test_update_password_reports_a_busy_pool_before_connecting(monkeypatch):
+    def busy(password):
+        raise PasswordPoolBusy()
+
+    def no_connection():
+        raise AssertionError('connected to the database before hashing')
+
+    monkeypatch.setattr(user_module, 'hash_password', busy)
+    monkeypatch.setattr(user_module, 'get_db_connection', no_connection)
+    with pytest.raises(PasswordPoolBusy):
+        user_module.User.update_password_by_id(1, 'Secret123')
+
+
+def test_rehash_when_the_method_or_salt_length_changes():
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', salt_length=16)
+    current = generate_password_hash('Secret123', 'pbkdf2:sha256:1000', 16)
+    assert not hasher.needs_rehash(current)
+    assert hasher.needs_rehash(generate_password_hash('Secret123', 'pbkdf2:sha256:1000', 8))
+    assert hasher.needs_rehash(generate_password_hash('Secret123', 'pbkdf2:sha256:2000', 16))
+    assert not hasher.needs_rehash('')
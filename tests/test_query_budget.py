@@ -0,0 +1,63 @@
+"""Query budgets and the N+1 detector (utils/query_budget.py) under the test client."""
+import pytest
+from config import Config
+from utils.query_budget import query_budget, budget_for, QueryBudgetExceeded
+from utils.sql_instrumentation import current_stats
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    monkeypatch.setattr(Config, 'QUERY_BUDGET_MODE', 'raise')
+
+    @query_budget(2)
+    def budgeted():
+        # Stand-in for a view's cursor: the statements its queries would record
+        statements = ["SELECT COUNT(*) FROM students", "SELECT * FROM courses WHERE id = 3"]
+        from flask import request
+        if request.args.get('extra'):
+            statements.append("SELECT * FROM payments ORDER BY created_at DESC LIMIT 5")
+        for sql in statements:
+            current_stats().record(sql, 0.001, 1)
+        return 'ok'
+
+    @query_budget(10)
+    def loop():
+        for student_id in range(4):
+            current_stats().record(f"SELECT * FROM payments WHERE student_id = {student_id}", 0.001, 1)
+        return 'ok'
+
+    app.add_url_rule('/test/budgeted', view_func=budgeted)
+    app.add_url_rule('/test/loop', view_func=loop)
+    return app.test_client()
+
+
+def test_within_budget_passes(client):
+    response = client.get('/test/budgeted')
+    assert response.status_code == 200
+    assert response.headers['X-Query-Count'] == '2'
+
+
+def test_over_budget_fails_with_statement_diff(client):
+    client.get('/test/budgeted')  # the baseline the report diffs against
+    with pytest.raises(QueryBudgetExceeded) as error:
+        client.get('/test/budgeted?extra=1')
+    report = str(error.value)
+    assert 'ran 3 queries, budget is 2' in report
+    assert '+SELECT * FROM payments ORDER BY created_at DESC LIMIT ?' in report
+
+
+def test_repeated_statement_shape_is_reported(client):
+    with pytest.raises(QueryBudgetExceeded) as error:
+        client.get('/test/loop')
+    assert '4x SELECT * FROM payments WHERE student_id = ?' in str(error.value)
+
+
+def test_warn_mode_only_prints(client, monkeypatch, capsys):
+    monkeypatch.setattr(Config, 'QUERY_BUDGET_MODE', 'warn')
+    assert client.get('/test/loop').status_code == 200
+    assert 'possible N+1' in capsys.readouterr().out
+
+
+def test_hot_endpoints_declare_budgets(app):
+    for endpoint in ('admin.dashboard', 'admin.courses', 'admin.profile'):
+        assert budget_for(app.view_functions[endpoint]) is not None, endpoint
@@ -0,0 +1,77 @@
+"""Per-client rate limit keys behind a reverse proxy, and backend failures (utils/rate_limit.py)."""
+import time
+import pytest
+from config import Config
+from utils import metrics, rate_limit
+from utils.rate_limit import MemoryBackend, SQLiteBackend
+
+
+@pytest.fixture
+def limited_client(monkeypatch):
+    def build(hops):
+        from utils import background
+        monkeypatch.setattr(background, 'start', lambda: None)
+        monkeypatch.setattr(Config, 'TRUSTED_PROXY_HOPS', hops)
+        monkeypatch.setattr(rate_limit, '_backend', rate_limit.MemoryBackend())
+        from app import create_app
+        app = create_app()
+        app.testing = True
+
+        @rate_limit.rate_limit(1, 60, key='ip', methods=('GET',))
+        def limited():
+            return 'ok'
+
+        app.add_url_rule('/test/limited', view_func=limited)
+        return app.test_client()
+    return build
+
+
+def get(client, forwarded_for):
+    return client.get('/test/limited', headers={'X-Forwarded-For': forwarded_for}).status_code
+
+
+def test_clients_behind_the_proxy_get_their_own_bucket(limited_client):
+    client = limited_client(hops=1)
+    assert get(client, '10.0.0.1') == 200
+    assert get(client, '10.0.0.2') == 200
+    assert get(client, '10.0.0.1') == 429
+
+
+def test_forwarded_for_is_ignored_without_trusted_proxies(limited_client):
+    client = limited_client(hops=0)
+    assert get(client, '10.0.0.1') == 200
+    assert get(client, '10.0.0.2') == 429
+
+
+def test_backend_errors_fail_open_and_are_counted(app, tmp_path):
+    backend = SQLiteBackend(str(tmp_path / 'limits.db'))
+    backend._connection().execute('DROP TABLE rate_limits')
+    key = ('rate_limit_backend_errors_total', ())
+    before = metrics.registry._counters.get(key, 0)
+    with app.test_request_context('/'):
+        assert backend.hit('login:ip:10.0.0.1', 1, 60, 'token_bucket') == (True, 0)
+    assert metrics.registry._counters.get(key, 0) == before + 1
+
+
+def test_new_keys_cannot_reset_a_throttled_key():
+    backend = MemoryBackend(max_keys=3)
+    assert backend.hit('login:email:a', 1, 60, 'token_bucket')[0]
+    assert not backend.hit('login:email:a', 1, 60, 'token_bucket')[0]
+    for i in range(2):
+        backend.hit(f'login:email:spray{i}', 1, 60, 'token_bucket')
+        assert not backend.hit('login:email:a', 1, 60, 'token_bucket')[0]
+    # The least recently used key is the one dropped
+    backend.hit('login:email:spray2', 1, 60, 'token_bucket')
+    assert 'login:email:spray0' not in backend._buckets
+    assert 'login:email:a' in backend._buckets
+
+
+def test_idle_rows_are_pruned(app, tmp_path, monkeypatch):
+    backend = SQLiteBackend(str(tmp_path / 'limits.db'))
+    connection = backend._connection()
+    connection.execute("INSERT INTO rate_limits VALUES ('old', 0, 0, ?)", (time.time() - 3 * rate_limit.IDLE_SECONDS,))
+    backend._pruned_at = 0
+    with app.test_request_context('/'):
+        backend.hit('login:ip:10.0.0.1', 5, 60, 'token_bucket')
+    keys = [row[0] for row in connection.execute('SELECT key FROM rate_limits')]
+    assert keys == ['login:ip:10.0.0.1']
@@ -0,0 +1,19 @@
+"""Cold-start budget and lazy heavy imports (utils/startup_profile.py)."""
+import subprocess
+import sys
+from config import Config
+from utils import startup_profile
+
+
+def test_import_app_does_not_load_heavy_modules():
+    # A fresh interpreter: this test process may already have imported them
+    code = ("import sys, app; "
+            f"print('loaded:', sorted({{m.split('.')[0] for m in sys.modules}} & {set(Config.STARTUP_LAZY_MODULES)!r}))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=startup_profile.ROOT,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == 'loaded: []'
+
+
+def test_startup_within_budget():
+    result = startup_profile.profile(runs=3)
+    assert startup_profile.check(result) == []
@@ -0,0 +1,72 @@
+"""Query plan expectations for the registered hot-path statements (utils/statements.py).
+
+The plan checks themselves run on canned EXPLAIN documents. test_registered_plans
+EXPLAINs every registered statement against MySQL, loaded with the synthetic
+dataset (python -m database.synthetic_data), and is skipped when no database answers.
+"""
+import pytest
+from utils.statements import Statement, check_plan, summarize_plan
+
+
+def plan(*tables):
+    return {'query_block': {'nested_loop': [{'table': table} for table in tables]}}
+
+
+RECENT = Statement('test.recent', '''
+    SELECT p.amount_paid, s.full_name FROM payments p JOIN students s ON s.id = p.student_id
+    ORDER BY p.created_at DESC LIMIT 5
+''', indexes={'payments': 'idx_payments_created_at'}, max_rows=1000)
+
+
+def test_expected_index_passes():
+    document = plan({'table_name': 'p', 'access_type': 'index', 'key': 'idx_payments_created_at',
+                     'rows_examined_per_scan': 5},
+                    {'table_name': 's', 'access_type': 'eq_ref', 'key': 'PRIMARY', 'rows_examined_per_scan': 1})
+    assert check_plan(RECENT, document) == []
+    assert summarize_plan(RECENT, document)[0] == \
+        'payments (p): access=index key=idx_payments_created_at rows=5'
+
+
+def test_full_scan_on_payments_fails():
+    document = plan({'table_name': 'p', 'access_type': 'ALL', 'key': None, 'rows_examined_per_scan': 500})
+    problems = check_plan(RECENT, document)
+    assert 'full table scan on payments' in problems
+    assert 'payments uses None, expected idx_payments_created_at' in problems
+
+
+def test_full_scan_allowed_with_a_reason():
+    totals = Statement('test.totals', 'SELECT SUM(amount_paid) FROM payments',
+                       full_scan_ok='totals every payment')
+    document = plan({'table_name': 'payments', 'access_type': 'ALL', 'rows_examined_per_scan': 500})
+    assert check_plan(totals, document) == []
+
+
+def test_row_ceiling():
+    document = plan({'table_name': 'p', 'access_type': 'range', 'key': 'idx_payments_created_at',
+                     'rows_examined_per_scan': 50000})
+    assert check_plan(RECENT, document) == ['payments: estimated 50000 rows examined, ceiling is 1000']
+
+
+@pytest.fixture(scope='module')
+def cursor():
+    import app  # noqa: F401  (importing the blueprints registers their statements)
+    from database.init_db import get_db_connection
+    try:
+        connection = get_db_connection()
+    except Exception as e:
+        pytest.skip(f"no MySQL to EXPLAIN against: {e}")
+    try:
+        with connection.cursor() as cursor:
+            yield cursor
+    finally:
+        connection.close()
+
+
+def test_registered_plans(cursor):
+    from utils.statements import check_all
+    results, failures = check_all(cursor)
+    report = []
+    for name, problems, diff in failures:
+        report.append(f"{name}: {'; '.join(problems)}")
+        report.extend(f"    {line}" for line in diff)
+    assert not failures, '\n'.join(report)
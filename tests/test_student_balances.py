@@ -0,0 +1,42 @@
+"""The balance row the overpayment check locks (models/student_balances.py)."""
+from decimal import Decimal
+from models import student_balances
+
+
+class BalancesCursor:
+    """Answers the balance-row queries from a dict, like a database with one payments total per student."""
+
+    def __init__(self, balances, payments):
+        self.balances = dict(balances)
+        self.payments = payments
+        self._result = None
+
+    def execute(self, sql, params=()):
+        sql = ' '.join(sql.split())
+        if sql.startswith('SELECT total_paid FROM student_balances'):
+            total = self.balances.get(params[0])
+            self._result = None if total is None else {'total_paid': total}
+        elif sql.startswith('INSERT INTO student_balances'):
+            self.balances.setdefault(params[0], self.payments.get(params[1], Decimal('0')))
+        else:
+            raise AssertionError(f'unexpected statement: {sql}')
+
+    def fetchone(self):
+        return self._result
+
+
+def test_an_existing_row_is_used_as_is():
+    cursor = BalancesCursor({3: Decimal('500.00')}, {3: Decimal('999.00')})
+    assert student_balances.lock_total_paid(cursor, 3) == Decimal('500.00')
+
+
+def test_a_missing_row_is_seeded_from_the_payments():
+    cursor = BalancesCursor({}, {3: Decimal('1200.00')})
+    assert student_balances.lock_total_paid(cursor, 3) == Decimal('1200.00')
+    assert cursor.balances[3] == Decimal('1200.00')
+
+
+def test_reads_fall_back_to_the_payments_without_a_row():
+    sql = student_balances.total_paid_sql()
+    assert sql.startswith('COALESCE(b.total_paid, (SELECT COALESCE(SUM(amount_paid), 0) FROM payments')
+    assert 'student_id = s.id' in sql
@@ -0,0 +1,22 @@
+"""Search results as the student list pages pass them to SQL (utils/student_search.py)."""
+from config import Config
+from utils.student_search import id_filter, in_rank_order
+
+
+def test_short_lists_are_inlined():
+    assert id_filter([5, 3, 9]) == ("s.id IN (%s, %s, %s)", [5, 3, 9])
+    assert id_filter([]) == ("1 = 0", [])
+
+
+def test_long_lists_are_left_to_python(monkeypatch):
+    monkeypatch.setattr(Config, 'STUDENT_SEARCH_MAX_INLINE_IDS', 3)
+    ids = [8, 6, 4, 2]
+    assert id_filter(ids) == ("1 = 1", [])
+
+    rows = [{'id': i} for i in range(10)]
+    assert [row['id'] for row in in_rank_order(rows, ids)] == ids
+
+
+def test_rank_order_drops_rows_the_sql_filters_removed():
+    rows = [{'id': 2}, {'id': 7}, {'id': 4}]
+    assert [row['id'] for row in in_rank_order(rows, [4, 5, 2, 7])] == [4, 2, 7]
@@ -0,0 +1,96 @@
+"""Window boundaries in APP_TIMEZONE (utils/time_windows.py)."""
+from datetime import date, datetime, timezone
+import pytest
+from config import Config
+from utils import time_windows
+from utils.time_windows import window, date_window, range_condition, term_start, WINDOWS
+
+
+def at_utc(monkeypatch, *utc):
+    """Make time_windows.now() see the UTC instant `utc`."""
+    instant = datetime(*utc, tzinfo=timezone.utc)
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return instant.astimezone(tz) if tz else instant.astimezone().replace(tzinfo=None)
+
+    monkeypatch.setattr(time_windows, 'datetime', FrozenDatetime)
+
+
+@pytest.fixture(autouse=True)
+def manila(monkeypatch):
+    monkeypatch.setattr(Config, 'APP_TIMEZONE', 'Asia/Manila')
+    monkeypatch.setattr(Config, 'ACADEMIC_TERM_START_MONTHS', (1, 8))
+
+
+def test_today_follows_app_timezone_not_utc(monkeypatch):
+    # 17:30 UTC on Jan 31 is already Feb 1 in Manila (UTC+8)
+    at_utc(monkeypatch, 2026, 1, 31, 17, 30)
+    assert time_windows.today() == date(2026, 2, 1)
+    assert window('today') == (datetime(2026, 2, 1), datetime(2026, 2, 2))
+    assert window('this_month') == (datetime(2026, 2, 1), datetime(2026, 3, 1))
+    assert window('yesterday') == (datetime(2026, 1, 31), datetime(2026, 2, 1))
+
+
+def test_just_before_local_midnight(monkeypatch):
+    # 15:59 UTC is 23:59 in Manila: still the same local day
+    at_utc(monkeypatch, 2026, 1, 31, 15, 59)
+    assert window('today') == (datetime(2026, 1, 31), datetime(2026, 2, 1))
+
+
+def test_session_time_zone_matches_app_timezone():
+    assert time_windows.session_time_zone(datetime(2026, 6, 1)) == '+08:00'
+
+
+@pytest.mark.parametrize('today, expected', [
+    (date(2024, 2, 29), (datetime(2024, 2, 1), datetime(2024, 3, 1))),
+    (date(2024, 12, 31), (datetime(2024, 12, 1), datetime(2025, 1, 1))),
+    (date(2025, 1, 1), (datetime(2025, 1, 1), datetime(2025, 2, 1))),
+])
+def test_this_month_crosses_month_and_year_ends(today, expected):
+    assert window('this_month', today=today) == expected
+
+
+def test_rolling_windows_include_today():
+    today = date(2025, 3, 1)
+    assert window('week', today=today) == (datetime(2025, 2, 23), datetime(2025, 3, 2))
+    assert window('month', today=today) == (datetime(2025, 1, 31), datetime(2025, 3, 2))
+    assert window('last_12_months', today=today) == (datetime(2024, 4, 1), datetime(2025, 4, 1))
+
+
+def test_term_boundaries():
+    assert term_start(date(2025, 7, 31)) == date(2025, 1, 1)
+    assert term_start(date(2025, 8, 1)) == date(2025, 8, 1)
+    assert window('term', today=date(2025, 12, 31)) == (datetime(2025, 8, 1), datetime(2026, 1, 1))
+
+
+def test_custom_end_is_inclusive():
+    assert window('custom', start=date(2025, 1, 30), end=date(2025, 1, 31)) == \
+        (datetime(2025, 1, 30), datetime(2025, 2, 1))
+    assert window('custom', start=date(2025, 1, 1), end=date(2025, 1, 1)) == \
+        (datetime(2025, 1, 1), datetime(2025, 1, 2))
+
+
+@pytest.mark.parametrize('today', [date(2024, 2, 29), date(2024, 12, 31), date(2025, 1, 1), date(2025, 7, 31)])
+def test_adjacent_windows_tile(today):
+    assert window('yesterday', today=today)[1] == window('today', today=today)[0]
+    # Consecutive terms leave no gap and don't overlap
+    term_end = window('term', today=today)[1]
+    assert window('term', today=term_end.date())[0] == term_end
+
+
+@pytest.mark.parametrize('name', [name for name in WINDOWS if name not in ('custom', 'yesterday')])
+@pytest.mark.parametrize('today', [date(2024, 2, 29), date(2024, 12, 31), date(2025, 1, 1)])
+def test_windows_are_half_open_midnights_containing_today(name, today):
+    first, last = window(name, today=today)
+    assert first < last
+    assert first.time() == last.time() == datetime.min.time()
+    assert first <= datetime.combine(today, datetime.min.time()) < last
+
+
+def test_date_window_and_condition():
+    assert date_window('today', today=date(2025, 1, 1)) == (date(2025, 1, 1), date(2025, 1, 2))
+    condition, params = range_condition('p.created_at', 'today', today=date(2025, 1, 1))
+    assert condition == 'p.created_at >= %s AND p.created_at < %s'
+    assert params == [datetime(2025, 1, 1), datetime(2025, 1, 2)]
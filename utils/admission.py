@@ -0,0 +1,201 @@
+"""Admission control and statement time limits for heavy endpoints.
+
+Exports and full-roster pages can each hold a MySQL thread and a web worker
+for a long time. A few of them at once could leave nothing for cashiers
+collecting payments. Heavy views declare a route class:
+
+    @cashier_bp.route('/export/payments')
+    @login_required
+    @cashier_required
+    @admission('export')
+    def export_payments():
+
+ADMISSION_LIMITS gives each class these settings:
+
+- concurrent: requests of the class running at once. A request over the
+  limit waits up to `wait` seconds in a queue of at most `queue` requests,
+  then gets 503 with Retry-After.
+- per_user: requests one user may have running at once. Beyond it the
+  request gets 429 with Retry-After (e.g. a double-clicked export).
+- timeout_ms: MAX_EXECUTION_TIME for the request's SELECTs, including
+  fanned-out ones (see InstrumentedCursor). MySQL stops a SELECT that runs
+  longer, and the view gets error 3024 instead of hanging.
+
+A class may set only timeout_ms. Limits are per worker process; with
+ADMISSION_BACKEND = 'file' the `concurrent` limit is shared by every worker
+on the host through flock'd slot files in ADMISSION_DIR (not on Windows).
+Rejections are counted in admission_rejections_total.
+"""
+import os
+import tempfile
+import threading
+import time
+from functools import wraps
+from flask import request, jsonify, make_response, render_template
+from flask_login import current_user
+from config import Config
+from utils import metrics
+from utils.sql_instrumentation import statement_timeout
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class HostSlots:
+    """`limit` slots shared by the worker processes on one host, one flock'd file each."""
+
+    def __init__(self, directory, name, limit):
+        os.makedirs(directory, exist_ok=True)
+        self.paths = [os.path.join(directory, f"{name}.{i}.lock") for i in range(limit)]
+        self._local = threading.local()
+
+    def acquire(self, deadline):
+        while True:
+            for path in self.paths:
+                handle = open(path, 'a')
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    handle.close()
+                    continue
+                self._local.handle = handle
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def release(self):
+        handle = self._local.handle
+        self._local.handle = None
+        fcntl.flock(handle, fcntl.LOCK_UN)
+        handle.close()
+
+
+class Limiter:
+    def __init__(self, name, concurrent, queue=0, wait=0, per_user=None, host_slots=None):
+        self.name = name
+        self.concurrent = concurrent
+        self.queue = queue
+        self.wait = wait
+        self.per_user = per_user
+        self.host_slots = host_slots
+        self._condition = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self._users = {}
+
+    def acquire(self, user_id):
+        """None when admitted, otherwise the HTTP status to answer with (429 or 503)."""
+        deadline = time.monotonic() + self.wait
+        with self._condition:
+            if self.per_user and self._users.get(user_id, 0) >= self.per_user:
+                return 429
+            if self.active >= self.concurrent:
+                if self.waiting >= self.queue or self.wait <= 0:
+                    return 503
+                self.waiting += 1
+                try:
+                    while self.active >= self.concurrent:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return 503
+                        self._condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.active += 1
+            self._users[user_id] = self._users.get(user_id, 0) + 1
+
+        if self.host_slots is not None and not self.host_slots.acquire(deadline):
+            self._release_local(user_id)
+            return 503
+        return None
+
+    def _release_local(self, user_id):
+        with self._condition:
+            self.active -= 1
+            count = self._users.get(user_id, 1) - 1
+            if count:
+                self._users[user_id] = count
+            else:
+                self._users.pop(user_id, None)
+            self._condition.notify()
+
+    def release(self, user_id):
+        if self.host_slots is not None:
+            self.host_slots.release()
+        self._release_local(user_id)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(route_class):
+    """The Limiter for a route class, or None if the class has no concurrency limit."""
+    settings = Config.ADMISSION_LIMITS.get(route_class, {})
+    if not settings.get('concurrent'):
+        return None
+    with _limiters_lock:
+        limiter = _limiters.get(route_class)
+        if limiter is None:
+            host_slots = None
+            if Config.ADMISSION_BACKEND == 'file' and fcntl is not None:
+                directory = Config.ADMISSION_DIR or os.path.join(tempfile.gettempdir(), 'stbps_admission')
+                host_slots = HostSlots(directory, route_class, settings['concurrent'])
+            limiter = _limiters[route_class] = Limiter(
+                route_class, settings['concurrent'], settings.get('queue', 0), settings.get('wait', 0),
+                settings.get('per_user'), host_slots)
+    return limiter
+
+
+def _reject(route_class, status, retry_after, as_json):
+    metrics.inc('admission_rejections_total', (('class', route_class), ('status', str(status))))
+    if status == 429:
+        message = 'You already have this running. Please wait for it to finish.'
+    else:
+        message = 'The server is busy with other reports right now. Please try again in a few seconds.'
+    if as_json or request.accept_mimetypes.best == 'application/json':
+        response = make_response(jsonify({'success': False, 'message': message}), status)
+    else:
+        response = make_response(render_template('busy.html', message=message, retry_after=retry_after), status)
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def admission(route_class, json=False):
+    """Apply the route class's concurrency limit and statement time limit to a view.
+
+    Rejections render busy.html, or a JSON error for views called from scripts (json=True).
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            settings = Config.ADMISSION_LIMITS.get(route_class, {})
+            limiter = get_limiter(route_class)
+            user_id = current_user.get_id()
+            if limiter is not None:
+                status = limiter.acquire(user_id)
+                if status is not None:
+                    return _reject(route_class, status, max(1, int(settings.get('retry_after', 5))), json)
+            token = statement_timeout.set(settings.get('timeout_ms', 0))
+            try:
+                return f(*args, **kwargs)
+            finally:
+                statement_timeout.reset(token)
+                if limiter is not None:
+                    limiter.release(user_id)
+
+        return decorated_function
+
+    return decorator
+
+
+def _in_flight():
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return [((('class', limiter.name),), limiter.active) for limiter in limiters]
+
+
+metrics.register_gauge('admission_in_flight', 'Requests running per admission-controlled route class.', _in_flight)
@@ -0,0 +1,217 @@
+"""Fingerprinted, precompressed static assets.
+
+Templates link assets through the asset_url() Jinja global:
+
+    <link href="{{ asset_url('css/app.css') }}" rel="stylesheet">
+
+`python -m utils.assets --build` copies every file in ASSET_BUNDLES (paths
+under static/) to static/dist/ with a content hash in its name, e.g.
+dist/css/app.3f9c0a1b2d4e.css. It also writes a .gz copy next to each one,
+and a .br copy when the brotli package is installed, and records the names
+in static/dist/manifest.json. gunicorn.conf.py runs the build on start when
+the manifest is out of date.
+
+asset_url() returns the hashed URL when the manifest lists the asset. Those
+files are served with Cache-Control "immutable" for ASSET_MAX_AGE, as the
+precompressed copy the browser accepts. Because a changed file gets a new
+name, the browser never needs to revalidate. Without a build (e.g. the
+development server) asset_url() returns the plain static URL.
+
+Third-party files not shipped in static/ (Bootstrap Icons, Chart.js) fall
+back to the CDN URL in ASSET_CDN_FALLBACKS. Copy them into static/vendor/ for
+offline use, and the next build picks them up. Bootstrap Icons needs its
+fonts/ directory too.
+
+Usage:
+    python -m utils.assets --build    # build static/dist (skips if up to date)
+    python -m utils.assets --build --force
+    python -m utils.assets --check    # exit 1 if static/dist is out of date
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import sys
+import threading
+from flask import request, send_file, url_for, abort
+from werkzeug.security import safe_join
+from config import Config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 12
+
+# Source maps aren't copied, so their comments would only cause 404s in the browser's devtools
+_source_map = re.compile(rb'\n?(/\*# sourceMappingURL=[^*]*\*/|//# sourceMappingURL=\S*)\s*$')
+_css_url = re.compile(rb'url\(\s*([\'"]?)(?!data:|https?:|/|#)([^\'")?#]+)([^\'")]*)\1\s*\)')
+_encodings = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _digest(names, static_dir):
+    """Hash of the sources' names and contents, to tell whether a build is current."""
+    digest = hashlib.sha256()
+    for name in names:
+        path = os.path.join(static_dir, name)
+        if os.path.isfile(path):
+            digest.update(name.encode())
+            with open(path, 'rb') as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+    digest.update(b'brotli' if brotli is not None else b'')
+    return digest.hexdigest()
+
+
+def _rewrite_css_urls(data, name, hashed):
+    # Fonts and images next to the stylesheet stay where they are; point at them from dist/
+    source_dir = posixpath.dirname(name)
+    target_dir = posixpath.dirname(posixpath.join(DIST, hashed))
+
+    def rewrite(match):
+        quote, path, suffix = match.groups()
+        target = posixpath.relpath(posixpath.normpath(posixpath.join(source_dir, path.decode())), target_dir)
+        return b'url(' + quote + target.encode() + suffix + quote + b')'
+
+    return _css_url.sub(rewrite, data)
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.{os.getpid()}.tmp", 'wb') as f:
+        f.write(data)
+    os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+
+def read_manifest(static_dir=STATIC_DIR):
+    try:
+        with open(os.path.join(static_dir, DIST, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_current(static_dir=STATIC_DIR):
+    manifest = read_manifest(static_dir)
+    return manifest is not None and manifest.get('digest') == _digest(Config.ASSET_BUNDLES, static_dir)
+
+
+def build(static_dir=STATIC_DIR):
+    """Write static/dist and its manifest; return the manifest."""
+    dist_dir = os.path.join(static_dir, DIST)
+    if os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+
+    assets = {}
+    for name in Config.ASSET_BUNDLES:
+        path = os.path.join(static_dir, name)
+        if not os.path.isfile(path):
+            fallback = Config.ASSET_CDN_FALLBACKS.get(name)
+            print(f"Asset {name} not in static/; " + (f"pages will use {fallback}" if fallback else "skipped"))
+            continue
+        with open(path, 'rb') as f:
+            data = _source_map.sub(b'\n', f.read())
+        stem, extension = posixpath.splitext(name)
+        hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{extension}"
+        if extension == '.css':
+            data = _rewrite_css_urls(data, name, hashed)
+
+        target = os.path.join(dist_dir, hashed)
+        _write(target, data)
+        sizes = {'identity': len(data)}
+        variants = [('gzip', '.gz', gzip.compress(data, 9, mtime=0))]
+        if brotli is not None:
+            variants.append(('br', '.br', brotli.compress(data, quality=11)))
+        for encoding, suffix, compressed in variants:
+            # Already-compressed formats (fonts, images) don't get smaller
+            if len(compressed) < len(data):
+                _write(target + suffix, compressed)
+                sizes[encoding] = len(compressed)
+        assets[name] = {'path': hashed, 'sizes': sizes}
+
+    manifest = {'digest': _digest(Config.ASSET_BUNDLES, static_dir), 'assets': assets}
+    _write(os.path.join(dist_dir, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+
+def get_manifest():
+    """The built assets, loaded on first use (the build may run after the app is imported)."""
+    global _manifest
+    if _manifest is None:
+        with _manifest_lock:
+            if _manifest is None:
+                manifest = read_manifest()
+                _manifest = manifest['assets'] if manifest else {}
+    return _manifest
+
+
+def asset_url(name):
+    entry = get_manifest().get(name)
+    if entry is not None:
+        return url_for('static', filename=f"{DIST}/{entry['path']}")
+    if name in Config.ASSET_CDN_FALLBACKS and not os.path.isfile(os.path.join(STATIC_DIR, name)):
+        return Config.ASSET_CDN_FALLBACKS[name]
+    return url_for('static', filename=name)
+
+
+def send_built(filename):
+    """Serve a file from static/dist: precompressed if the browser accepts it, cached for good."""
+    path = safe_join(os.path.join(STATIC_DIR, DIST), filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    encoding = None
+    for candidate, suffix in _encodings:
+        if request.accept_encodings[candidate] and os.path.isfile(path + suffix):
+            path += suffix
+            encoding = candidate
+            break
+
+    response = send_file(path, mimetype=mimetype, max_age=Config.ASSET_MAX_AGE, conditional=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    """Add the asset_url() template global and serve static/dist through send_built()."""
+    app.jinja_env.globals['asset_url'] = asset_url
+    serve_static = app.view_functions['static']
+
+    def static(filename):
+        if filename.startswith(f"{DIST}/") and filename != f"{DIST}/{MANIFEST}":
+            return send_built(filename[len(DIST) + 1:])
+        return serve_static(filename=filename)
+
+    app.view_functions['static'] = static
+
+
+if __name__ == '__main__':
+    if '--check' in sys.argv:
+        if not is_current():
+            print("static/dist is out of date; run python -m utils.assets --build")
+            sys.exit(1)
+        print("static/dist is up to date")
+    elif '--build' in sys.argv:
+        if is_current() and '--force' not in sys.argv:
+            print("static/dist is up to date")
+            sys.exit(0)
+        for name, entry in sorted(build()['assets'].items()):
+            sizes = ', '.join(f"{encoding} {size / 1024:.1f} KB" for encoding, size in sorted(entry['sizes'].items()))
+            print(f"{name} -> {DIST}/{entry['path']} ({sizes})")
+    else:
+        print(__doc__)
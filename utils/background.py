@@ -0,0 +1,71 @@
+"""Per-process background work: start it in each worker, stop it cleanly.
+
+A preforking server (gunicorn with preload_app, see gunicorn.conf.py) imports
+the app once in the master and forks workers from it, so threads must not be
+started at import time: they would run in the master and not in the workers.
+Instead:
+
+- start() runs the OTP purge, log partition maintenance, metrics flush, log
+  writer and email outbox threads for the current process. create_app()
+  calls it before the first request each process serves, and gunicorn's
+  post_fork hook calls after_fork(), which also drops the metric values the
+  worker inherited from the master.
+- shutdown() drains the log writer and email outbox (up to
+  SHUTDOWN_DRAIN_TIMEOUT seconds each), writes a last metrics snapshot and
+  stops the password hashing pool. It runs from gunicorn's worker_exit hook
+  and at interpreter exit.
+
+Connection pools, the password hasher and the SQLite stores check os.getpid()
+and reopen in a new process by themselves.
+"""
+import atexit
+import os
+import threading
+from config import Config
+from database.partitions import start_maintenance_thread
+from models.otp_store import start_purge_thread
+from utils import metrics
+from utils.log_writer import get_log_writer
+from utils.outbox import get_outbox
+from utils.passwords import get_hasher
+
+_started_pid = None
+_lock = threading.Lock()
+
+
+def start():
+    """Start this process's background threads (once per process)."""
+    global _started_pid
+    if _started_pid == os.getpid():
+        return
+    with _lock:
+        if _started_pid == os.getpid():
+            return
+        start_purge_thread()
+        start_maintenance_thread()
+        metrics.start_flush_thread()
+        get_log_writer().start()
+        get_outbox().start()
+        atexit.register(shutdown)
+        _started_pid = os.getpid()
+
+
+def after_fork():
+    """Call in a freshly forked worker (gunicorn post_fork)."""
+    metrics.registry.clear()
+    start()
+
+
+def shutdown(timeout=None):
+    """Drain queued log entries and mail before the process exits."""
+    timeout = Config.SHUTDOWN_DRAIN_TIMEOUT if timeout is None else timeout
+    if not get_log_writer().drain(timeout):
+        print(f"Log writer still had {get_log_writer().depth()} entries after {timeout}s")
+    if not get_outbox().drain(timeout):
+        print(f"Email outbox still had {get_outbox().depth()} messages after {timeout}s")
+    if Config.METRICS_DIR:
+        try:
+            metrics.write_snapshot()
+        except Exception as e:
+            print(f"Error writing metrics snapshot: {e}")
+    get_hasher().shutdown(wait=False)
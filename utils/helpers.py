@@ -4,60 +4,24 @@ from datetime import datetime
 from functools import wraps
 from flask import flash, redirect, url_for
 from flask_login import current_user
-import pymysql
-from config import Config
-from database.init_db import get_working_connection
+from utils import log_writer
 
 
 def generate_otp():
     return ''.join(random.choices(string.digits, k=6))
 
 
-def log_activity(user_id, action, role=None):
-    # connection = pymysql.connect(
-    #     host=Config.MYSQL_HOST,
-    #     user=Config.MYSQL_USER,
-    #     password=Config.MYSQL_PASSWORD,
-    #     database=Config.MYSQL_DB,
-    #     cursorclass=pymysql.cursors.DictCursor
-    # )
+def log_activity(user_id, action, role=None, action_type=None, target_type=None, target_id=None):
+    """Log user activity with the new table structure
 
-    '''use automated port'''
-    _, port = get_working_connection()
-    connection = pymysql.connect(
-        host=Config.MYSQL_HOST,
-        port=port,  # ✅ Add this line
-        user=Config.MYSQL_USER,
-        password=Config.MYSQL_PASSWORD,
-        database=Config.MYSQL_DB,
-        cursorclass=pymysql.cursors.DictCursor
-    )
-
-    """Log user activity with the new table structure"""
+    action_type is a log_action_types code (derived from the action text when
+    omitted); target_type/target_id identify the entity the action was about.
+    The row is written by the background log writer (see utils/log_writer.py).
+    """
     try:
-        from models.user import User  # Import here to avoid circular imports
-        # connection = User.get_db_connection()
-
-        with connection.cursor() as cursor:
-            # Get user role if not provided
-            if role is None:
-                cursor.execute("SELECT role FROM users WHERE id = %s", (user_id,))
-                user = cursor.fetchone()
-                role = user['role'] if user else 'unknown'
-
-            # Insert log with new table structure
-            cursor.execute("""
-                INSERT INTO logs (user_id, action, role, created_at)
-                VALUES (%s, %s, %s, NOW())
-            """, (user_id, action, role))
-
-            connection.commit()
-
+        log_writer.log(user_id, action, role, action_type, target_type, target_id)
     except Exception as e:
         print(f"Error logging activity: {e}")
-    finally:
-        if 'connection' in locals():
-            connection.close()
 
 
 def admin_required(f):
@@ -0,0 +1,249 @@
+"""Chunked log retention with on-disk archives.
+
+Old rows are removed from `logs` in primary-key ranges of `chunk_size` ids.
+Each range is first written to a gzip-compressed JSONL file in the archive
+directory, then deleted in its own short transaction, then the run pauses so
+foreground queries get the locks and I/O back. A checkpoint file records the
+cutoff and the last id handled, so an interrupted run resumes where it stopped
+(with the same cutoff) instead of starting over.
+
+When logs is partitioned by month (database/partitions.py), whole expired
+months are archived and dropped as partitions first, so only the month that
+contains the cutoff is deleted row by row.
+
+    python -m utils.log_retention --days 90
+"""
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, date
+from decimal import Decimal
+from config import Config
+from database.init_db import get_db_connection
+from database.partitions import is_partitioned, drop_expired_partitions, month_start
+from utils import time_windows
+from models import log_stats
+
+CHECKPOINT_FILE = 'retention.checkpoint.json'
+LOCK_NAME = 'logs_retention'
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def write_archive(path, rows):
+    """Atomically write rows to a .jsonl.gz file (temp file, fsync, rename)."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as f:
+            for row in rows:
+                f.write(json.dumps(row, default=_json_default, separators=(',', ':')).encode('utf-8'))
+                f.write(b'\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp_path, path)
+
+
+def _read_checkpoint(archive_dir):
+    path = os.path.join(archive_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_checkpoint(archive_dir, checkpoint):
+    path = os.path.join(archive_dir, CHECKPOINT_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(path + '.tmp', path)
+
+
+def _clear_checkpoint(archive_dir):
+    path = os.path.join(archive_dir, CHECKPOINT_FILE)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def purge_old_logs(days=None, chunk_size=None, pause=None, archive_dir=None, archive=True, progress=None):
+    """Archive and delete logs older than `days` days, one id range at a time.
+
+    `progress(done_ids, total_ids, deleted)` is called after every chunk.
+    Returns a summary dict. Only one run can be active at a time across all
+    workers (guarded by a MySQL named lock).
+    """
+    days = Config.LOG_RETENTION_DAYS if days is None else days
+    chunk_size = chunk_size or Config.LOG_RETENTION_CHUNK
+    pause = Config.LOG_RETENTION_PAUSE if pause is None else pause
+    archive_dir = archive_dir or Config.LOG_ARCHIVE_DIR
+    os.makedirs(archive_dir, exist_ok=True)
+
+    summary = {'deleted': 0, 'archived_files': [], 'dropped_partitions': [], 'resumed': False, 'completed': False}
+
+    connection = get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT GET_LOCK(%s, 0) AS acquired", (LOCK_NAME,))
+            if not cursor.fetchone()['acquired']:
+                summary['message'] = 'Another log retention run is already in progress'
+                return summary
+
+            try:
+                checkpoint = _read_checkpoint(archive_dir)
+                if checkpoint:
+                    cutoff = datetime.fromisoformat(checkpoint['cutoff'])
+                    summary['deleted'] = checkpoint.get('deleted', 0)
+                    summary['resumed'] = True
+                else:
+                    cutoff = time_windows.now() - timedelta(days=days)
+                    checkpoint = {'cutoff': cutoff.isoformat(), 'last_id': 0, 'deleted': 0}
+
+                # On a partitioned table whole expired months go with DROP PARTITION;
+                # only the rows of the month containing the cutoff are deleted below
+                if is_partitioned(cursor):
+                    for name, rows, file_name in drop_expired_partitions(cursor, cutoff, archive_dir, archive):
+                        month = datetime.strptime(name[1:], '%Y%m').date()
+                        log_stats.forget_days(cursor, month, month_start(month, 1))
+                        summary['dropped_partitions'].append(name)
+                        summary['deleted'] += rows or 0
+                        if file_name:
+                            summary['archived_files'].append(file_name)
+
+                # Id range to walk: from the oldest row up to the first row at/after the
+                # cutoff. Both are single index probes; there is no COUNT scan.
+                cursor.execute("SELECT MIN(id) AS low, MAX(id) AS high FROM logs")
+                bounds = cursor.fetchone()
+                if bounds['low'] is None:
+                    _clear_checkpoint(archive_dir)
+                    summary['completed'] = True
+                    return summary
+                cursor.execute("""
+                    SELECT id FROM logs WHERE created_at >= %s
+                    ORDER BY created_at, id LIMIT 1
+                """, (cutoff,))
+                boundary = cursor.fetchone()
+                end_id = boundary['id'] if boundary else bounds['high'] + 1
+
+                start_id = max(bounds['low'], checkpoint['last_id'] + 1)
+                total_ids = max(0, end_id - start_id)
+                low = start_id
+
+                while low < end_id:
+                    high = min(low + chunk_size, end_id)
+
+                    if archive:
+                        cursor.execute("""
+                            SELECT * FROM logs
+                            WHERE id >= %s AND id < %s AND created_at < %s
+                            ORDER BY id
+                        """, (low, high, cutoff))
+                        rows = cursor.fetchall()
+                        if rows:
+                            name = f"logs-{cutoff:%Y%m%d}-{low:010d}-{high - 1:010d}.jsonl.gz"
+                            write_archive(os.path.join(archive_dir, name), rows)
+                            summary['archived_files'].append(name)
+                        day_counts = log_stats.count_by_day(rows)
+                    else:
+                        cursor.execute("""
+                            SELECT DATE(created_at) AS day, COUNT(*) AS count FROM logs
+                            WHERE id >= %s AND id < %s AND created_at < %s
+                            GROUP BY day
+                        """, (low, high, cutoff))
+                        day_counts = {row['day']: row['count'] for row in cursor.fetchall()}
+
+                    connection.begin()
+                    cursor.execute("""
+                        DELETE FROM logs
+                        WHERE id >= %s AND id < %s AND created_at < %s
+                    """, (low, high, cutoff))
+                    deleted = cursor.rowcount
+                    log_stats.subtract(cursor, day_counts)
+                    connection.commit()
+
+                    summary['deleted'] += deleted
+                    checkpoint['last_id'] = high - 1
+                    checkpoint['deleted'] = summary['deleted']
+                    _write_checkpoint(archive_dir, checkpoint)
+
+                    if progress:
+                        progress(high - start_id, total_ids, summary['deleted'])
+
+                    low = high
+                    if low < end_id and pause:
+                        time.sleep(pause)
+
+                _clear_checkpoint(archive_dir)
+                summary['completed'] = True
+                return summary
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+    finally:
+        connection.close()
+
+
+class RetentionJob:
+    """Runs purge_old_logs on a background thread and exposes its progress."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self.state = {'status': 'idle'}
+
+    def start(self, **kwargs):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self.state = {'status': 'running', 'done': 0, 'total': 0, 'deleted': 0,
+                          'started_at': time_windows.now().isoformat()}
+            self._thread = threading.Thread(target=self._run, kwargs=kwargs, name='log-retention', daemon=True)
+            self._thread.start()
+            return True
+
+    def _progress(self, done, total, deleted):
+        self.state.update(done=done, total=total, deleted=deleted)
+
+    def _run(self, **kwargs):
+        try:
+            summary = purge_old_logs(progress=self._progress, **kwargs)
+            self.state.update(
+                status='completed' if summary['completed'] else 'skipped',
+                deleted=summary['deleted'],
+                archived_files=len(summary['archived_files']),
+                message=summary.get('message'),
+                finished_at=time_windows.now().isoformat()
+            )
+        except Exception as e:
+            print(f"Error clearing old logs: {e}")
+            self.state.update(status='failed', message=str(e), finished_at=time_windows.now().isoformat())
+
+
+retention_job = RetentionJob()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Archive and delete old rows from the logs table.')
+    parser.add_argument('--days', type=int, default=Config.LOG_RETENTION_DAYS)
+    parser.add_argument('--chunk-size', type=int, default=Config.LOG_RETENTION_CHUNK)
+    parser.add_argument('--pause', type=float, default=Config.LOG_RETENTION_PAUSE)
+    parser.add_argument('--archive-dir', default=Config.LOG_ARCHIVE_DIR)
+    parser.add_argument('--no-archive', action='store_true', help='delete without writing archive files')
+    args = parser.parse_args()
+
+    def report(done, total, deleted):
+        percent = (done / total * 100) if total else 100
+        print(f"\r{percent:5.1f}%  ids {done}/{total}  deleted {deleted}", end='', flush=True)
+
+    result = purge_old_logs(days=args.days, chunk_size=args.chunk_size, pause=args.pause,
+                            archive_dir=args.archive_dir, archive=not args.no_archive, progress=report)
+    print()
+    print(result.get('message') or f"Deleted {result['deleted']} log entries "
+                                     f"into {len(result['archived_files'])} archive file(s).")
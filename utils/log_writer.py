@@ -0,0 +1,164 @@
+"""Activity log writes off the request path.
+
+log_activity() puts each entry on an in-process queue and returns; a daemon
+thread writes queued entries in batches, one transaction per batch, so a
+login or payment no longer waits for the logs INSERT and the log_stats
+counters. The entry keeps the time it was logged, not the time it was written.
+
+While the database can't be reached (breaker open, pool full, connection
+lost) the thread keeps the batch and retries it, backing off 1, 2, 4... up to
+LOG_RETRY_MAX_DELAY seconds. Any other error fails only the batch's
+transaction; its entries are then written one at a time, so one bad entry
+doesn't lose the others.
+
+When the queue is full (LOG_QUEUE_SIZE) the entry is written inline instead
+of dropped. drain() waits for the queue to empty; the app calls it on
+shutdown (see utils/background.py) so no entry queued before a graceful
+restart is lost. LOG_WRITER_ENABLED=false writes every entry inline.
+"""
+import os
+import queue
+import threading
+import time
+from config import Config
+from database.circuit import is_transient
+from database.init_db import get_db_connection
+from models import log_stats, log_types
+from utils import metrics
+from utils.time_windows import now
+
+
+def write_entries(entries):
+    """Write (user_id, action, role, action_type, target_type, target_id, created_at) tuples."""
+    connection = get_db_connection()
+    try:
+        # Pooled connections autocommit; the logs rows and their counters commit together
+        connection.begin()
+        with connection.cursor() as cursor:
+            rows = []
+            for user_id, action, role, action_type, target_type, target_id, created_at in entries:
+                # Get user role if not provided
+                if role is None:
+                    cursor.execute("SELECT role FROM users WHERE id = %s", (user_id,))
+                    user = cursor.fetchone()
+                    role = user['role'] if user else 'unknown'
+
+                type_id = log_types.action_type_id(cursor, action_type or log_types.classify_action(action))
+                log_types.ensure_role(cursor, role)
+                rows.append((user_id, action, type_id, role, target_type, target_id, created_at))
+
+            cursor.executemany("""
+                INSERT INTO logs (user_id, action, action_type_id, role, target_type, target_id, created_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, rows)
+
+            # Keep the dashboard counters in step with the table
+            for row in rows:
+                log_stats.record(cursor, row[0], row[6])
+
+            connection.commit()
+    except Exception:
+        try:
+            connection.rollback()
+        except Exception:
+            pass  # the connection is gone; the server rolled back
+        raise
+    finally:
+        connection.close()
+
+
+class LogWriter:
+    def __init__(self, max_size, batch_size):
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+                self._thread.start()
+        return self._thread
+
+    def submit(self, entry):
+        self.start()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            write_entries([entry])
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch):
+        delay = 1
+        while True:
+            try:
+                write_entries(batch)
+                return
+            except Exception as e:
+                if not is_transient(e):
+                    error = e
+                    break
+                print(f"Database unavailable, retrying {len(batch)} log entries in {delay}s: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, Config.LOG_RETRY_MAX_DELAY)
+
+        if len(batch) == 1:
+            print(f"Error logging activity {batch[0][1]!r}: {error}")
+            return
+        # Some entry can't be written; write the others one at a time
+        for entry in batch:
+            self._write([entry])
+
+    def drain(self, timeout=None):
+        """Wait until every queued entry is written; False if `timeout` ran out first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_log_writer():
+    global _writer
+    if _writer is None or _writer.pid != os.getpid():
+        with _writer_lock:
+            if _writer is None or _writer.pid != os.getpid():
+                _writer = LogWriter(Config.LOG_QUEUE_SIZE, Config.LOG_BATCH_SIZE)
+                _writer.pid = os.getpid()
+    return _writer
+
+
+def log(user_id, action, role=None, action_type=None, target_type=None, target_id=None):
+    entry = (user_id, action, role, action_type, target_type, target_id, now())
+    if Config.LOG_WRITER_ENABLED:
+        get_log_writer().submit(entry)
+    else:
+        write_entries([entry])
+
+
+metrics.register_gauge('log_writer_queue_depth', 'Activity log entries waiting to be written.',
+                       lambda: get_log_writer().depth())
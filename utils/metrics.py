@@ -0,0 +1,350 @@
+"""Prometheus text-format metrics.
+
+Counters and histograms live in one in-process registry guarded by a lock, so
+recording is a dict update (a few microseconds per request). Gauges are read
+at scrape time from registered provider functions (pool size, queue depths).
+
+Under a multi-process WSGI server set METRICS_DIR: every worker then writes a
+snapshot of its registry to METRICS_DIR/<pid>.json every METRICS_FLUSH_INTERVAL
+seconds, and /metrics sums the snapshots of all workers. Counters and
+histograms of workers that have exited are kept (they are cumulative); their
+gauges are dropped. A scrape folds the files of exited workers into
+METRICS_DIR/retired.json and deletes them, so workers recycled by
+max_requests don't leave a growing pile of files, and a new worker that gets
+an old worker's pid folds the old file before writing its own. Folding takes
+an flock; on Windows the files of exited workers are read as they are.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+RETIRED = 'retired.json'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> (type, help, buckets)
+METRICS = {
+    'http_requests_total': ('counter', 'HTTP requests by endpoint, method and status.', None),
+    'http_request_duration_seconds': ('histogram', 'HTTP request latency by endpoint.', DEFAULT_BUCKETS),
+    'http_requests_in_flight': ('gauge', 'Requests currently being handled.', None),
+    'db_pool_checkouts_total': ('counter', 'Connections handed out by the pool.', None),
+    'db_pool_wait_seconds': ('histogram', 'Time spent waiting for a pooled connection.',
+                             (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)),
+    'db_pool_connections': ('gauge', 'Open pooled connections by state.', None),
+    'cache_requests_total': ('counter', 'Cache lookups by cache and result (hit, miss; shared for single-flight waits).', None),
+    'payments_inserted_total': ('counter', 'Payments recorded.', None),
+    'payments_amount_total': ('counter', 'Sum of recorded payment amounts.', None),
+    'snapshot_responses_total': ('counter', 'Snapshot-backed views served, by view and state (fresh or stale).', None),
+    'rate_limit_backend_errors_total': ('counter', 'Rate limiter backend failures (the request was allowed).', None),
+    'admission_rejections_total': ('counter', 'Requests turned away by admission control, by route class and status.', None),
+}
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+        self._providers = []
+
+    def inc(self, name, labels=(), value=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=()):
+        buckets = METRICS[name][2]
+        key = (name, labels)
+        index = bisect_left(buckets, value)
+        with self._lock:
+            entry = self._histograms.get(key)
+            if entry is None:
+                entry = self._histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def add_gauge(self, name, value, labels=()):
+        key = (name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + value
+
+    def register_gauge(self, name, help_text, provider):
+        """`provider()` returns a number or a list of (labels, value) pairs at scrape time."""
+        METRICS.setdefault(name, ('gauge', help_text, None))
+        with self._lock:
+            self._providers.append((name, provider))
+
+    def clear(self):
+        """Drop recorded values (not gauge providers), e.g. the parent's copy in a forked worker."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._gauges.clear()
+
+    def snapshot(self):
+        with self._lock:
+            counters = [[name, list(labels), value] for (name, labels), value in self._counters.items()]
+            histograms = [[name, list(labels), list(entry[0]), entry[1], entry[2]]
+                          for (name, labels), entry in self._histograms.items()]
+            gauges = [[name, list(labels), value] for (name, labels), value in self._gauges.items()]
+            providers = list(self._providers)
+        for name, provider in providers:
+            try:
+                value = provider()
+            except Exception as e:
+                print(f"Error reading gauge {name}: {e}")
+                continue
+            if isinstance(value, (int, float)):
+                value = [((), value)]
+            gauges.extend([name, [list(pair) for pair in labels], v] for labels, v in value)
+        return {'pid': os.getpid(), 'counters': counters, 'histograms': histograms, 'gauges': gauges}
+
+
+registry = Registry()
+inc = registry.inc
+observe = registry.observe
+register_gauge = registry.register_gauge
+
+
+def _labels(pairs):
+    return tuple(tuple(pair) for pair in pairs)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path, value):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(value, f)
+    os.replace(path + '.tmp', path)
+
+
+def fold(snapshots):
+    """One snapshot holding the summed counters and histograms of `snapshots` (no gauges)."""
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, _labels(labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, buckets, total, count in snapshot['histograms']:
+            key = (name, _labels(labels))
+            entry = histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+            entry[0] = [a + b for a, b in zip(entry[0], buckets)]
+            entry[1] += total
+            entry[2] += count
+    return {
+        'pid': None,
+        'counters': [[name, [list(pair) for pair in labels], value] for (name, labels), value in counters.items()],
+        'histograms': [[name, [list(pair) for pair in labels], entry[0], entry[1], entry[2]]
+                       for (name, labels), entry in histograms.items()],
+        'gauges': [],
+    }
+
+
+def retire(directory, paths):
+    """Fold the snapshot files of exited workers into RETIRED and delete them."""
+    with open(os.path.join(directory, 'retired.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        retired_path = os.path.join(directory, RETIRED)
+        try:
+            snapshots = [_read(retired_path)]
+        except (OSError, ValueError):
+            snapshots = []
+        folded = []
+        for path in paths:
+            try:
+                snapshots.append(_read(path))
+            except (OSError, ValueError):
+                continue  # another worker folded it first
+            folded.append(path)
+        if not folded:
+            return
+        _write_json(retired_path, fold(snapshots))
+        for path in folded:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+_written_pid = None
+
+
+def write_snapshot(directory=None):
+    global _written_pid
+    directory = directory or Config.METRICS_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    if _written_pid != os.getpid():
+        # A file under this pid before our first write is an exited worker's
+        if fcntl is not None and os.path.exists(path):
+            retire(directory, [path])
+        _written_pid = os.getpid()
+    _write_json(path, registry.snapshot())
+
+
+def collect():
+    """Snapshots to export: every worker's file in METRICS_DIR, or just this process."""
+    own = registry.snapshot()
+    directory = Config.METRICS_DIR
+    if not directory or not os.path.isdir(directory):
+        return [own]
+    snapshots = [own]
+    exited = []
+    for file_name in os.listdir(directory):
+        if not file_name.endswith('.json') or file_name == RETIRED:
+            continue
+        path = os.path.join(directory, file_name)
+        try:
+            pid = int(file_name[:-5])
+            if pid == own['pid']:
+                continue
+            snapshot = _read(path)
+        except (ValueError, OSError):
+            continue
+        if not _pid_alive(pid):
+            if fcntl is not None:
+                exited.append(path)
+                continue
+            snapshot['gauges'] = []
+        snapshots.append(snapshot)
+    if exited:
+        retire(directory, exited)
+    try:
+        snapshots.append(_read(os.path.join(directory, RETIRED)))
+    except (OSError, ValueError):
+        pass
+    return snapshots
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (f'{k}="{_escape(v)}"' for k, v in pairs)
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(snapshots=None):
+    """Merge snapshots and render the Prometheus text exposition format."""
+    snapshots = collect() if snapshots is None else snapshots
+    counters, histograms, gauges = {}, {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, _labels(labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, buckets, total, count in snapshot['histograms']:
+            key = (name, _labels(labels))
+            entry = histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+            entry[0] = [a + b for a, b in zip(entry[0], buckets)]
+            entry[1] += total
+            entry[2] += count
+        for name, labels, value in snapshot['gauges']:
+            key = (name, _labels(labels))
+            gauges[key] = gauges.get(key, 0) + value
+
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        source = {'counter': counters, 'histogram': histograms, 'gauge': gauges}[kind]
+        series = sorted((labels, value) for (metric, labels), value in source.items() if metric == name)
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in series:
+            if kind != 'histogram':
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ['+Inf'], value[0]):
+                cumulative += count
+                le = bound if bound == '+Inf' else repr(float(bound))
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', le)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[1])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value[2]}")
+    return '\n'.join(lines) + '\n'
+
+
+_flush_thread = None
+
+
+def start_flush_thread(interval=None):
+    """In multi-process mode, write this worker's snapshot every `interval` seconds."""
+    global _flush_thread
+    interval = interval or Config.METRICS_FLUSH_INTERVAL
+    if not Config.METRICS_DIR or (_flush_thread is not None and _flush_thread.is_alive()):
+        return _flush_thread
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                write_snapshot()
+            except Exception as e:
+                print(f"Error writing metrics snapshot: {e}")
+
+    _flush_thread = threading.Thread(target=run, name='metrics-flush', daemon=True)
+    _flush_thread.start()
+    return _flush_thread
+
+
+def init_app(app):
+    """Time every request and expose GET /metrics."""
+    from flask import request, Response, abort
+
+    @app.before_request
+    def start_request_metrics():
+        request.environ['metrics.start'] = time.perf_counter()
+        registry.add_gauge('http_requests_in_flight', 1)
+
+    @app.teardown_request
+    def finish_request_metrics(exc):
+        start = request.environ.pop('metrics.start', None)
+        if start is None:
+            return
+        registry.add_gauge('http_requests_in_flight', -1)
+        endpoint = request.endpoint or 'unknown'
+        status = request.environ.get('metrics.status', '500' if exc else '200')
+        observe('http_request_duration_seconds', time.perf_counter() - start, (('endpoint', endpoint),))
+        inc('http_requests_total', (('endpoint', endpoint), ('method', request.method), ('status', status)))
+
+    @app.after_request
+    def remember_status(response):
+        request.environ['metrics.status'] = str(response.status_code)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        token = Config.METRICS_TOKEN
+        if token and request.headers.get('Authorization') != f"Bearer {token}":
+            abort(403)
+        return Response(render(), mimetype='text/plain; version=0.0.4')
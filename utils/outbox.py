@@ -0,0 +1,100 @@
+"""Email outbox: send mail on a background thread instead of in the request.
+
+An SMTP round trip to Gmail takes a second or more. enqueue(send, *args)
+queues the call and returns True at once; a daemon thread makes the call and
+retries it up to EMAIL_RETRIES times, backing off 2, 4, 8... seconds, while
+`send` returns False or raises. The send functions in utils/email_utils.py
+already return True or False. Only mail nobody is waiting on belongs here:
+the password-reset OTP is sent inline, so the page can say whether it went
+out.
+
+When the queue is full (EMAIL_OUTBOX_SIZE), or with EMAIL_OUTBOX_ENABLED set
+to false, enqueue() sends inline and returns the send function's result.
+drain() waits for queued mail to go out; the app calls it on shutdown (see
+utils/background.py).
+"""
+import os
+import queue
+import threading
+import time
+from config import Config
+from utils import metrics
+
+
+class Outbox:
+    def __init__(self, max_size, retries):
+        self.retries = retries
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+                self._thread.start()
+        return self._thread
+
+    def enqueue(self, send, *args):
+        self.start()
+        try:
+            self._queue.put_nowait((send, args))
+        except queue.Full:
+            return send(*args)
+        return True
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def _send(self, send, args):
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(2 ** attempt)
+            try:
+                if send(*args):
+                    return
+            except Exception as e:
+                print(f"Error sending email via {send.__name__}: {e}")
+        print(f"Giving up on {send.__name__} after {self.retries + 1} attempts")
+
+    def _run(self):
+        while True:
+            send, args = self._queue.get()
+            try:
+                self._send(send, args)
+            finally:
+                self._queue.task_done()
+
+    def drain(self, timeout=None):
+        """Wait until queued mail is sent (or given up on); False if `timeout` ran out first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox():
+    global _outbox
+    if _outbox is None or _outbox.pid != os.getpid():
+        with _outbox_lock:
+            if _outbox is None or _outbox.pid != os.getpid():
+                _outbox = Outbox(Config.EMAIL_OUTBOX_SIZE, Config.EMAIL_RETRIES)
+                _outbox.pid = os.getpid()
+    return _outbox
+
+
+def enqueue(send, *args):
+    if not Config.EMAIL_OUTBOX_ENABLED:
+        return send(*args)
+    return get_outbox().enqueue(send, *args)
+
+
+metrics.register_gauge('email_outbox_queue_depth', 'Emails waiting to be sent.', lambda: get_outbox().depth())
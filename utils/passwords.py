@@ -0,0 +1,135 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError
+from werkzeug.security import check_password_hash, generate_password_hash
+from config import Config
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when the hashing pool has no free slot (caller should answer 429)."""
+
+
+BUSY_MESSAGE = 'The server is busy right now. Please try again in a few seconds.'
+
+
+class PasswordHasher:
+    """Runs werkzeug password hashing on a bounded worker pool.
+
+    At most ``workers + max_pending`` hashes may be running or queued at once.
+    Anything beyond that is rejected immediately with PasswordPoolBusy instead of
+    piling up behind the others.
+    """
+
+    def __init__(self, method='scrypt', salt_length=16, kind='thread', workers=2, max_pending=8, timeout=5.0):
+        self.method = method
+        self.salt_length = salt_length
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._in_use = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        # werkzeug expands e.g. 'scrypt' to 'scrypt:32768:8:1', so take the
+        # canonical prefix from a real hash once instead of parsing it ourselves
+        self.method_prefix = generate_password_hash('', method=method, salt_length=1).split('$', 1)[0]
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.kind == 'process':
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                            thread_name_prefix='password-hash')
+        return self._executor
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._in_use -= 1
+        self._slots.release()
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordPoolBusy()
+        with self._lock:
+            self._in_use += 1
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # The slot is freed by the done callback once the worker finishes
+            raise PasswordPoolBusy()
+
+    @property
+    def pending(self):
+        """Number of hashes currently running or queued."""
+        return self._in_use
+
+    def is_saturated(self):
+        return self._in_use >= self.workers + self.max_pending
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, password_hash, password):
+        if not password_hash:
+            return False
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if the stored hash was made with different parameters than configured.
+
+        werkzeug stores "method$salt$hash"; the salt has salt_length characters.
+        """
+        if not password_hash:
+            return False
+        parts = password_hash.split('$', 2)
+        return parts[0] != self.method_prefix or len(parts) < 3 or len(parts[1]) != self.salt_length
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_hasher():
+    global _hasher
+    # A forked worker gets a fresh hasher; the parent's executor threads don't survive fork
+    if _hasher is None or _hasher.pid != os.getpid():
+        with _hasher_lock:
+            if _hasher is None or _hasher.pid != os.getpid():
+                _hasher = PasswordHasher(
+                    method=Config.PASSWORD_HASH_METHOD,
+                    salt_length=Config.PASSWORD_SALT_LENGTH,
+                    kind=Config.PASSWORD_POOL_KIND,
+                    workers=Config.PASSWORD_POOL_WORKERS or os.cpu_count() or 2,
+                    max_pending=Config.PASSWORD_POOL_MAX_PENDING,
+                    timeout=Config.PASSWORD_POOL_TIMEOUT
+                )
+                _hasher.pid = os.getpid()
+    return _hasher
+
+
+def hash_password(password):
+    return get_hasher().hash(password)
+
+
+def verify_password(password_hash, password):
+    return get_hasher().verify(password_hash, password)
+
+
+def needs_rehash(password_hash):
+    return get_hasher().needs_rehash(password_hash)
@@ -0,0 +1,123 @@
+"""Per-endpoint query budgets and an N+1 detector for development and tests.
+
+Views declare how many statements one request may run:
+
+    @admin_bp.route('/')
+    @login_required
+    @admin_required
+    @query_budget(10)
+    def dashboard():
+
+The count covers the whole request, including Flask-Login's user lookup.
+With QUERY_BUDGET_MODE set to 'warn' or 'raise', every request records its
+statements (see RequestStats) and after the view returns:
+
+- a request over its budget is reported with a diff of its statement shapes
+  against the last run of the same endpoint that stayed within budget
+- any statement shape repeated QUERY_REPEAT_THRESHOLD or more times in one
+  request (the usual N+1 pattern: a query inside a loop) is reported too
+
+'warn' prints the report; 'raise' raises QueryBudgetExceeded, which fails
+the request under the test client (app.testing propagates exceptions).
+'off', the default, adds nothing to production requests.
+
+    python -m utils.query_budget    # list endpoints and their budgets
+"""
+import difflib
+import threading
+from collections import Counter
+from config import Config
+from utils.slow_queries import fingerprint
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(max_queries):
+    """Declare the most statements one request to this view may run."""
+    def decorator(f):
+        f.query_budget = max_queries
+        return f
+    return decorator
+
+
+def budget_for(view):
+    # functools.wraps copies the attribute onto login_required & co.
+    return getattr(view, 'query_budget', None)
+
+
+_baselines = {}
+_baselines_lock = threading.Lock()
+
+
+def repeated_shapes(statements, threshold=None):
+    """[(count, shape)] for statement shapes run `threshold` or more times."""
+    threshold = threshold or Config.QUERY_REPEAT_THRESHOLD
+    counts = Counter(fingerprint(statement)[1] for statement in statements)
+    return sorted(((count, shape) for shape, count in counts.items() if count >= threshold), reverse=True)
+
+
+def check_request(endpoint, statements, budget):
+    """Problems with one request's statements, as a readable report (or None)."""
+    shapes = [fingerprint(statement)[1] for statement in statements]
+    problems = []
+
+    if budget is not None and len(statements) > budget:
+        with _baselines_lock:
+            baseline = _baselines.get(endpoint)
+        problems.append(f"{endpoint} ran {len(statements)} queries, budget is {budget}.")
+        if baseline is not None:
+            diff = difflib.unified_diff(baseline, shapes, 'last within budget', 'this request', lineterm='', n=1)
+            problems.extend(diff)
+        else:
+            problems.extend(f"  {number:3d}. {shape}" for number, shape in enumerate(shapes, 1))
+    elif budget is not None:
+        with _baselines_lock:
+            _baselines[endpoint] = shapes
+
+    repeats = repeated_shapes(statements)
+    if repeats:
+        problems.append(f"{endpoint} repeated statement shapes (possible N+1):")
+        problems.extend(f"  {count}x {shape}" for count, shape in repeats)
+
+    return '\n'.join(problems) if problems else None
+
+
+def init_app(app):
+    """Check each request against its endpoint's budget (QUERY_BUDGET_MODE)."""
+    from flask import request
+    from utils.sql_instrumentation import current_stats
+
+    @app.after_request
+    def check_query_budget(response):
+        mode = Config.QUERY_BUDGET_MODE
+        stats = current_stats()
+        if mode == 'off' or stats is None or stats.statements is None:
+            return response
+
+        endpoint = request.endpoint or 'unknown'
+        view = app.view_functions.get(request.endpoint)
+        report = check_request(endpoint, stats.statements, budget_for(view))
+        response.headers['X-Query-Count'] = str(stats.queries)
+        if report is None:
+            return response
+        if mode == 'raise':
+            raise QueryBudgetExceeded(report)
+        print(f"Query budget report for {request.method} {request.path}:\n{report}")
+        return response
+
+
+if __name__ == '__main__':
+    from app import create_app
+
+    app = create_app()
+    rows = []
+    for rule in app.url_map.iter_rules():
+        view = app.view_functions.get(rule.endpoint)
+        rows.append((rule.endpoint, rule.rule, budget_for(view)))
+    rows.sort()
+    budgeted = [row for row in rows if row[2] is not None]
+    for endpoint, path, budget in budgeted:
+        print(f"  {budget:3d}  {endpoint:35s} {path}")
+    print(f"{len(budgeted)} of {len(rows)} endpoints declare a query budget.")
@@ -0,0 +1,221 @@
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, session, flash, render_template, jsonify, make_response, current_app
+from flask_login import current_user
+from config import Config
+from utils import metrics
+
+# State untouched this long has fully refilled (twice the longest period in use)
+IDLE_SECONDS = 7200
+PRUNE_INTERVAL = 300  # seconds between deletes of idle SQLite rows, per process
+
+
+class MemoryBackend:
+    """Per-process limiter state. Fine for a single worker.
+
+    At most `max_keys` keys are kept; beyond that the least recently used key
+    is dropped, so spraying new keys can't reset the limit of a busy one.
+    """
+
+    def __init__(self, max_keys=100000):
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_keys = max_keys
+
+    def hit(self, key, limit, period, algorithm):
+        now = time.time()
+        with self._lock:
+            state = self._buckets.pop(key, None)
+            allowed, retry_after, state = _ALGORITHMS[algorithm](state, limit, period, now)
+            self._buckets[key] = state  # now the most recently used
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteBackend:
+    """Limiter state shared by all worker processes on one host through a SQLite file.
+
+    A local stand-in for a networked store such as Redis: every worker opens the
+    same file, so a client cannot multiply its allowance by the number of workers.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._pruned_at = time.time()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS rate_limits (
+                    key TEXT PRIMARY KEY,
+                    a REAL NOT NULL,
+                    b REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+            ''')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def hit(self, key, limit, period, algorithm):
+        now = time.time()
+        connection = self._connection()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute('SELECT a, b, updated FROM rate_limits WHERE key = ?', (key,)).fetchone()
+            allowed, retry_after, state = _ALGORITHMS[algorithm](row, limit, period, now)
+            connection.execute('REPLACE INTO rate_limits (key, a, b, updated) VALUES (?, ?, ?, ?)', (key, *state))
+            connection.execute('COMMIT')
+            if now - self._pruned_at > PRUNE_INTERVAL:
+                self._pruned_at = now
+                connection.execute('DELETE FROM rate_limits WHERE updated < ?', (now - IDLE_SECONDS,))
+        except sqlite3.Error as e:
+            try:
+                connection.execute('ROLLBACK')
+            except sqlite3.Error:
+                pass
+            # Fail open rather than lock everyone out, but never silently
+            current_app.logger.error("Rate limiter backend error, allowing the request: %s", e)
+            metrics.inc('rate_limit_backend_errors_total')
+            return True, 0
+        return allowed, retry_after
+
+    def reset(self):
+        self._connection().execute('DELETE FROM rate_limits')
+
+
+def _token_bucket(state, limit, period, now):
+    """Bucket of `limit` tokens refilled evenly over `period` seconds.
+
+    State is (tokens, unused, updated).
+    """
+    rate = limit / period
+    if state is None:
+        tokens = float(limit)
+    else:
+        tokens = min(float(limit), state[0] + (now - state[2]) * rate)
+    if tokens >= 1:
+        return True, 0, (tokens - 1, 0.0, now)
+    return False, math.ceil((1 - tokens) / rate), (tokens, 0.0, now)
+
+
+def _sliding_window(state, limit, period, now):
+    """Sliding-window counter: the previous fixed window is weighted by its overlap.
+
+    State is (current_count, previous_count, window_start).
+    """
+    window_start = now - (now % period)
+    if state is None:
+        current, previous = 0.0, 0.0
+    elif state[2] == window_start:
+        current, previous = state[0], state[1]
+    elif state[2] == window_start - period:
+        current, previous = 0.0, state[0]
+    else:
+        current, previous = 0.0, 0.0
+    weight = 1 - (now - window_start) / period
+    if previous * weight + current < limit:
+        return True, 0, (current + 1, previous, window_start)
+    return False, math.ceil(window_start + period - now) or 1, (current, previous, window_start)
+
+
+_ALGORITHMS = {
+    'token_bucket': _token_bucket,
+    'sliding_window': _sliding_window,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if Config.RATE_LIMIT_BACKEND == 'sqlite':
+                    path = Config.RATE_LIMIT_SQLITE_PATH or os.path.join(tempfile.gettempdir(), 'stbps_rate_limits.db')
+                    _backend = SQLiteBackend(path)
+                else:
+                    _backend = MemoryBackend()
+    return _backend
+
+
+def _key_ip():
+    # The client's address; behind a reverse proxy create_app() sets it from
+    # X-Forwarded-For (TRUSTED_PROXY_HOPS)
+    return request.remote_addr
+
+
+def _key_email():
+    email = request.form.get('email') or session.get('reset_email')
+    return email.strip().lower() if email else None
+
+
+def _key_user():
+    return str(current_user.id) if current_user.is_authenticated else None
+
+
+KEY_FUNCTIONS = {
+    'ip': _key_ip,
+    'email': _key_email,
+    'user': _key_user,
+}
+
+
+def rate_limit(limit, period, key='ip', scope=None, algorithm='token_bucket', methods=('POST',),
+               template=None, message='Too many attempts. Please wait a moment and try again.'):
+    """Limit a view to `limit` requests per `period` seconds for each key.
+
+    `key` is 'ip', 'email', 'user' or a callable returning the key. Requests with
+    no key value (e.g. no email submitted) are not counted. Rejections happen
+    before the view runs, so they never touch the database or send mail.
+    Rejected form posts re-render `template` with a flash message; without a
+    template the rejection is a JSON body. Both answer 429 with Retry-After.
+    Stack the decorator to apply several limits to one view.
+    """
+    key_function = key if callable(key) else KEY_FUNCTIONS[key]
+    key_name = getattr(key_function, '__name__', 'custom') if callable(key) else key
+
+    def decorator(f):
+        bucket_scope = scope or f.__name__
+
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not Config.RATE_LIMIT_ENABLED or (methods and request.method not in methods):
+                return f(*args, **kwargs)
+
+            value = key_function()
+            if value is None:
+                return f(*args, **kwargs)
+
+            allowed, retry_after = get_backend().hit(f'{bucket_scope}:{key_name}:{value}', limit, period, algorithm)
+            if allowed:
+                return f(*args, **kwargs)
+
+            if template:
+                flash(message, 'error')
+                response = make_response(render_template(template), 429)
+            else:
+                response = make_response(jsonify({'success': False, 'message': message}), 429)
+            response.headers['Retry-After'] = str(max(1, int(retry_after)))
+            return response
+
+        return decorated_function
+
+    return decorator
@@ -0,0 +1,101 @@
+"""Files the worker processes on one host share (single-flight results, snapshots).
+
+Their default directories are under the temp directory, which every local
+user can write to. A user who created `stbps_snapshots` first could
+otherwise swap the files under the app. private_directory() creates the
+directory with mode 0700 and refuses one that another user owns. Data is
+stored as JSON rather than pickle, so a planted file can at worst hold
+wrong numbers and can never run code. Database rows need a few types JSON
+lacks (Decimal, date, datetime, timedelta, tuples, dicts with non-string
+keys). They are written as tagged objects and come back as the same types:
+
+    write_json(path, {'total': Decimal('12.50'), 'by_course': {3: 41}})
+    read_json(path)  # {'total': Decimal('12.50'), 'by_course': {3: 41}}
+"""
+import json
+import os
+import stat
+import threading
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+_TAG = '__type__'
+
+
+def private_directory(path):
+    """Create `path` (mode 0700) if needed; raise PermissionError if another user owns it."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"{path} is not a directory")
+    if hasattr(os, 'getuid'):
+        if info.st_uid != os.getuid():
+            raise PermissionError(f"{path} is owned by another user")
+        if info.st_mode & 0o077:
+            os.chmod(path, 0o700)
+    return path
+
+
+def _tag(value):
+    # json calls default() only for types it can't encode; tuples and dict keys need a walk first
+    if isinstance(value, dict):
+        if all(isinstance(k, str) for k in value):
+            return {k: _tag(v) for k, v in value.items()}
+        return {_TAG: 'dict', 'value': [[_tag(k), _tag(v)] for k, v in value.items()]}
+    if isinstance(value, tuple):
+        return {_TAG: 'tuple', 'value': [_tag(v) for v in value]}
+    if isinstance(value, list):
+        return [_tag(v) for v in value]
+    return value
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return {_TAG: 'decimal', 'value': str(value)}
+    if isinstance(value, datetime):
+        return {_TAG: 'datetime', 'value': value.isoformat()}
+    if isinstance(value, date):
+        return {_TAG: 'date', 'value': value.isoformat()}
+    if isinstance(value, timedelta):
+        return {_TAG: 'timedelta', 'value': value.total_seconds()}
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Can't store {type(value).__name__} in a shared file")
+
+
+_decoders = {
+    'decimal': Decimal,
+    'datetime': datetime.fromisoformat,
+    'date': date.fromisoformat,
+    'timedelta': lambda seconds: timedelta(seconds=seconds),
+    'tuple': tuple,
+    'dict': lambda items: {k: v for k, v in items},
+}
+
+
+def _object_hook(obj):
+    decode = _decoders.get(obj.get(_TAG)) if len(obj) == 2 and 'value' in obj else None
+    return decode(obj['value']) if decode else obj
+
+
+def dumps(value):
+    return json.dumps(_tag(value), default=_default, separators=(',', ':')).encode()
+
+
+def loads(data):
+    return json.loads(data, object_hook=_object_hook)
+
+
+def write_json(path, value):
+    """Write atomically: readers see the old file or the new one, never a partial one."""
+    data = dumps(value)
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+
+def read_json(path):
+    """The stored value; raises OSError or ValueError if it's missing or unreadable."""
+    with open(path, 'rb') as f:
+        return loads(f.read())
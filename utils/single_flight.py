@@ -0,0 +1,196 @@
+"""Single-flight execution for expensive reads, with an optional short-TTL cache.
+
+At opening time every cashier loads the dashboard at once, and each load
+used to run the same students x payments aggregate. do(key, fn, ttl) runs fn
+once per key at a time: callers that arrive while it is running wait for
+that run and share its result. With ttl > 0 the result is also kept for ttl
+seconds, so a burst costs one query.
+
+Keys are the statement text plus its parameters (see key()). Dashboards use
+this through database/fanout.py:
+
+    fanout.rows(STUDENT_TOTALS, coalesce=Config.DASHBOARD_CACHE_TTL)   # share and cache
+    fanout.row(TODAY_TOTALS, date_window('today'), coalesce=0)          # share only
+
+Shared results are the same objects for every caller: treat them as read-only.
+
+With SINGLE_FLIGHT_BACKEND = 'file' the workers on one host also coalesce
+with each other. A run with ttl > 0 takes an exclusive lock on
+SINGLE_FLIGHT_DIR/<key>.lock, and the result is written next to it as JSON
+for the other workers to read until it expires. The directory must be
+private to the app's user (see utils/shared_files.py). This needs fcntl, so
+it is unavailable on Windows, where the process-local behaviour is used.
+Lookups count toward cache_requests_total{cache="single_flight"} with result
+hit, shared (waited for another run), or miss.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from config import Config
+from utils import metrics
+from utils.shared_files import private_directory, read_json, write_json
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def key(sql, args=()):
+    return hashlib.sha1(repr((' '.join(sql.split()), tuple(args or ()))).encode()).hexdigest()[:24]
+
+
+def _count(result):
+    metrics.inc('cache_requests_total', (('cache', 'single_flight'), ('result', result)))
+
+
+class FileBackend:
+    """Shares results between the worker processes on one host through files and flock."""
+
+    def __init__(self, directory, timeout):
+        self.directory = directory
+        self.timeout = timeout
+        private_directory(directory)
+
+    def _read(self, path, ttl):
+        try:
+            if time.time() - os.path.getmtime(path) >= ttl:
+                return False, None
+            return True, read_json(path)
+        except (OSError, ValueError):
+            return False, None
+
+    def _acquire(self, lock_file):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.01)
+
+    def load(self, name, fn, ttl):
+        """(result, where it came from): 'hit', 'shared' or 'miss'."""
+        path = os.path.join(self.directory, name + '.json')
+        found, result = self._read(path, ttl)
+        if found:
+            return result, 'hit'
+        with open(path + '.lock', 'a') as lock_file:
+            if not self._acquire(lock_file):
+                return fn(), 'miss'
+            try:
+                # Another worker may have run it while this one waited for the lock
+                found, result = self._read(path, ttl)
+                if found:
+                    return result, 'shared'
+                result = fn()
+                try:
+                    write_json(path, result)
+                except (OSError, TypeError) as e:
+                    print(f"Error sharing single-flight result {name}: {e}")
+                return result, 'miss'
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, backend=None, timeout=10, max_entries=500):
+        self.backend = backend
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._cache = {}
+
+    def do(self, name, fn, ttl=0):
+        with self._lock:
+            cached = self._cache.get(name)
+            if cached is not None and cached[0] > time.monotonic():
+                call = None
+            else:
+                call = self._calls.get(name)
+                leader = call is None
+                if leader:
+                    call = self._calls[name] = _Call()
+        if call is None:
+            _count('hit')
+            return cached[1]
+
+        if not leader:
+            # A stuck run shouldn't block everyone: past the timeout, run it here
+            if not call.done.wait(self.timeout):
+                _count('miss')
+                return fn()
+            _count('shared')
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if self.backend is not None and ttl > 0:
+                result, source = self.backend.load(name, fn, ttl)
+            else:
+                result, source = fn(), 'miss'
+            _count(source)
+            call.result = result
+            if ttl > 0:
+                self._store(name, result, ttl)
+            return result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(name, None)
+            call.done.set()
+
+    def _store(self, name, result, ttl):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._cache) >= self.max_entries:
+                for stale in [k for k, (expires, _) in self._cache.items() if expires <= now]:
+                    del self._cache[stale]
+                if len(self._cache) >= self.max_entries:
+                    self._cache.clear()
+            self._cache[name] = (now + ttl, result)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight():
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                backend = None
+                if Config.SINGLE_FLIGHT_BACKEND == 'file' and fcntl is not None:
+                    directory = Config.SINGLE_FLIGHT_DIR or os.path.join(tempfile.gettempdir(), 'stbps_single_flight')
+                    try:
+                        backend = FileBackend(directory, Config.SINGLE_FLIGHT_TIMEOUT)
+                    except OSError as e:
+                        print(f"Error using {directory} for single-flight results, sharing within this process only: {e}")
+                _single_flight = SingleFlight(backend, Config.SINGLE_FLIGHT_TIMEOUT, Config.SINGLE_FLIGHT_MAX_ENTRIES)
+    return _single_flight
+
+
+def do(name, fn, ttl=0):
+    return get_single_flight().do(name, fn, ttl)
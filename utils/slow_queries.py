@@ -0,0 +1,266 @@
+"""Slow-query log with EXPLAIN capture.
+
+InstrumentedCursor times every statement while SLOW_QUERY_MS is above zero.
+A statement that takes at least that long is recorded here with:
+
+- its fingerprint: the statement with literals and placeholders replaced by
+  `?` and IN lists collapsed, so all executions of one query group together
+- its parameters, redacted to their types and lengths
+- the Flask endpoint that ran it
+- `EXPLAIN FORMAT=JSON` output, captured at most once per fingerprint every
+  SLOW_QUERY_EXPLAIN_INTERVAL seconds, with string literals masked
+
+Entries go to a SQLite file shared by all workers on the host and capped at
+SLOW_QUERY_MAX_ENTRIES rows. /admin/slow-queries groups them by fingerprint
+and flags full scans, filesorts and temporary tables from the stored plans.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+import pymysql
+from config import Config
+
+_quoted = re.compile(r"'(?:[^'\\]|\\.)*'")
+_string_literal = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_number_literal = re.compile(r"\b\d+(?:\.\d+)?\b")
+_placeholder = re.compile(r"%\(\w+\)s|%s")
+_in_list = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_values_list = re.compile(r"(\(\?\+\))(?:\s*,\s*\(\?\+\))+")
+_whitespace = re.compile(r'\s+')
+
+EXPLAINABLE = ('select', 'update', 'delete', 'with')
+
+
+def fingerprint(query):
+    """(fingerprint id, normalized statement) for a SQL template or statement."""
+    text = query.decode('utf-8', 'replace') if isinstance(query, bytes) else str(query)
+    text = _string_literal.sub('?', text)
+    text = _placeholder.sub('?', text)
+    text = _number_literal.sub('?', text)
+    text = _whitespace.sub(' ', text).strip().rstrip(';')
+    text = _in_list.sub('(?+)', text)
+    text = _values_list.sub(r'\1', text)
+    return hashlib.sha1(text.lower().encode()).hexdigest()[:16], text
+
+
+def _redact(value):
+    if value is None:
+        return 'NULL'
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}[{len(value)}]"
+    if isinstance(value, (list, tuple, set)):
+        return f"{type(value).__name__}[{len(value)}]"
+    if isinstance(value, (bool, int, float, Decimal, date, datetime)):
+        return type(value).__name__
+    return 'value'
+
+
+def redact_params(args):
+    """Parameter shapes without their values: ['int', 'str[12]', 'NULL']."""
+    if args is None:
+        return []
+    if isinstance(args, dict):
+        return {key: _redact(value) for key, value in args.items()}
+    if isinstance(args, (list, tuple)):
+        return [_redact(value) for value in args]
+    return [_redact(args)]
+
+
+def _mask_literals(text):
+    # The plan's attached_condition echoes the bound values back
+    return _quoted.sub("'?'", text)
+
+
+def explain(cursor, query, args):
+    """EXPLAIN FORMAT=JSON for a statement, on the cursor's own connection."""
+    text = query.decode('utf-8', 'replace') if isinstance(query, bytes) else str(query)
+    if not text.lstrip().lower().startswith(EXPLAINABLE):
+        return None
+    try:
+        statement = cursor.mogrify(query, args)
+        # A plain cursor, so the EXPLAIN itself is not timed or captured
+        with cursor.connection.cursor(pymysql.cursors.Cursor) as explain_cursor:
+            explain_cursor.execute("EXPLAIN FORMAT=JSON " + statement)
+            row = explain_cursor.fetchone()
+        return _mask_literals(row[0]) if row else None
+    except Exception as e:
+        return json.dumps({'error': str(e)})
+
+
+def plan_warnings(plan):
+    """Index advisor hints from an EXPLAIN FORMAT=JSON document."""
+    try:
+        document = json.loads(plan) if isinstance(plan, str) else plan
+    except (TypeError, ValueError):
+        return []
+    warnings = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            table = node.get('table')
+            if isinstance(table, dict):
+                name = table.get('table_name', '?')
+                rows = table.get('rows_examined_per_scan')
+                access = table.get('access_type')
+                if access == 'ALL':
+                    warnings.append(f"Full table scan on {name}" + (f" (~{rows} rows)" if rows else ''))
+                elif access == 'index' and not table.get('using_index'):
+                    warnings.append(f"Full index scan on {name} via {table.get('key')}")
+                if table.get('possible_keys') and not table.get('key'):
+                    warnings.append(f"{name}: candidate indexes {', '.join(table['possible_keys'])} not used")
+            if node.get('using_filesort'):
+                warnings.append("Sorts with filesort")
+            if node.get('using_temporary_table'):
+                warnings.append("Builds a temporary table")
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(document)
+    return list(dict.fromkeys(warnings))
+
+
+def _describe_params(params):
+    if isinstance(params, dict):
+        return ', '.join(f"{key}={value}" for key, value in params.items())
+    return ', '.join(params)
+
+
+class SlowQueryStore:
+    """Slow statements in a SQLite file, capped at `max_entries` rows."""
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._explained = {}
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS slow_queries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    fingerprint TEXT NOT NULL,
+                    statement TEXT NOT NULL,
+                    params TEXT,
+                    endpoint TEXT,
+                    elapsed_ms REAL NOT NULL,
+                    row_count INTEGER,
+                    plan TEXT,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            connection.execute('CREATE INDEX IF NOT EXISTS idx_slow_queries_fingerprint '
+                               'ON slow_queries (fingerprint, id)')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def needs_plan(self, fingerprint_id):
+        now = time.monotonic()
+        with self._lock:
+            last = self._explained.get(fingerprint_id)
+            if last is not None and now - last < Config.SLOW_QUERY_EXPLAIN_INTERVAL:
+                return False
+            self._explained[fingerprint_id] = now
+        return True
+
+    def add(self, fingerprint_id, statement, params, endpoint, elapsed, row_count, plan):
+        connection = self._connection()
+        try:
+            connection.execute('''
+                INSERT INTO slow_queries (fingerprint, statement, params, endpoint, elapsed_ms, row_count, plan, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (fingerprint_id, statement, json.dumps(params), endpoint, elapsed * 1000, row_count, plan, time.time()))
+            with self._lock:
+                self._writes += 1
+                prune = self._writes % 100 == 1
+            if prune:
+                connection.execute('DELETE FROM slow_queries WHERE id <= (SELECT MAX(id) FROM slow_queries) - ?',
+                                   (self.max_entries,))
+        except sqlite3.Error as e:
+            print(f"Error recording slow query: {e}")
+
+    def summaries(self, limit=50):
+        """One row per fingerprint, highest total time first, with its latest plan."""
+        connection = self._connection()
+        rows = connection.execute('''
+            SELECT fingerprint, COUNT(*), SUM(elapsed_ms), AVG(elapsed_ms), MAX(elapsed_ms),
+                   MAX(created_at), GROUP_CONCAT(DISTINCT endpoint), MAX(statement)
+            FROM slow_queries
+            GROUP BY fingerprint
+            ORDER BY SUM(elapsed_ms) DESC
+            LIMIT ?
+        ''', (limit,)).fetchall()
+        summaries = []
+        for fingerprint_id, count, total, average, worst, last_seen, endpoints, statement in rows:
+            latest = connection.execute('''
+                SELECT params, plan FROM slow_queries
+                WHERE fingerprint = ? AND plan IS NOT NULL
+                ORDER BY id DESC LIMIT 1
+            ''', (fingerprint_id,)).fetchone()
+            plan = latest[1] if latest else None
+            summaries.append({
+                'fingerprint': fingerprint_id,
+                'statement': statement,
+                'count': count,
+                'total_ms': total,
+                'avg_ms': average,
+                'max_ms': worst,
+                'last_seen': datetime.fromtimestamp(last_seen),
+                'endpoints': sorted(filter(None, (endpoints or '').split(','))),
+                'params': _describe_params(json.loads(latest[0])) if latest and latest[0] else '',
+                'plan': json.dumps(json.loads(plan), indent=2) if plan else None,
+                'warnings': plan_warnings(plan) if plan else []
+            })
+        return summaries
+
+    def clear(self):
+        self._connection().execute('DELETE FROM slow_queries')
+        with self._lock:
+            self._explained.clear()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                path = Config.SLOW_QUERY_DB_PATH or os.path.join(tempfile.gettempdir(), 'stbps_slow_queries.db')
+                _store = SlowQueryStore(path, Config.SLOW_QUERY_MAX_ENTRIES)
+    return _store
+
+
+def _current_endpoint():
+    from flask import has_request_context, request
+    return request.endpoint if has_request_context() else None
+
+
+def capture(cursor, query, args, elapsed):
+    """Record a statement that crossed SLOW_QUERY_MS. Never raises."""
+    try:
+        store = get_store()
+        fingerprint_id, statement = fingerprint(query)
+        plan = explain(cursor, query, args) if store.needs_plan(fingerprint_id) else None
+        store.add(fingerprint_id, statement, redact_params(args), _current_endpoint(),
+                  elapsed, cursor.rowcount, plan)
+    except Exception as e:
+        print(f"Error capturing slow query: {e}")
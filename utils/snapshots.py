@@ -0,0 +1,152 @@
+"""Last-known-good snapshots of read-only views, served stale while the database is slow.
+
+A view builds its template context in a function and passes it to serve():
+
+    context, stale_as_of, missing = snapshots.serve(f'cashier.dashboard:{user_id}', build)
+
+build() returns (context, missing) like fanout.gather, or raises. serve()
+behaves as follows:
+
+- A complete build is saved as the snapshot and returned with stale_as_of None.
+- When the build fails or leaves figures missing (MySQL down, circuit open,
+  queries past their deadline), the last snapshot is returned instead, with
+  stale_as_of set to when it was taken. The template shows a "stale as of"
+  banner. The snapshot is marked stale, and it is refreshed on a background
+  thread at most every SNAPSHOT_REFRESH_INTERVAL seconds.
+- While a snapshot is stale or the circuit is open, requests get it at once
+  without waiting on the database. Only the background refresh tries the
+  database, and once it succeeds requests build live again.
+- With no snapshot at all, whatever the build produced is returned, as before.
+
+build() runs without a request context when refreshing, so it must take any
+user ids as arguments instead of reading current_user. Snapshots are kept in
+memory and written to SNAPSHOT_DIR as JSON (see utils/shared_files.py), so
+the other workers on the host and a worker started during an outage can
+serve them too. If the directory is owned by another user, snapshots stay in
+memory only.
+"""
+import os
+import tempfile
+import threading
+import time
+from config import Config
+from database.circuit import breaker, OPEN
+from utils import metrics, time_windows
+from utils.shared_files import private_directory, read_json, write_json
+
+
+class SnapshotStore:
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._entries = {}  # name -> {'context', 'taken_at', 'stale'}
+        self._refreshing = {}  # name -> time the last refresh started
+        self._written = {}  # name -> time the snapshot file was last written
+        if directory is not None:
+            try:
+                private_directory(directory)
+            except OSError as e:
+                print(f"Error using {directory} for snapshots, keeping them in memory only: {e}")
+                self.directory = None
+
+    def _path(self, name):
+        return os.path.join(self.directory, name.replace('/', '_').replace(':', '_') + '.json')
+
+    def get(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is not None or self.directory is None:
+            return entry
+        try:
+            entry = read_json(self._path(name))
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or not {'context', 'taken_at', 'stale'} <= entry.keys():
+            return None
+        with self._lock:
+            return self._entries.setdefault(name, entry)
+
+    def save(self, name, context):
+        entry = {'context': context, 'taken_at': time_windows.now(), 'stale': False}
+        now = time.monotonic()
+        with self._lock:
+            self._entries[name] = entry
+            # The file is for other workers and restarts; it needn't be rewritten on every page view
+            if self.directory is None or (now - self._written.get(name, -Config.SNAPSHOT_REFRESH_INTERVAL)
+                                          < Config.SNAPSHOT_REFRESH_INTERVAL):
+                return
+            self._written[name] = now
+        try:
+            write_json(self._path(name), entry)
+        except (OSError, TypeError) as e:
+            print(f"Error saving snapshot {name}: {e}")
+
+    def mark_stale(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                entry['stale'] = True
+
+    def refresh(self, name, build):
+        """Rebuild `name` on a background thread, at most once per SNAPSHOT_REFRESH_INTERVAL."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._refreshing.get(name, -Config.SNAPSHOT_REFRESH_INTERVAL) < Config.SNAPSHOT_REFRESH_INTERVAL:
+                return
+            self._refreshing[name] = now
+
+        def run():
+            try:
+                context, missing = build()
+            except Exception as e:
+                print(f"Error refreshing snapshot {name}: {e}")
+                return
+            if not missing:
+                self.save(name, context)
+
+        threading.Thread(target=run, name=f'snapshot-{name}', daemon=True).start()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                directory = Config.SNAPSHOT_DIR or os.path.join(tempfile.gettempdir(), 'stbps_snapshots')
+                _store = SnapshotStore(directory)
+    return _store
+
+
+def _stale(name, store, entry, build):
+    store.mark_stale(name)
+    store.refresh(name, build)
+    metrics.inc('snapshot_responses_total', (('view', name.split(':')[0]), ('state', 'stale')))
+    return entry['context'], entry['taken_at'], []
+
+
+def serve(name, build):
+    """(context, stale_as_of or None, names of missing figures) for a snapshot-backed view."""
+    store = get_store()
+    entry = store.get(name)
+    if entry is not None and (entry['stale'] or breaker.state == OPEN):
+        return _stale(name, store, entry, build)
+
+    try:
+        context, missing = build()
+    except Exception as e:
+        print(f"Error building {name}: {e}")
+        if entry is None:
+            raise
+        return _stale(name, store, entry, build)
+
+    if not missing:
+        store.save(name, context)
+        metrics.inc('snapshot_responses_total', (('view', name.split(':')[0]), ('state', 'fresh')))
+        return context, None, []
+    if entry is not None:
+        return _stale(name, store, entry, build)
+    return context, None, missing
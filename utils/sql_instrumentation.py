@@ -0,0 +1,225 @@
+"""Per-request SQL instrumentation.
+
+Connections from get_db_connection use InstrumentedCursor. When a request is
+sampled (SQL_SAMPLE_RATE), the cursor records every statement's duration and
+row count into a RequestStats held in a context variable; when it is not, the
+cursor's only extra work is one ContextVar.get(). At the end of a sampled
+request the totals go out as a Server-Timing header, slow requests are logged,
+and the numbers feed a rolling window per endpoint that /admin/perf shows as
+percentiles. Windows are per process: each worker reports its own traffic.
+Independently of sampling, statements slower than SLOW_QUERY_MS go to the
+slow-query log (utils/slow_queries.py), and lost connections are reported
+to the circuit breaker (database/circuit.py).
+
+While statement_timeout is set (utils/admission.py sets it per route class),
+each SELECT is sent with a MAX_EXECUTION_TIME hint of that many milliseconds,
+overriding the session's DB_STATEMENT_TIMEOUT_MS.
+"""
+import contextvars
+import math
+import random
+import re
+import threading
+import time
+from collections import deque
+import pymysql
+from flask import request
+from config import Config
+from utils import slow_queries
+from database.circuit import breaker
+
+_current = contextvars.ContextVar('sql_request_stats', default=None)
+statement_timeout = contextvars.ContextVar('sql_statement_timeout', default=0)  # milliseconds, 0 = session default
+_whitespace = re.compile(r'\s+')
+_select = re.compile(r'\s*SELECT\b', re.IGNORECASE)
+
+SLOWEST_KEPT = 5
+
+
+def _statement_text(query):
+    # The statement template only, never the parameters
+    text = query.decode('utf-8', 'replace') if isinstance(query, bytes) else str(query)
+    return _whitespace.sub(' ', text).strip()[:300]
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_time', 'rows', 'slowest', 'started', 'statements', '_lock')
+
+    def __init__(self, keep_statements=False):
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.slowest = []
+        self.started = time.perf_counter()
+        # Every statement in order, for the query budget check (utils/query_budget.py)
+        self.statements = [] if keep_statements else None
+        # Fanned-out queries (database/fanout.py) record from several threads;
+        # their times add up, so db_time can exceed the request's wall time
+        self._lock = threading.Lock()
+
+    def record(self, query, elapsed, rows):
+        with self._lock:
+            self.queries += 1
+            if self.statements is not None:
+                self.statements.append(_statement_text(query))
+            self.db_time += elapsed
+            self.rows += max(rows or 0, 0)
+            if len(self.slowest) < SLOWEST_KEPT or elapsed > self.slowest[-1][0]:
+                self.slowest.append((elapsed, _statement_text(query)))
+                self.slowest.sort(key=lambda item: item[0], reverse=True)
+                del self.slowest[SLOWEST_KEPT:]
+
+
+def current_stats():
+    """The RequestStats of the current sampled request, or None."""
+    return _current.get()
+
+
+class InstrumentedCursor(pymysql.cursors.DictCursor):
+    _batched = False
+
+    def execute(self, query, args=None):
+        stats = _current.get()
+        try:
+            if self._batched or (stats is None and Config.SLOW_QUERY_MS <= 0):
+                result = super().execute(query, args)
+            else:
+                result = self._timed(super().execute, stats, query, args)
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError) as e:
+            # Lost connections count toward the circuit breaker
+            breaker.record(e)
+            raise
+        breaker.success()
+        return result
+
+    def _query(self, q):
+        timeout = statement_timeout.get()
+        if timeout:
+            match = _select.match(q)
+            if match:
+                q = f"{match.group()} /*+ MAX_EXECUTION_TIME({int(timeout)}) */{q[match.end():]}"
+        return super()._query(q)
+
+    def executemany(self, query, args):
+        stats = _current.get()
+        if stats is None and Config.SLOW_QUERY_MS <= 0:
+            return super().executemany(query, args)
+        # pymysql runs executemany through execute(); count it once, not per row
+        self._batched = True
+        try:
+            return self._timed(super().executemany, stats, query, args)
+        finally:
+            self._batched = False
+
+    def _timed(self, run, stats, query, args):
+        start = time.perf_counter()
+        try:
+            return run(query, args)
+        finally:
+            elapsed = time.perf_counter() - start
+            if stats is not None:
+                stats.record(query, elapsed, self.rowcount)
+            if 0 < Config.SLOW_QUERY_MS <= elapsed * 1000:
+                slow_queries.capture(self, query, args, elapsed)
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile
+    index = min(len(sorted_values) - 1, max(0, math.ceil(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class EndpointStats:
+    """Rolling window of the last N sampled requests for one endpoint."""
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.requests = 0
+        self.db_time_total = 0.0
+        self.slowest = []
+
+    def add(self, stats, total_time):
+        self.samples.append((total_time, stats.db_time, stats.queries, stats.rows))
+        self.requests += 1
+        self.db_time_total += stats.db_time
+        # Slowest distinct statements seen for this endpoint
+        merged = {}
+        for elapsed, text in self.slowest + stats.slowest:
+            merged[text] = max(elapsed, merged.get(text, 0))
+        self.slowest = sorted(((e, t) for t, e in merged.items()), reverse=True)[:SLOWEST_KEPT]
+
+    def summary(self):
+        totals = sorted(s[0] for s in self.samples)
+        db_times = sorted(s[1] for s in self.samples)
+        count = len(self.samples) or 1
+        return {
+            'requests': self.requests,
+            'window': len(self.samples),
+            'db_time_total_ms': self.db_time_total * 1000,
+            'avg_queries': sum(s[2] for s in self.samples) / count,
+            'avg_rows': sum(s[3] for s in self.samples) / count,
+            'db_p50_ms': _percentile(db_times, 50) * 1000,
+            'db_p95_ms': _percentile(db_times, 95) * 1000,
+            'db_p99_ms': _percentile(db_times, 99) * 1000,
+            'total_p50_ms': _percentile(totals, 50) * 1000,
+            'total_p95_ms': _percentile(totals, 95) * 1000,
+            'total_p99_ms': _percentile(totals, 99) * 1000,
+            'slowest': [(elapsed * 1000, text) for elapsed, text in self.slowest]
+        }
+
+
+_endpoints = {}
+_endpoints_lock = threading.Lock()
+
+
+def record_request(endpoint, stats, total_time):
+    with _endpoints_lock:
+        entry = _endpoints.get(endpoint)
+        if entry is None:
+            entry = _endpoints[endpoint] = EndpointStats(Config.PERF_WINDOW)
+        entry.add(stats, total_time)
+
+
+def endpoint_summaries(limit=None):
+    """Per-endpoint summaries, highest total DB time first."""
+    with _endpoints_lock:
+        rows = [dict(endpoint=name, **entry.summary()) for name, entry in _endpoints.items()]
+    rows.sort(key=lambda row: row['db_time_total_ms'], reverse=True)
+    return rows[:limit] if limit else rows
+
+
+def reset():
+    with _endpoints_lock:
+        _endpoints.clear()
+
+
+def init_app(app):
+    """Sample requests, emit Server-Timing and feed the per-endpoint windows."""
+
+    @app.before_request
+    def start_sql_stats():
+        rate = Config.SQL_SAMPLE_RATE
+        budgets = Config.QUERY_BUDGET_MODE != 'off'
+        if budgets or (rate > 0 and (rate >= 1 or random.random() < rate)):
+            _current.set(RequestStats(keep_statements=budgets))
+
+    @app.after_request
+    def finish_sql_stats(response):
+        stats = _current.get()
+        if stats is None:
+            return response
+
+        total_time = time.perf_counter() - stats.started
+        timing = (f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries, {stats.rows} rows", '
+                  f'app;dur={total_time * 1000:.2f}')
+        response.headers['Server-Timing'] = timing
+        record_request(request.endpoint or 'unknown', stats, total_time)
+        if total_time * 1000 >= Config.PERF_SLOW_REQUEST_MS:
+            print(f"Slow request {request.method} {request.path}: {timing}")
+        return response
+
+    @app.teardown_request
+    def clear_sql_stats(exc):
+        _current.set(None)
@@ -0,0 +1,126 @@
+"""Startup profile: what a fresh worker spends importing the app.
+
+Starts `python -X importtime` in a new interpreter that imports `wsgi` (the
+module gunicorn preloads) and reports:
+
+- wall time to import it, and the process RSS afterwards
+- import time per top-level package (self time summed over its modules)
+- the slowest modules by cumulative time
+- heavy modules (STARTUP_LAZY_MODULES, e.g. pandas) imported at startup
+
+    python -m utils.startup_profile                 # report
+    python -m utils.startup_profile --check         # exit 1 if over budget
+    python -m utils.startup_profile --runs 5 --top 30
+
+--check fails when the median import time exceeds STARTUP_BUDGET_MS, the RSS
+exceeds STARTUP_RSS_BUDGET_MB, or a module in STARTUP_LAZY_MODULES is loaded
+at import. Those modules must be imported inside the function that uses
+them. Run with the same interpreter and environment as the workers; the
+first run reads from a cold file cache and is usually the slowest.
+tests/test_startup.py runs the same budget and lazy-import checks under
+pytest, so the test suite enforces them too.
+"""
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from config import Config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_line = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+# Runs in the child interpreter; prints one JSON line on stdout
+_CHILD = '''
+import json, resource, sys, time
+start = time.perf_counter()
+import wsgi
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+rss_mb = rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+print(json.dumps({'seconds': elapsed, 'rss_mb': rss_mb, 'modules': sorted(sys.modules)}))
+'''
+
+
+def parse_importtime(text):
+    """[(module, self_us, cumulative_us, depth)] from -X importtime output."""
+    rows = []
+    for line in text.splitlines():
+        match = _line.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+def by_package(rows):
+    """{top-level package: self time in ms} summed over its modules."""
+    totals = defaultdict(int)
+    for module, self_us, _, _ in rows:
+        totals[module.split('.')[0]] += self_us
+    return {package: us / 1000 for package, us in totals.items()}
+
+
+def profile_once():
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', _CHILD], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report['rows'] = parse_importtime(result.stderr)
+    return report
+
+
+def profile(runs=3):
+    reports = [profile_once() for _ in range(runs)]
+    last = reports[-1]
+    return {
+        'runs': [round(r['seconds'] * 1000, 1) for r in reports],
+        'median_ms': round(statistics.median(r['seconds'] for r in reports) * 1000, 1),
+        'rss_mb': round(max(r['rss_mb'] for r in reports), 1),
+        'packages': by_package(last['rows']),
+        'rows': last['rows'],
+        'lazy_loaded': sorted({m.split('.')[0] for m in last['modules']} & set(Config.STARTUP_LAZY_MODULES))
+    }
+
+
+def check(result):
+    """Budget violations (empty when the startup profile is within budget)."""
+    problems = []
+    if result['median_ms'] > Config.STARTUP_BUDGET_MS:
+        problems.append(f"import took {result['median_ms']} ms, budget is {Config.STARTUP_BUDGET_MS} ms")
+    if result['rss_mb'] > Config.STARTUP_RSS_BUDGET_MB:
+        problems.append(f"RSS after import is {result['rss_mb']} MB, budget is {Config.STARTUP_RSS_BUDGET_MB} MB")
+    for module in result['lazy_loaded']:
+        problems.append(f"{module} is imported at startup; import it where it is used")
+    return problems
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Profile the imports a worker does at startup.')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15, help='packages and modules to list')
+    parser.add_argument('--check', action='store_true', help='exit 1 when over budget')
+    args = parser.parse_args()
+
+    result = profile(args.runs)
+    print(f"import wsgi: median {result['median_ms']} ms (runs: {result['runs']}), RSS {result['rss_mb']} MB")
+    print("\nself time by package:")
+    for package, ms in sorted(result['packages'].items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {ms:8.1f} ms  {package}")
+    print("\nslowest modules (cumulative):")
+    for module, _, cumulative_us, _ in sorted(result['rows'], key=lambda row: -row[2])[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {module}")
+
+    if args.check:
+        problems = check(result)
+        for problem in problems:
+            print(f"FAIL {problem}")
+        if not problems:
+            print(f"\nOK: within {Config.STARTUP_BUDGET_MS} ms and {Config.STARTUP_RSS_BUDGET_MB} MB, "
+                  f"no eager {', '.join(Config.STARTUP_LAZY_MODULES)}")
+        sys.exit(1 if problems else 0)
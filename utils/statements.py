@@ -0,0 +1,201 @@
+"""Registry of hot-path SQL statements and their expected query plans.
+
+Blueprints and models register the statements that run on every dashboard,
+listing, search and payment, and execute the returned SQL as before:
+
+    RECENT_PAYMENTS = statement('admin.dashboard.recent_payments', '''
+        SELECT ... FROM payments p ... ORDER BY p.created_at DESC LIMIT 5
+    ''', indexes={'payments': 'idx_payments_created_at'}, max_rows=1000)
+
+Each entry declares what its plan must look like:
+
+- no full table scan (access_type ALL) on payments or logs, unless the entry
+  gives a full_scan_ok reason (for example, a total over every payment)
+- `indexes`: for a table, the index (or one of the indexes) the plan must use
+- `max_rows`: a ceiling on the estimated rows examined per table scan
+
+`sample` supplies the parameters to EXPLAIN with: a tuple, or a function of
+a cursor that picks real values (an existing student id, today's window).
+
+    python -m database.synthetic_data --scale 0.1
+    python -m utils.statements --save plans.json      # record current plans
+    python -m utils.statements --baseline plans.json  # check; exits 1 on failure
+
+A failing statement is printed with the expectation it broke and a diff of
+its plan against the baseline, one line per table access.
+"""
+import difflib
+import json
+import re
+
+NO_FULL_SCAN = ('payments', 'logs')
+
+_table_alias = re.compile(r'\b(?:FROM|JOIN)\s+`?(\w+)`?(?:\s+(?:AS\s+)?`?(\w+)`?)?', re.IGNORECASE)
+_not_alias = {'on', 'where', 'join', 'left', 'right', 'inner', 'outer', 'cross', 'group', 'order', 'limit',
+              'having', 'using', 'for', 'union', 'straight_join', 'natural', 'partition', 'window'}
+
+STATEMENTS = {}
+
+
+class Statement:
+    def __init__(self, name, sql, sample=(), indexes=None, max_rows=None, full_scan_ok=None):
+        self.name = name
+        self.sql = sql
+        self.sample = sample
+        self.indexes = indexes or {}
+        self.max_rows = max_rows
+        self.full_scan_ok = full_scan_ok
+
+    def sample_params(self, cursor):
+        return self.sample(cursor) if callable(self.sample) else self.sample
+
+    def aliases(self):
+        """{alias or table name: table name} from the FROM and JOIN clauses."""
+        aliases = {}
+        for table, alias in _table_alias.findall(self.sql):
+            aliases[table.lower()] = table.lower()
+            if alias and alias.lower() not in _not_alias:
+                aliases[alias.lower()] = table.lower()
+        return aliases
+
+
+def statement(name, sql, sample=(), indexes=None, max_rows=None, full_scan_ok=None):
+    """Register a hot-path statement and return its SQL unchanged."""
+    STATEMENTS[name] = Statement(name, sql, sample, indexes, max_rows, full_scan_ok)
+    return sql
+
+
+def sample_id(table, where='TRUE'):
+    """Sample-parameter function returning the id of one row of `table`."""
+    def sample(cursor):
+        cursor.execute(f"SELECT id FROM {table} WHERE {where} ORDER BY id LIMIT 1")
+        row = cursor.fetchone()
+        return (row['id'] if row else 0,)
+    return sample
+
+
+def plan_tables(document):
+    """Table accesses in an EXPLAIN FORMAT=JSON document, in plan order."""
+    tables = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            table = node.get('table')
+            if isinstance(table, dict):
+                tables.append(table)
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(document)
+    return tables
+
+
+def summarize_plan(entry, document):
+    """One line per table access: table (alias), access type, index and estimated rows."""
+    aliases = entry.aliases()
+    lines = []
+    for table in plan_tables(document):
+        alias = table.get('table_name', '?')
+        name = aliases.get(alias.lower(), alias)
+        label = name if name == alias else f"{name} ({alias})"
+        lines.append(f"{label}: access={table.get('access_type')} key={table.get('key')} "
+                     f"rows={table.get('rows_examined_per_scan')}")
+    return lines
+
+
+def check_plan(entry, document):
+    """Broken expectations for one statement's plan (empty when it passes)."""
+    aliases = entry.aliases()
+    problems = []
+    used = {}
+    for table in plan_tables(document):
+        alias = table.get('table_name', '?')
+        name = aliases.get(alias.lower(), alias)
+        used.setdefault(name, set()).add(table.get('key'))
+        if table.get('access_type') == 'ALL' and name in NO_FULL_SCAN and not entry.full_scan_ok:
+            problems.append(f"full table scan on {name}")
+        rows = table.get('rows_examined_per_scan')
+        if entry.max_rows is not None and rows is not None and rows > entry.max_rows:
+            problems.append(f"{name}: estimated {rows} rows examined, ceiling is {entry.max_rows}")
+    for name, expected in entry.indexes.items():
+        expected = (expected,) if isinstance(expected, str) else tuple(expected)
+        keys = used.get(name)
+        if keys is None:
+            problems.append(f"{name} does not appear in the plan")
+        elif not keys & set(expected):
+            problems.append(f"{name} uses {', '.join(map(str, sorted(keys, key=str)))}, "
+                            f"expected {' or '.join(expected)}")
+    return problems
+
+
+def explain(cursor, entry):
+    cursor.execute("EXPLAIN FORMAT=JSON " + entry.sql, entry.sample_params(cursor))
+    row = cursor.fetchone()
+    return json.loads(list(row.values())[0] if isinstance(row, dict) else row[0])
+
+
+def check_all(cursor, baseline=None, names=None):
+    """(results, failures): plan summaries for every statement, and the ones that broke expectations."""
+    results = {}
+    failures = []
+    for name in sorted(STATEMENTS):
+        if names and not any(part in name for part in names):
+            continue
+        entry = STATEMENTS[name]
+        try:
+            document = explain(cursor, entry)
+        except Exception as e:
+            failures.append((name, [f"EXPLAIN failed: {e}"], []))
+            continue
+        summary = summarize_plan(entry, document)
+        results[name] = summary
+        problems = check_plan(entry, document)
+        if problems:
+            before = (baseline or {}).get(name, [])
+            diff = list(difflib.unified_diff(before, summary, 'baseline', 'current', lineterm='', n=len(summary)))
+            failures.append((name, problems, diff or summary))
+    return results, failures
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='EXPLAIN every registered statement and check its plan.')
+    parser.add_argument('--baseline', help='plans saved by an earlier --save, to diff against')
+    parser.add_argument('--save', help='write the current plans to this file')
+    parser.add_argument('--only', nargs='*', help='check only statements whose name contains one of these')
+    args = parser.parse_args()
+
+    import app  # noqa: F401  (importing the blueprints registers their statements)
+    from database.init_db import get_db_connection
+    from utils.statements import check_all  # the registry the blueprints filled, not __main__'s
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    connection = get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            results, failures = check_all(cursor, baseline, args.only)
+    finally:
+        connection.close()
+
+    for name, problems, diff in failures:
+        print(f"FAIL {name}")
+        for problem in problems:
+            print(f"  - {problem}")
+        for line in diff:
+            print(f"    {line}")
+    checked = len(results) + sum(1 for name, _, _ in failures if name not in results)
+    print(f"{checked - len(failures)} of {checked} statement plans OK.")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failures else 0)
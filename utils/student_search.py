@@ -0,0 +1,264 @@
+"""In-process trigram index over students for the search boxes.
+
+`LIKE '%term%'` over students cannot use an index, so every search used to scan
+the table (joined with payments). Instead each worker keeps a small index of
+student ids keyed by the trigrams of the student number, full name and email,
+plus token prefixes (for one- and two-letter queries) and name initials.
+
+A query takes the posting list of its rarest trigram as candidates and checks
+each candidate against the normalized text, then ranks: exact student number,
+student number prefix, name prefix, word prefix, initials, email prefix, then
+any substring. Routes get back ranked student ids.
+
+List pages ask for every match (no limit) with their status filter, so
+pagination and SQL filters see the same rows the old LIKE did; one- and
+two-character queries then match any substring, as LIKE did. A common query
+can match most of the table, so the pages paginate over the ranked ids in
+Python and only send the current page's ids to SQL. Where SQL filters must
+still see all matches, id_filter() inlines at most
+STUDENT_SEARCH_MAX_INLINE_IDS ids and otherwise leaves the matching to
+in_rank_order(). Lookups with a
+limit (the typeahead, best match) are capped at STUDENT_SEARCH_MAX_RESULTS,
+need STUDENT_SEARCH_MIN_LENGTH characters and match short queries on
+prefixes only.
+
+The index is updated directly by the admin student routes after each write,
+and every STUDENT_SEARCH_REFRESH_INTERVAL seconds a search checks
+COUNT(*)/MAX(updated_at) so writes made by other workers are picked up.
+"""
+import heapq
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from config import Config
+from database.init_db import get_db_connection
+from utils import metrics
+
+CACHE_HIT = (('cache', 'student_search'), ('result', 'hit'))
+CACHE_MISS = (('cache', 'student_search'), ('result', 'miss'))
+STUDENT_COLUMNS = "id, student_id, first_name, last_name, email, is_active, updated_at"
+
+
+def normalize(text):
+    """Lowercase and strip accents, so 'José' matches 'jose'."""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower().strip()
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class StudentSearchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._docs = {}
+        self._trigrams = defaultdict(list)
+        self._prefixes = defaultdict(list)
+        self._initials = defaultdict(list)
+        self._loaded = False
+        self._checked_at = 0
+        self._count = None
+        self._updated_at = None
+
+    def _document(self, row):
+        # (sid, name, ' ' + name for word-prefix checks, email, initials, searchable text, active)
+        sid = normalize(row['student_id'])
+        name = ' '.join(normalize(f"{row['first_name']} {row['last_name']}").split())
+        email = normalize(row['email'])
+        initials = ''.join(word[0] for word in name.split())
+        return (sid, name, ' ' + name, email, initials, f"{sid} {name} {email}", bool(row['is_active']))
+
+    def _add(self, student_id, doc):
+        # Posting lists are append-only; stale entries are filtered out when a
+        # candidate is checked against the current document
+        sid, name, _, email, initials, text, _ = doc
+        self._docs[student_id] = doc
+        for gram in trigrams(text):
+            self._trigrams[gram].append(student_id)
+        for token in set(name.split() + [sid, email]):
+            for length in (1, 2):
+                if len(token) >= length:
+                    self._prefixes[token[:length]].append(student_id)
+        if len(initials) > 1:
+            self._initials[initials].append(student_id)
+
+    def load(self, rows):
+        """Replace the whole index with `rows` (also compacts the posting lists)."""
+        fresh = StudentSearchIndex()
+        for row in rows:
+            fresh._add(row['id'], fresh._document(row))
+        with self._lock:
+            self._docs, self._trigrams = fresh._docs, fresh._trigrams
+            self._prefixes, self._initials = fresh._prefixes, fresh._initials
+            self._loaded = True
+
+    def upsert(self, rows):
+        with self._lock:
+            for row in rows:
+                self._add(row['id'], self._document(row))
+
+    def remove(self, student_ids):
+        with self._lock:
+            for student_id in student_ids:
+                self._docs.pop(student_id, None)
+
+    def _candidates(self, query, tokens):
+        longest = max(tokens, key=len)
+        if len(longest) >= 3:
+            postings = sorted((self._trigrams.get(gram, ()) for gram in trigrams(longest)), key=len)
+            if len(postings) > 1 and postings[0]:
+                # Intersecting the two rarest lists prunes most non-matches cheaply
+                return set(postings[0]).intersection(postings[1])
+            return set(postings[0]) if postings else set()
+        candidates = set(self._prefixes.get(longest[:2], ()))
+        if len(tokens) == 1:
+            candidates.update(self._initials.get(query, ()))
+        return candidates
+
+    def search(self, query, limit=None, active=None):
+        """Ranked student ids matching `query`; `active` filters on is_active when not None.
+
+        Ranking: exact student number, student number prefix, name prefix, word
+        prefix, initials, email prefix, then any substring; ties go to the
+        shorter name, then the newest student. Without a limit every match is
+        returned (see the module docstring).
+        """
+        query = ' '.join(normalize(query).split())
+        exhaustive = limit is None
+        if not query or (not exhaustive and len(query) < Config.STUDENT_SEARCH_MIN_LENGTH):
+            return []
+        tokens = query.split()
+        word_prefix = ' ' + query
+        short = len(query) < 3
+        if not exhaustive:
+            limit = min(limit, Config.STUDENT_SEARCH_MAX_RESULTS)
+
+        with self._lock:
+            docs = self._docs
+            ranked = []
+            # Short queries have no trigram; a full list needs every substring match, so check all
+            candidates = docs.keys() if short and exhaustive else self._candidates(query, tokens)
+            for student_id in candidates:
+                doc = docs.get(student_id)
+                if doc is None:
+                    continue
+                sid, name, spaced_name, email, initials, text, is_active = doc
+                if active is not None and is_active != active:
+                    continue
+
+                if sid.startswith(query):
+                    rank = 0 if sid == query else 1
+                elif name.startswith(query):
+                    rank = 2
+                elif word_prefix in spaced_name:
+                    rank = 3
+                elif len(query) > 1 and initials.startswith(query):
+                    rank = 4
+                elif email.startswith(query):
+                    rank = 5
+                elif short and not exhaustive:
+                    if len(tokens) == 1 or not all((' ' + t) in spaced_name for t in tokens):
+                        continue
+                    rank = 6
+                elif query in text or (len(tokens) > 1 and all(t in text for t in tokens)):
+                    rank = 6
+                else:
+                    continue
+                ranked.append((rank, len(name), -student_id))
+        ranked = sorted(ranked) if exhaustive else heapq.nsmallest(limit, ranked)
+        return [-key[2] for key in ranked]
+
+    def sync(self, cursor=None, force=False):
+        """Reload rows changed since the last check (or everything, if rows were deleted)."""
+        now = time.monotonic()
+        with self._lock:
+            fresh = self._loaded and now - self._checked_at < Config.STUDENT_SEARCH_REFRESH_INTERVAL
+            if not fresh:
+                self._checked_at = now
+        if fresh and not force:
+            metrics.inc('cache_requests_total', CACHE_HIT)
+            return
+
+        if cursor is None:
+            connection = get_db_connection()
+            try:
+                with connection.cursor() as cursor:
+                    return self.sync(cursor, force=True)
+            finally:
+                connection.close()
+
+        cursor.execute("SELECT COUNT(*) AS count, MAX(updated_at) AS updated_at FROM students")
+        state = cursor.fetchone()
+        with self._lock:
+            loaded, count, updated_at = self._loaded, self._count, self._updated_at
+        if loaded and state['count'] == count and state['updated_at'] == updated_at:
+            metrics.inc('cache_requests_total', CACHE_HIT)
+            return
+        metrics.inc('cache_requests_total', CACHE_MISS)
+
+        if not loaded or (count is not None and state['count'] < count):
+            cursor.execute(f"SELECT {STUDENT_COLUMNS} FROM students")
+            self.load(cursor.fetchall())
+        else:
+            # updated_at has one-second resolution, so re-read the boundary second too
+            cursor.execute(f"SELECT {STUDENT_COLUMNS} FROM students WHERE updated_at >= %s",
+                           (updated_at,))
+            self.upsert(cursor.fetchall())
+        with self._lock:
+            self._count = state['count']
+            self._updated_at = state['updated_at']
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = StudentSearchIndex()
+    return _index
+
+
+def search_students(query, limit=None, active=None, cursor=None):
+    """Ranked ids of the students matching `query` (loads/refreshes the index as needed)."""
+    index = get_index()
+    index.sync(cursor)
+    return index.search(query, limit=limit, active=active)
+
+
+def refresh_students(cursor, student_ids):
+    """Re-index students right after this worker wrote them."""
+    index = get_index()
+    if not index._loaded or not student_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(student_ids))
+    cursor.execute(f"SELECT {STUDENT_COLUMNS} FROM students WHERE id IN ({placeholders})", list(student_ids))
+    rows = cursor.fetchall()
+    index.upsert(rows)
+    found = {row['id'] for row in rows}
+    index.remove([student_id for student_id in student_ids if student_id not in found])
+
+
+def id_filter(student_ids, column='s.id'):
+    """SQL condition and params limiting `column` to `student_ids`.
+
+    A list longer than STUDENT_SEARCH_MAX_INLINE_IDS gives "1 = 1"; pass the
+    rows through in_rank_order() to keep only the matches.
+    """
+    if not student_ids:
+        return "1 = 0", []
+    if len(student_ids) > Config.STUDENT_SEARCH_MAX_INLINE_IDS:
+        return "1 = 1", []
+    placeholders = ', '.join(['%s'] * len(student_ids))
+    return f"{column} IN ({placeholders})", list(student_ids)
+
+
+def in_rank_order(rows, student_ids, key='id'):
+    """The rows whose `key` is in `student_ids`, in the order the search ranked them."""
+    position = {student_id: i for i, student_id in enumerate(student_ids)}
+    return sorted((row for row in rows if row[key] in position), key=lambda row: position[row[key]])
@@ -0,0 +1,109 @@
+"""Half-open [start, end) time windows in the app's time zone.
+
+Date filters are written as `column >= start AND column < end` so MySQL can
+range-scan an index (and prune log partitions) instead of evaluating
+DATE(column) or YEAR()/MONTH() on every row. Boundaries are naive local
+datetimes in APP_TIMEZONE; get_db_connection sets each session's time_zone to
+the same zone's UTC offset, so TIMESTAMP columns compare in that zone too.
+
+    start, end = window('today')
+    condition, params = range_condition('p.created_at', 'today')
+"""
+from datetime import datetime, date, time, timedelta
+from zoneinfo import ZoneInfo
+from config import Config
+
+WINDOWS = ('today', 'yesterday', 'week', 'month', 'this_month', 'last_12_months', 'term', 'custom')
+
+
+def app_zone():
+    return ZoneInfo(Config.APP_TIMEZONE)
+
+
+def now():
+    """Current naive local time in APP_TIMEZONE."""
+    return datetime.now(app_zone()).replace(tzinfo=None)
+
+
+def today():
+    """Current date in APP_TIMEZONE."""
+    return now().date()
+
+
+def session_time_zone(at=None):
+    """MySQL time_zone value ('+08:00') for APP_TIMEZONE at `at` (default: now)."""
+    offset = app_zone().utcoffset(at or datetime.now())
+    minutes = int(offset.total_seconds() // 60)
+    sign = '+' if minutes >= 0 else '-'
+    return f"{sign}{abs(minutes) // 60:02d}:{abs(minutes) % 60:02d}"
+
+
+def _midnight(day):
+    return datetime.combine(day, time.min)
+
+
+def _month_start(day, offset=0):
+    month_index = day.year * 12 + (day.month - 1) + offset
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def term_start(day):
+    """First day of the academic term containing `day` (ACADEMIC_TERM_START_MONTHS)."""
+    months = sorted(Config.ACADEMIC_TERM_START_MONTHS)
+    started = [m for m in months if m <= day.month]
+    if started:
+        return date(day.year, started[-1], 1)
+    return date(day.year - 1, months[-1], 1)
+
+
+def window(name, start=None, end=None, today=None):
+    """(start, end) datetimes for a named window; `end` is exclusive.
+
+    week and month are the last 7 and 30 days including today. custom takes
+    `start` and `end` dates, both inclusive (end is moved to the next midnight).
+    """
+    today = today or now().date()
+    if name == 'today':
+        first, last = today, today + timedelta(days=1)
+    elif name == 'yesterday':
+        first, last = today - timedelta(days=1), today
+    elif name == 'week':
+        first, last = today - timedelta(days=6), today + timedelta(days=1)
+    elif name == 'month':
+        first, last = today - timedelta(days=29), today + timedelta(days=1)
+    elif name == 'this_month':
+        first, last = _month_start(today), _month_start(today, 1)
+    elif name == 'last_12_months':
+        first, last = _month_start(today, -11), _month_start(today, 1)
+    elif name == 'term':
+        first = term_start(today)
+        months = sorted(Config.ACADEMIC_TERM_START_MONTHS)
+        later = [m for m in months if m > first.month]
+        last = date(first.year, later[0], 1) if later else date(first.year + 1, months[0], 1)
+    elif name == 'custom':
+        if start is None or end is None:
+            raise ValueError("custom window needs start and end dates")
+        first = start.date() if isinstance(start, datetime) else start
+        last = (end.date() if isinstance(end, datetime) else end) + timedelta(days=1)
+        if last <= first:
+            raise ValueError("custom window end is before its start")
+    else:
+        raise ValueError(f"Unknown time window: {name}")
+    return _midnight(first), _midnight(last)
+
+
+def date_window(name, **kwargs):
+    """Like window(), but as dates, for DATE columns such as payments.payment_date."""
+    first, last = window(name, **kwargs)
+    return first.date(), last.date()
+
+
+def range_sql(column):
+    """The half-open condition on `column`; bind it to window() or date_window()."""
+    return f"{column} >= %s AND {column} < %s"
+
+
+def range_condition(column, name, dates=False, **kwargs):
+    """SQL condition and params selecting `column` inside the window."""
+    bounds = date_window(name, **kwargs) if dates else window(name, **kwargs)
+    return range_sql(column), list(bounds)
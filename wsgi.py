@@ -0,0 +1,12 @@
+"""WSGI entry point for production servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+gunicorn.conf.py preloads this module in the master process, so the imports,
+templates and blueprints are loaded once and shared copy-on-write by every
+worker. Nothing here opens a database connection or starts a thread; each
+worker does that after it is forked (see utils/background.py).
+"""
+from app import create_app
+
+app = create_app()